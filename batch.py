@@ -0,0 +1,307 @@
+"""Execução sem janelas das etapas de extração do traçado e de racing line.
+
+Exemplos:
+
+    python batch.py extract input_images -o yellow_tracks --workers 4 --json resultados.json
+    python batch.py racing-line yellow_tracks --images input_images -o racing_lines
+    python batch.py extract input_images --config batch.json
+
+O arquivo de configuração é JSON com as mesmas opções da linha de comando
+(com '_' no lugar de '-'); uma seção com o nome da etapa ("extract" ou
+"racing_line") sobrescreve as chaves gerais, e argumentos explícitos
+sobrescrevem o arquivo. O progresso vai para stderr, uma linha por arquivo;
+o resultado (--json) é uma lista com um registro por arquivo.
+
+Códigos de saída: 0 tudo certo, 1 algum arquivo falhou ou não teve traçado,
+2 argumentos ou configuração inválidos, 3 nenhuma entrada encontrada.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import cv2
+import numpy as np
+
+from extract_yellow_track import YellowTrackExtractor
+from generate_racing_line import RacingLineGenerator
+from src.hsv_calibration import HSVCalibrator
+from src.elevation import track_elevation
+from src.kart_physics import estimate_lap_time
+
+EXIT_OK = 0
+EXIT_FAILED = 1
+EXIT_USAGE = 2
+EXIT_NO_INPUT = 3
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg')
+
+
+def _hsv(text):
+    values = [int(v) for v in text.split(',')]
+    if len(values) != 3:
+        raise argparse.ArgumentTypeError(f"esperado H,S,V, recebido: {text}")
+    return values
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Extração do traçado e racing line em lote, sem janelas")
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('inputs', nargs='*', help="Arquivos ou pastas de entrada")
+    common.add_argument('--config', default=None, help="Arquivo JSON com as opções")
+    common.add_argument('--workers', type=int, default=None, help="Processos em paralelo (padrão: núcleos)")
+    common.add_argument('--json', default=None, help="Grava os resultados em JSON ('-' para stdout)")
+    common.add_argument('--no-images', action='store_true', help="Não grava as imagens anotadas")
+    common.add_argument('-q', '--quiet', action='store_true', help="Sem progresso em stderr")
+    stages = parser.add_subparsers(dest='stage', required=True)
+
+    extract = stages.add_parser('extract', parents=[common], help="Detecta o traçado amarelo")
+    extract.add_argument('--lower-hsv', type=_hsv, default=None, help="Limite inferior H,S,V")
+    extract.add_argument('--upper-hsv', type=_hsv, default=None, help="Limite superior H,S,V")
+    extract.add_argument('--morph-size', type=int, default=None)
+    extract.add_argument('--epsilon-factor', type=float, default=None)
+    extract.add_argument('--calibrate', default=None, metavar='CAMERA_ID',
+                         help="Calibra o HSV na primeira imagem e usa os limites em todas")
+    extract.add_argument('-o', '--output', default='yellow_tracks', help="Pasta de saída")
+
+    racing = stages.add_parser('racing-line', parents=[common], help="Gera a racing line dos contornos salvos")
+    racing.add_argument('--images', default='input_images', help="Pasta das imagens originais")
+    racing.add_argument('--max-speed', type=float, default=None, help="m/s")
+    racing.add_argument('--friction-coeff', type=float, default=None)
+    racing.add_argument('--track-length', type=float, default=None, help="m")
+    racing.add_argument('--displacement-factor', type=float, default=None)
+    racing.add_argument('--max-displacement', type=float, default=None)
+    racing.add_argument('--height-maps', default=None,
+                        help="Pasta de mapas de altura (<nome da imagem>.png ou .npy) alinhados com as imagens")
+    racing.add_argument('--height-range', type=float, nargs=2, default=None, metavar=('MIN', 'MAX'),
+                        help="Altitudes (m) do preto e do branco do mapa de altura")
+    racing.add_argument('-o', '--output', default='racing_lines', help="Pasta de saída")
+    return parser, {'extract': extract, 'racing-line': racing}
+
+
+def load_config(path, stage):
+    """Opções do arquivo JSON: chaves gerais mais a seção da etapa."""
+    with open(path) as f:
+        config = json.load(f)
+    if not isinstance(config, dict):
+        raise ValueError("o arquivo de configuração deve ser um objeto JSON")
+    section = stage.replace('-', '_')
+    options = {k: v for k, v in config.items() if k not in ('extract', 'racing_line')}
+    options.update(config.get(section, {}))
+    return options
+
+
+def parse_args(argv=None):
+    """Lê os argumentos; o arquivo de configuração vira padrão do subcomando."""
+    parser, stage_parsers = build_parser()
+    args = parser.parse_args(argv)
+    if args.config is None:
+        return args
+
+    try:
+        options = load_config(args.config, args.stage)
+    except (OSError, ValueError) as e:
+        parser.error(f"configuração inválida ({args.config}): {e}")
+    stage_parser = stage_parsers[args.stage]
+    known = {action.dest for action in stage_parser._actions}
+    unknown = sorted(set(options) - known)
+    if unknown:
+        parser.error(f"opções desconhecidas em {args.config}: {', '.join(unknown)}")
+
+    # Argumentos explícitos têm precedência: reparse com o arquivo como padrão
+    stage_parser.set_defaults(**options)
+    return parser.parse_args(argv)
+
+
+def collect_inputs(inputs, extensions):
+    """Expande pastas em arquivos com as extensões dadas, em ordem."""
+    files = []
+    for path in inputs:
+        if os.path.isdir(path):
+            files.extend(os.path.join(path, name) for name in sorted(os.listdir(path))
+                         if name.lower().endswith(extensions))
+        elif os.path.isfile(path):
+            files.append(path)
+    return files
+
+
+def extract_one(image_path, params, output_folder, save_image=True):
+    """Etapa 1 para uma imagem: contorno em contour_<nome>.npy e imagem anotada."""
+    start = time.perf_counter()
+    name = os.path.basename(image_path)
+    record = {'input': image_path, 'status': 'ok', 'outputs': {}}
+    image = cv2.imread(image_path)
+    if image is None:
+        return dict(record, status='error', error="imagem ilegível", elapsed=time.perf_counter() - start)
+
+    extractor = YellowTrackExtractor()
+    extractor.params.update(params)
+    contour = extractor.detect_yellow_track(image)
+    if contour is None:
+        return dict(record, status='no_track', elapsed=time.perf_counter() - start)
+
+    contour_path = os.path.join(output_folder, f"contour_{os.path.splitext(name)[0]}.npy")
+    np.save(contour_path, contour)
+    record['outputs']['contour'] = contour_path
+    if save_image:
+        result = image.copy()
+        cv2.drawContours(result, [contour], -1, (0, 255, 255), 3)
+        image_out = os.path.join(output_folder, f"yellow_{name}")
+        cv2.imwrite(image_out, result)
+        record['outputs']['image'] = image_out
+    record['points'] = len(contour)
+    record['perimeter'] = float(cv2.arcLength(contour, True))
+    record['elapsed'] = time.perf_counter() - start
+    return record
+
+
+def racing_line_one(contour_path, params, output_folder, image_folder=None, save_image=True,
+                    height_map_folder=None):
+    """Etapa 2 para um contorno: racing line em racing_<nome>.npy, tempo de volta e imagem.
+
+    Com height_map_folder o mapa de altura de mesmo nome da imagem (se houver)
+    entra no tempo de volta, alinhado pela forma da imagem original quando
+    ela está em image_folder (sem ela o mapa deve ter a resolução da imagem).
+    """
+    start = time.perf_counter()
+    record = {'input': contour_path, 'status': 'ok', 'outputs': {}}
+    try:
+        contour = np.load(contour_path, allow_pickle=False)
+    except (OSError, ValueError) as e:
+        return dict(record, status='error', error=str(e), elapsed=time.perf_counter() - start)
+
+    generator = RacingLineGenerator()
+    generator.params.update(params)
+    racing_line = generator.generate_racing_line(contour)
+    if racing_line is None:
+        return dict(record, status='no_track', elapsed=time.perf_counter() - start)
+
+    image_name = os.path.basename(contour_path)[len('contour_'):-len('.npy')]
+    line_path = os.path.join(output_folder, f"racing_{image_name}.npy")
+    np.save(line_path, racing_line)
+    record['outputs']['racing_line'] = line_path
+    # A imagem original é opcional: sem ela só os dados são gravados
+    image = None
+    if image_folder is not None:
+        candidates = [os.path.join(image_folder, image_name + ext) for ext in IMAGE_EXTENSIONS]
+        found = [path for path in candidates if os.path.exists(path)]
+        image_path = found[0] if found else None
+    else:
+        image_path = None
+
+    lap_params = dict(generator.params)
+    if height_map_folder is not None:
+        candidates = [os.path.join(height_map_folder, image_name + ext) for ext in ('.png', '.tif', '.npy')]
+        found = [path for path in candidates if os.path.exists(path)]
+        if found:
+            lap_params['height_map'] = record['outputs']['height_map'] = found[0]
+            if image_path is not None:
+                image = cv2.imread(image_path)
+                if image is not None:
+                    lap_params['image_shape'] = list(image.shape[:2])
+    record['lap_time'] = estimate_lap_time(racing_line, lap_params,
+                                           elevation=track_elevation(lap_params, contour))
+
+    if save_image and image is None and image_path is not None:
+        image = cv2.imread(image_path)
+    if save_image and image is not None:
+        result = image.copy()
+        cv2.drawContours(result, [contour], -1, (0, 255, 255), 2)
+        cv2.polylines(result, [racing_line.astype(np.int32)], False, (0, 0, 255), 4)
+        image_out = os.path.join(output_folder, f"racing_{image_name}.jpg")
+        cv2.imwrite(image_out, result)
+        record['outputs']['image'] = image_out
+    record['elapsed'] = time.perf_counter() - start
+    return record
+
+
+def stage_jobs(args):
+    """Função de trabalho, parâmetros e lista de entradas da etapa escolhida."""
+    if args.stage == 'extract':
+        names = ('lower_hsv', 'upper_hsv', 'morph_size', 'epsilon_factor')
+        files = collect_inputs(args.inputs or ['input_images'], IMAGE_EXTENSIONS)
+        params = {name: getattr(args, name) for name in names if getattr(args, name) is not None}
+        if args.calibrate is not None and files:
+            # Calibra uma vez no processo principal; o cache da câmera fica em disco
+            calibrator = HSVCalibrator(os.path.join(args.output, 'hsv_calibration.json'))
+            image = next((img for img in map(cv2.imread, files) if img is not None), None)
+            if image is not None:
+                lower, upper = calibrator.calibrate(image, args.calibrate)
+                params['lower_hsv'], params['upper_hsv'] = lower.tolist(), upper.tolist()
+        return extract_one, params, files, (not args.no_images,)
+
+    names = ('max_speed', 'friction_coeff', 'track_length', 'displacement_factor', 'max_displacement',
+             'height_range')
+    files = [f for f in collect_inputs(args.inputs or ['yellow_tracks'], ('.npy',))
+             if os.path.basename(f).startswith('contour_')]
+    params = {name: getattr(args, name) for name in names if getattr(args, name) is not None}
+    return racing_line_one, params, files, (args.images, not args.no_images, args.height_maps)
+
+
+def run(args):
+    """Processa todas as entradas em paralelo; retorna (registros, código de saída)."""
+    os.makedirs(args.output, exist_ok=True)
+    worker, params, files, extra = stage_jobs(args)
+    if not files:
+        print("Nenhuma entrada encontrada", file=sys.stderr)
+        return [], EXIT_NO_INPUT
+
+    records = [None] * len(files)
+    workers = min(args.workers or os.cpu_count() or 1, len(files))
+    done = 0
+
+    def report(index, record):
+        nonlocal done
+        done += 1
+        records[index] = record
+        if not args.quiet:
+            detail = record.get('error', '')
+            print(f"[{done}/{len(files)}] {record['status']:<8} {record['input']} "
+                  f"({record['elapsed']:.2f} s) {detail}".rstrip(), file=sys.stderr, flush=True)
+
+    if workers == 1:
+        for i, path in enumerate(files):
+            report(i, _guarded(worker, path, params, args.output, *extra))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(_guarded, worker, path, params, args.output, *extra): i
+                       for i, path in enumerate(files)}
+            for future in as_completed(futures):
+                report(futures[future], future.result())
+
+    failed = sum(record['status'] != 'ok' for record in records)
+    return records, EXIT_FAILED if failed else EXIT_OK
+
+
+def _guarded(worker, path, *args):
+    """Uma falha num arquivo vira um registro de erro em vez de derrubar o lote."""
+    start = time.perf_counter()
+    try:
+        return worker(path, *args)
+    except Exception as e:
+        return {'input': path, 'status': 'error', 'outputs': {}, 'error': f"{type(e).__name__}: {e}",
+                'elapsed': time.perf_counter() - start}
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    start = time.perf_counter()
+    records, code = run(args)
+
+    if args.json is not None:
+        payload = json.dumps(records, indent=2, ensure_ascii=False)
+        if args.json == '-':
+            print(payload)
+        else:
+            with open(args.json, 'w') as f:
+                f.write(payload + "\n")
+    if not args.quiet and records:
+        ok = sum(record['status'] == 'ok' for record in records)
+        print(f"{ok}/{len(records)} concluídos em {time.perf_counter() - start:.1f} s", file=sys.stderr)
+    return code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
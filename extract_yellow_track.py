@@ -1,6 +1,9 @@
 import cv2
 import numpy as np
 import os
+import sys
+from src.hsv_calibration import HSVCalibrator
+from src.image_processor import detect_yellow_track
 
 class YellowTrackExtractor:
     def __init__(self):
@@ -10,30 +13,19 @@ class YellowTrackExtractor:
             'morph_size': 7,
             'epsilon_factor': 0.001
         }
+        self.calibrator = HSVCalibrator()
+    
+    def auto_calibrate(self, image, camera_id='default', force=False):
+        lower, upper = self.calibrator.calibrate(image, camera_id, force)
+        self.adjust_parameter('lower_hsv', lower.tolist())
+        self.adjust_parameter('upper_hsv', upper.tolist())
     
     def detect_yellow_track(self, image):
-        hsv = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
-        lower = np.array(self.params['lower_hsv'])
-        upper = np.array(self.params['upper_hsv'])
-        
-        mask = cv2.inRange(hsv, lower, upper)
-        
-        # Operações morfológicas
-        kernel = np.ones((self.params['morph_size'], self.params['morph_size']), np.uint8)
-        mask = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, kernel)
-        mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, kernel)
-        
-        # Encontrar contornos
-        contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-        
-        if not contours:
-            return None
-        
-        main_contour = max(contours, key=cv2.contourArea)
-        epsilon = self.params['epsilon_factor'] * cv2.arcLength(main_contour, True)
-        approx = cv2.approxPolyDP(main_contour, epsilon, True)
-        
-        return approx
+        return detect_yellow_track(image,
+                                   np.array(self.params['lower_hsv']),
+                                   np.array(self.params['upper_hsv']),
+                                   morph_size=self.params['morph_size'],
+                                   epsilon_factor=self.params['epsilon_factor'])
 
     def adjust_parameter(self, param_name, value):
         if param_name in self.params:
@@ -93,9 +85,10 @@ def main():
                 print("2. Limite superior HSV (ex: 40,255,255)")
                 print("3. Tamanho do kernel morfológico (ex: 7)")
                 print("4. Fator epsilon (ex: 0.001)")
+                print("5. Calibrar HSV automaticamente")
                 print("0. Voltar ao processamento")
                 
-                choice = input("Selecione o parâmetro para ajustar (1-4) ou 0 para continuar: ")
+                choice = input("Selecione o parâmetro para ajustar (1-5) ou 0 para continuar: ")
                 
                 if choice == '1':
                     values = input("Digite novos valores para lower_hsv (H,S,V): ").split(',')
@@ -111,10 +104,16 @@ def main():
                 elif choice == '4':
                     value = float(input("Novo fator epsilon: "))
                     extractor.adjust_parameter('epsilon_factor', value)
+                elif choice == '5':
+                    extractor.auto_calibrate(image, force=True)
             
             elif key == 27:  # ESC - Sair
                 cv2.destroyAllWindows()
                 break
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    if len(sys.argv) > 1:
+        # Com argumentos roda sem janelas, em lote (ver batch.py)
+        from batch import main as batch_main
+        sys.exit(batch_main(['extract'] + sys.argv[1:]))
+    main()
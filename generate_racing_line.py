@@ -1,16 +1,15 @@
 import cv2
 import numpy as np
 import os
+import sys
+from src.pipeline import DEFAULT_KART_PARAMS
 
 class RacingLineGenerator:
     def __init__(self):
-        self.params = {
-            'max_speed': 55/3.6,  # m/s
-            'friction_coeff': 1.5,
-            'track_length': 943,
+        self.params = dict(DEFAULT_KART_PARAMS, **{
             'displacement_factor': 0.5,
             'max_displacement': 20
-        }
+        })
     
     def generate_racing_line(self, contour):
         if contour is None or len(contour) < 3:
@@ -163,4 +162,8 @@ def main():
                 break
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    if len(sys.argv) > 1:
+        # Com argumentos roda sem janelas, em lote (ver batch.py)
+        from batch import main as batch_main
+        sys.exit(batch_main(['racing-line'] + sys.argv[1:]))
+    main()
@@ -3,6 +3,8 @@ import numpy as np
 import os
 from src.image_processor import detect_yellow_track
 from src.racing_line_processor import generate_racing_line, draw_racing_line
+from src.hsv_calibration import HSVCalibrator
+from src.color_optimizer import ColorOptimizer
 
 # Configurações
 INPUT_FOLDER = "input_images"
@@ -17,17 +19,28 @@ params = {
     'upper_h': 40,
     'upper_s': 255,
     'upper_v': 255,
-    'displacement': 0.3
+    'displacement': 0.3,
+    'adaptive_color': True  # limites HSV aprendidos em segundo plano
 }
 
+POLL_MS = 100  # ms entre consultas ao teclado
+
+def manual_limits():
+    lower = np.array([params['lower_h'], params['lower_s'], params['lower_v']])
+    upper = np.array([params['upper_h'], params['upper_s'], params['upper_v']])
+    return lower, upper
+
+calibrator = HSVCalibrator()
+# O aprendizado parte dos limites manuais
+color_optimizer = ColorOptimizer(background=True, limits=manual_limits())
+
 def process_image(image_path):
     image = cv2.imread(image_path)
     if image is None:
         return None, None, None
     
     # Detectar traçado amarelo
-    lower = np.array([params['lower_h'], params['lower_s'], params['lower_v']])
-    upper = np.array([params['upper_h'], params['upper_s'], params['upper_v']])
+    lower, upper = color_optimizer.get_limits() if params['adaptive_color'] else manual_limits()
     yellow_contour = detect_yellow_track(image, lower, upper)
     
     # Gerar racing line
@@ -45,7 +58,18 @@ def process_image(image_path):
     
     return image, yellow_contour, result
 
+def print_controls():
+    print("\nControles:")
+    print("  N/P: Próxima/Imagem anterior")
+    print("  S: Salvar resultado")
+    print("  H: Ajustar parâmetros HSV")
+    print("  A: Calibrar HSV automaticamente")
+    print("  L: Ligar/desligar aprendizado de cor")
+    print("  D: Ajustar deslocamento")
+    print("  Q: Sair")
+
 def main():
+    global color_optimizer
     image_files = [f for f in os.listdir(INPUT_FOLDER) 
                   if f.lower().endswith(('.png', '.jpg', '.jpeg'))]
     
@@ -54,31 +78,42 @@ def main():
         return
     
     current_index = 0
+    shown = None    # (imagem, versão dos limites, edição) na tela
+    learned = None  # última imagem entregue ao ColorOptimizer
+    edits = 0
+    print_controls()
     
     while True:
         image_file = image_files[current_index]
         image_path = os.path.join(INPUT_FOLDER, image_file)
         
-        original, yellow_contour, result = process_image(image_path)
+        # Só reprocessa quando a imagem, os parâmetros ou os limites aprendidos mudam
+        state = (current_index, color_optimizer.version if params['adaptive_color'] else None, edits)
+        if state != shown:
+            original, yellow_contour, result = process_image(image_path)
+            
+            if original is None:
+                print(f"Erro ao carregar: {image_file}")
+                current_index = (current_index + 1) % len(image_files)
+                continue
+            
+            # O ajuste roda em segundo plano; a tela é atualizada quando ele termina
+            if params['adaptive_color'] and learned != current_index:
+                color_optimizer.update(original)
+                learned = current_index
+            shown = state
+            
+            # Mostrar imagem
+            display = cv2.resize(result, (1000, 700))
+            text = color_optimizer.status_text() if params['adaptive_color'] else "HSV manual"
+            cv2.putText(display, text, (10, 25), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 0, 0), 4)
+            cv2.putText(display, text, (10, 25), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 1)
+            cv2.imshow("Kart Racing Line Optimizer", display)
         
-        if original is None:
-            print(f"Erro ao carregar: {image_file}")
-            current_index = (current_index + 1) % len(image_files)
+        key = cv2.waitKey(POLL_MS) & 0xFF
+        if key == 255:  # Nenhuma tecla
             continue
-        
-        # Mostrar imagem
-        display = cv2.resize(result, (1000, 700))
-        cv2.imshow("Kart Racing Line Optimizer", display)
-        
-        # Instruções
-        print("\nControles:")
-        print("  N/P: Próxima/Imagem anterior")
-        print("  S: Salvar resultado")
-        print("  H: Ajustar parâmetros HSV")
-        print("  D: Ajustar deslocamento")
-        print("  Q: Sair")
-        
-        key = cv2.waitKey(0) & 0xFF
+        edits += 1
         
         if key == ord('n'):  # Próxima imagem
             current_index = (current_index + 1) % len(image_files)
@@ -88,19 +123,33 @@ def main():
             output_path = os.path.join(OUTPUT_FOLDER, f"opt_{image_file}")
             cv2.imwrite(output_path, result)
             print(f"Resultado salvo em: {output_path}")
-        elif key == ord('h'):  # Ajustar HSV
+        elif key == ord('h'):  # Ajustar HSV (desliga o aprendizado)
             print("\nAjuste os parâmetros HSV (0-255):")
+            params['adaptive_color'] = False
             params['lower_h'] = int(input("Lower H: ") or params['lower_h'])
             params['lower_s'] = int(input("Lower S: ") or params['lower_s'])
             params['lower_v'] = int(input("Lower V: ") or params['lower_v'])
             params['upper_h'] = int(input("Upper H: ") or params['upper_h'])
             params['upper_s'] = int(input("Upper S: ") or params['upper_s'])
             params['upper_v'] = int(input("Upper V: ") or params['upper_v'])
+        elif key == ord('a'):  # Calibração automática de cor
+            lower, upper = calibrator.calibrate(original, force=True)
+            params['lower_h'], params['lower_s'], params['lower_v'] = (int(v) for v in lower)
+            params['upper_h'], params['upper_s'], params['upper_v'] = (int(v) for v in upper)
+            params['adaptive_color'] = False
+            print(f"HSV calibrado: {lower.tolist()} - {upper.tolist()}")
+        elif key == ord('l'):  # Aprendizado de cor
+            params['adaptive_color'] = not params['adaptive_color']
+            if params['adaptive_color']:
+                color_optimizer = ColorOptimizer(background=True, limits=manual_limits())
+            learned = None
+            print(f"Aprendizado de cor {'ligado' if params['adaptive_color'] else 'desligado'}")
         elif key == ord('d'):  # Ajustar deslocamento
             new_disp = float(input("Novo fator de deslocamento (0.1-1.0): ") or params['displacement'])
             params['displacement'] = max(0.1, min(1.0, new_disp))
         elif key == ord('q'):  # Sair
             break
+        print_controls()
     
     cv2.destroyAllWindows()
 
@@ -2,6 +2,12 @@ import cv2
 import numpy as np
 import os
 import math
+from src.color_optimizer import ColorOptimizer
+from src.hsv_calibration import HSVCalibrator
+from src.elevation import track_elevation
+from src.kart_physics import estimate_lap_time
+from src.track_segments import segment_track
+from src.vehicle_model import KART_CLASSES
 
 # Configurações
 INPUT_FOLDER = "input_images"
@@ -23,16 +29,50 @@ params = {
     'max_speed': 55,  # km/h
     'friction': 1.5,  # coeficiente de atrito
     'mass': 170,      # kg (kart + piloto)
+    'kart_class': 'rental',  # modelo de kart (ver src/vehicle_model.py)
     
     # Racing line
     'aggressiveness': 0.7,  # 0.1-1.0 (conservativo-agressivo)
     'smoothness': 0.5,      # 0.1-1.0 (suavização da linha)
-    'braking_distance': 15  # metros antes das curvas
+    'braking_distance': 15,  # metros antes das curvas
+    
+    # Limites HSV aprendidos em segundo plano a cada imagem vista
+    'adaptive_color': True,
+    
+    # Mapa de altura alinhado com a imagem (PNG 8/16 bits ou .npy em metros); None = pista plana
+    'height_map': None,
+    'height_range': (0.0, 10.0)  # metros no preto e no branco do mapa
 }
 
-def detect_yellow_track(image):
+# Intervalo (ms) entre consultas ao teclado; entre elas a tela é atualizada
+# quando o ajuste de cor em segundo plano termina
+POLL_MS = 100
+
+def manual_limits():
+    """Limites HSV ajustados à mão (ou pela calibração automática)"""
     lower = np.array([params['lower_h'], params['lower_s'], params['lower_v']])
     upper = np.array([params['upper_h'], params['upper_s'], params['upper_v']])
+    return lower, upper
+
+calibrator = HSVCalibrator()
+# O aprendizado parte dos limites manuais: antes do primeiro ajuste a detecção é a mesma
+color_optimizer = ColorOptimizer(background=True, limits=manual_limits())
+
+def hsv_limits():
+    """Limites aprendidos pelo ColorOptimizer ou os ajustados à mão"""
+    if params['adaptive_color']:
+        return color_optimizer.get_limits()
+    return manual_limits()
+
+def draw_color_status(display):
+    """Limites HSV em uso e confiança do aprendizado, no canto da tela"""
+    text = color_optimizer.status_text() if params['adaptive_color'] else "HSV manual"
+    cv2.putText(display, text, (10, 25), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 0, 0), 4)
+    cv2.putText(display, text, (10, 25), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 1)
+    return display
+
+def detect_yellow_track(image):
+    lower, upper = hsv_limits()
     
     hsv = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
     mask = cv2.inRange(hsv, lower, upper)
@@ -157,10 +197,13 @@ def draw_racing_line(image, yellow_contour, racing_line):
                 pt2 = tuple(pts[i+1].astype(int))
                 cv2.arrowedLine(result, pt1, pt2, (0, 0, 255), 2, tipLength=0.3)
         
-        # Desenhar pontos de frenagem nas curvas fechadas
-        for i in range(len(pts)):
-            if i % 10 == 0:
-                cv2.circle(result, tuple(pts[i].astype(int)), 3, (255, 0, 0), -1)
+        # Desenhar pontos de frenagem antes de cada curva e os ápices
+        segments = segment_track(pts, track_length=943)
+        _, braking = segments.braking_points(params['braking_distance'])
+        for point in braking:
+            cv2.circle(result, tuple(point.astype(int)), 5, (255, 0, 0), -1)
+        for i in segments.apex_index:
+            cv2.circle(result, tuple(pts[i].astype(int)), 4, (0, 255, 0), 2)
     
     return result
 
@@ -179,6 +222,21 @@ def process_image(image_path):
         # Calcular comprimento do contorno em pixels
         perimeter = cv2.arcLength(yellow_contour, True)
         racing_line = calculate_racing_line(yellow_contour, perimeter)
+        lap_params = {
+            'kart_class': params['kart_class'],
+            'mass': params['mass'],
+            'friction_coeff': params['friction'],
+            'max_speed': params['max_speed'] / 3.6,
+            'track_length': 943,
+            'height_map': params['height_map'],
+            'height_range': params['height_range'],
+            'image_shape': image.shape[:2],
+        }
+        # Mapa de altura amostrado ao longo do traçado (em cache), não da racing line
+        lap_time = estimate_lap_time(racing_line, lap_params,
+                                     elevation=track_elevation(lap_params, yellow_contour))
+        if lap_time is not None:
+            print(f"Tempo de volta estimado ({params['kart_class']}): {lap_time:.2f} s")
     
     # Desenhar resultado
     result = draw_racing_line(image, yellow_contour, racing_line)
@@ -195,11 +253,14 @@ def print_instructions():
     print("  P: Imagem anterior")
     print("  S: Salvar resultado")
     print("  H: Ajustar detecção de cor (HSV)")
+    print("  A: Calibrar HSV automaticamente")
+    print("  L: Ligar/desligar aprendizado de cor")
     print("  R: Ajustar parâmetros da racing line")
     print("  Q: Sair")
     print("="*50)
 
 def main():
+    global color_optimizer
     # Verificar se há imagens na pasta
     image_files = [f for f in os.listdir(INPUT_FOLDER) 
                   if f.lower().endswith(('.png', '.jpg', '.jpeg'))]
@@ -210,28 +271,39 @@ def main():
         return
     
     current_index = 0
+    shown = None     # (imagem, versão dos limites, edição) na tela
+    learned = None   # última imagem entregue ao ColorOptimizer
+    edits = 0
+    print_instructions()
     
     while True:
         image_file = image_files[current_index]
         image_path = os.path.join(INPUT_FOLDER, image_file)
         
-        original, yellow_contour, result = process_image(image_path)
+        # Reprocessa só quando algo mudou: imagem, parâmetros ou limites aprendidos
+        state = (current_index, color_optimizer.version if params['adaptive_color'] else None, edits)
+        if state != shown:
+            original, yellow_contour, result = process_image(image_path)
+            
+            if original is None:
+                print(f"Erro ao processar: {image_file}")
+                current_index = (current_index + 1) % len(image_files)
+                continue
+            
+            # Cada imagem nova alimenta o aprendizado; o ajuste roda em segundo plano
+            if params['adaptive_color'] and learned != current_index:
+                color_optimizer.update(original)
+                learned = current_index
+            shown = state
+            
+            # Redimensionar para exibição
+            display = draw_color_status(cv2.resize(result, (1000, 700)))
+            cv2.imshow("Kart Racing Line Optimizer", display)
         
-        if original is None:
-            print(f"Erro ao processar: {image_file}")
-            current_index = (current_index + 1) % len(image_files)
+        key = cv2.waitKey(POLL_MS) & 0xFF
+        if key == 255:  # Nenhuma tecla: volta a checar os limites
             continue
-        
-        # Redimensionar para exibição
-        display = cv2.resize(result, (1000, 700))
-        
-        # Mostrar imagem
-        cv2.imshow("Kart Racing Line Optimizer", display)
-        
-        # Exibir instruções no terminal
-        print_instructions()
-        
-        key = cv2.waitKey(0) & 0xFF
+        edits += 1
         
         if key == ord('n'):  # Próxima imagem
             current_index = (current_index + 1) % len(image_files)
@@ -241,19 +313,37 @@ def main():
             output_path = os.path.join(OUTPUT_FOLDER, f"opt_{image_file}")
             cv2.imwrite(output_path, result)
             print(f"Resultado salvo em: {output_path}")
-        elif key == ord('h'):  # Ajustar detecção de cor
+        elif key == ord('h'):  # Ajustar detecção de cor (desliga o aprendizado)
             print("\n=== AJUSTE DE DETECÇÃO DE COR ===")
+            params['adaptive_color'] = False
             params['lower_h'] = int(input("H min (0-179): ") or params['lower_h'])
             params['lower_s'] = int(input("S min (0-255): ") or params['lower_s'])
             params['lower_v'] = int(input("V min (0-255): ") or params['lower_v'])
             params['upper_h'] = int(input("H max (0-179): ") or params['upper_h'])
             params['upper_s'] = int(input("S max (0-255): ") or params['upper_s'])
             params['upper_v'] = int(input("V max (0-255): ") or params['upper_v'])
+        elif key == ord('a'):  # Calibração automática de cor
+            lower, upper = calibrator.calibrate(original, force=True)
+            params['lower_h'], params['lower_s'], params['lower_v'] = (int(v) for v in lower)
+            params['upper_h'], params['upper_s'], params['upper_v'] = (int(v) for v in upper)
+            params['adaptive_color'] = False
+            print(f"HSV calibrado: {lower.tolist()} - {upper.tolist()}")
+        elif key == ord('l'):  # Aprendizado de cor
+            params['adaptive_color'] = not params['adaptive_color']
+            if params['adaptive_color']:
+                # Recomeça dos limites manuais atuais
+                color_optimizer = ColorOptimizer(background=True, limits=manual_limits())
+            learned = None
+            print(f"Aprendizado de cor {'ligado' if params['adaptive_color'] else 'desligado'}")
         elif key == ord('r'):  # Ajustar racing line
             print("\n=== AJUSTE DE RACING LINE ===")
             print("Dica: Para melhorar as curvas, ajuste agressividade e suavidade")
             params['max_speed'] = float(input(f"Velocidade máxima atual: {params['max_speed']} km/h\nNova velocidade (km/h): ") or params['max_speed'])
             params['friction'] = float(input(f"Atrito atual: {params['friction']}\nNovo atrito (1.0-2.0): ") or params['friction'])
+            kart_class = input(f"Classe do kart atual: {params['kart_class']} ({', '.join(KART_CLASSES)})\nNova classe: ")
+            if kart_class in KART_CLASSES:
+                params['kart_class'] = kart_class
+            params['mass'] = float(input(f"Massa atual: {params['mass']} kg\nNova massa (kg): ") or params['mass'])
             params['aggressiveness'] = float(input(f"Agressividade atual: {params['aggressiveness']:.1f}\nNova agressividade (0.1-1.0): ") or params['aggressiveness'])
             params['smoothness'] = float(input(f"Suavidade atual: {params['smoothness']:.1f}\nNova suavidade (0.1-1.0): ") or params['smoothness'])
             params['braking_distance'] = float(input(f"Distância de frenagem atual: {params['braking_distance']}m\nNova distância (m): ") or params['braking_distance'])
@@ -267,6 +357,7 @@ def main():
             break
         elif key == 27:  # ESC
             break
+        print_instructions()
     
     cv2.destroyAllWindows()
     print("Aplicativo encerrado!")
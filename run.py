@@ -19,4 +19,5 @@ if __name__ == "__main__":
         print(f"Pasta de entrada criada: {input_dir}")
         print(f"Por favor, coloque suas imagens nesta pasta e execute novamente.")
     else:
-        main()
\ No newline at end of file
+        # --multi: cada traçado amarelo da imagem é processado como uma pista separada
+        main(multi_track='--multi' in sys.argv[1:])
\ No newline at end of file
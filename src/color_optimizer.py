@@ -1,35 +1,152 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
 import cv2
 import numpy as np
 from sklearn.cluster import MiniBatchKMeans
 
+# Amostras necessárias antes do primeiro ajuste
+MIN_SAMPLES = 1000
+# O conjunto de amostras é limitado: o custo de cada ajuste não cresce com a sessão
+MAX_SAMPLES = 20000
+SAMPLES_PER_IMAGE = 5000
+# Máscara de candidatos: matiz dos limites atuais com folga e S/V bem abaixo do piso,
+# para que os limites possam abrir de novo (imagens mais escuras, outra câmera)
+CANDIDATE_HUE_MARGIN = 10
+CANDIDATE_MIN_SV = 64
+# Percentil dos pixels do cluster do traçado usado como piso de S e V
+FLOOR_PERCENTILE = 5
+DEFAULT_LIMITS = (np.array([20, 200, 200]), np.array([40, 255, 255]))
+
 class ColorOptimizer:
-    def __init__(self, n_clusters=3):
-        self.model = MiniBatchKMeans(n_clusters=n_clusters)
-        self.samples = []
-        self.limits = [np.array([20, 200, 200]), np.array([40, 255, 255])]  # Valores padrão
-        
+    """Aprende os limites HSV do traçado a partir dos pixels amarelos das imagens já vistas.
+
+    limits são os limites iniciais (os manuais do app ou os do
+    HSVCalibrator). As amostras vêm de uma máscara larga em torno deles, o
+    MiniBatchKMeans separa o traçado (cluster mais saturado e claro) do resto
+    e os pisos de S e V saem dos percentis dos pixels desse cluster; assim os
+    limites podem tanto fechar quanto abrir.
+    Com background=True o ajuste do MiniBatchKMeans roda numa thread de
+    trabalho: update só amostra os pixels e agenda o ajuste, e os novos
+    limites substituem os antigos de uma vez quando ele termina (version
+    aumenta a cada troca). confidence (0-1) combina quantidade de amostras,
+    fração delas dentro dos limites e estabilidade entre ajustes seguidos,
+    em média móvel.
+    """
+
+    def __init__(self, n_clusters=3, background=False, seed=0, limits=None):
+        self.n_clusters = n_clusters
+        self.background = background
+        self.samples = np.empty((0, 3), np.uint8)
+        lower, upper = DEFAULT_LIMITS if limits is None else limits
+        self.limits = (np.asarray(lower), np.asarray(upper))
+        self.confidence = 0.0
+        self.version = 0
+        self._rng = np.random.default_rng(seed)
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1) if background else None
+        self._pending = None
+        self._running = False
+        self._stale = False
+
     def update(self, new_image):
         hsv = cv2.cvtColor(new_image, cv2.COLOR_BGR2HSV)
-        mask = cv2.inRange(hsv, self.limits[0], self.limits[1])
+        mask = cv2.inRange(hsv, *self._candidate_limits())
         yellow_pixels = hsv[mask > 0]
-        
-        if len(yellow_pixels) > 0:
-            self.samples.extend(yellow_pixels)
-            
-            if len(self.samples) > 1000:
-                self.model.fit(np.array(self.samples))
-                self._update_limits()
-    
-    def _update_limits(self):
-        centers = self.model.cluster_centers_
-        h_center = np.median(centers[:,0])
-        s_min = np.percentile(centers[:,1], 10)
-        v_min = np.percentile(centers[:,2], 10)
-        
-        self.limits = [
+        if len(yellow_pixels) == 0:
+            return
+
+        if len(yellow_pixels) > SAMPLES_PER_IMAGE:
+            yellow_pixels = yellow_pixels[self._rng.choice(len(yellow_pixels), SAMPLES_PER_IMAGE,
+                                                           replace=False)]
+        with self._lock:
+            samples = np.concatenate((self.samples, yellow_pixels))
+            if len(samples) > MAX_SAMPLES:
+                samples = samples[self._rng.choice(len(samples), MAX_SAMPLES, replace=False)]
+            self.samples = samples
+        if len(samples) <= MIN_SAMPLES:
+            return
+
+        if self._executor is None:
+            self._refit()
+            return
+        with self._lock:
+            # Um ajuste por vez; pedidos durante o ajuste viram um único ajuste seguinte
+            if self._running:
+                self._stale = True
+                return
+            self._running = True
+            self._pending = self._executor.submit(self._refit)
+
+    def _candidate_limits(self):
+        lower, upper = self.get_limits()
+        return (np.array([max(0, lower[0] - CANDIDATE_HUE_MARGIN), CANDIDATE_MIN_SV, CANDIDATE_MIN_SV]),
+                np.array([min(179, upper[0] + CANDIDATE_HUE_MARGIN), 255, 255]))
+
+    def _refit(self):
+        while True:
+            with self._lock:
+                samples = self.samples
+                self._stale = False
+            try:
+                data = samples.astype(np.float64)
+                model = MiniBatchKMeans(n_clusters=self.n_clusters, n_init=3, random_state=0)
+                labels = model.fit_predict(data)
+                track = np.argmax(model.cluster_centers_[:, 1] + model.cluster_centers_[:, 2])
+                limits = self._limits_from_cluster(data[labels == track])
+                confidence = self._confidence(data, labels == track, limits)
+            except Exception:
+                # Libera o próximo ajuste: sem isso uma falha travaria o aprendizado
+                with self._lock:
+                    self._running = False
+                raise
+            with self._lock:
+                self.limits = limits
+                self.confidence = confidence
+                self.version += 1
+                if not self._stale:
+                    self._running = False
+                    return
+
+    @staticmethod
+    def _limits_from_cluster(track):
+        """Matiz mediana ±10 e pisos de S/V no percentil FLOOR_PERCENTILE dos pixels do traçado."""
+        h_center = np.median(track[:, 0])
+        s_min, v_min = np.percentile(track[:, 1:], FLOOR_PERCENTILE, axis=0)
+
+        return (
             np.array([max(0, h_center-10), max(0, s_min), max(0, v_min)]),
-            np.array([min(180, h_center+10), 255, 255])
-        ]
-    
+            np.array([min(179, h_center+10), 255, 255])
+        )
+
+    def _confidence(self, samples, in_track, limits):
+        lower, upper = limits
+        inside = np.all((samples >= lower) & (samples <= upper), axis=1)
+        # Pureza: fração dos pixels aceitos pelos limites que são do cluster do traçado
+        coverage = (inside & in_track).sum() / max(1, inside.sum())
+        # Estabilidade: quanto os limites andaram desde o ajuste anterior (em unidades HSV)
+        shift = max(np.abs(limits[0] - self.limits[0]).max(), np.abs(limits[1] - self.limits[1]).max())
+        stability = np.exp(-shift / 20.0) if self.version else 0.5
+        sufficiency = min(1.0, len(samples) / (4 * MIN_SAMPLES))
+        current = coverage * stability * sufficiency
+        # Média com o valor anterior: o k-means oscila um pouco de um ajuste para outro
+        return float(current if not self.version else 0.5 * (self.confidence + current))
+
     def get_limits(self):
-        return self.limits
\ No newline at end of file
+        """(lower, upper) atuais; a tupla é trocada inteira, nunca fica pela metade."""
+        return self.limits
+
+    def busy(self):
+        """True enquanto um ajuste em segundo plano está rodando."""
+        return self._running
+
+    def wait(self, timeout=None):
+        """Espera o ajuste em andamento (útil ao encerrar e nos testes)."""
+        pending = self._pending
+        if pending is not None:
+            pending.result(timeout)
+
+    def status_text(self):
+        lower, upper = self.get_limits()
+        text = (f"HSV auto {np.round(lower).astype(int).tolist()}-{np.round(upper).astype(int).tolist()} "
+                f"confiança {self.confidence:.0%}")
+        return text + (" (ajustando...)" if self.busy() else "")
@@ -0,0 +1,115 @@
+import cv2
+import numpy as np
+from .track_data import Polyline, as_points
+
+# cv2.remap não aceita saídas com lado >= SHRT_MAX, então as amostras são
+# dispostas em linhas de REMAP_ROW_POINTS perfis
+REMAP_ROW_POINTS = 512
+
+
+def contour_normals(points, span=3):
+    """Normais unitárias de um contorno fechado, usando vizinhos a span pontos de distância.
+
+    Num contorno CHAIN_APPROX_NONE os vizinhos imediatos só dão 8 direções;
+    olhar alguns pontos adiante suaviza a tangente.
+    """
+    tangent = np.roll(points, -span, axis=0) - np.roll(points, span, axis=0)
+    tangent /= np.maximum(np.hypot(tangent[:, :1], tangent[:, 1:]), 1e-12)
+    return np.column_stack((-tangent[:, 1], tangent[:, 0]))
+
+
+def sample_profiles(image, points, normals, offsets):
+    """Amostra a imagem ao longo das normais com uma única chamada a cv2.remap.
+
+    Retorna (N, len(offsets)) em float32; imagens coloridas têm um eixo a mais.
+    """
+    n, s = len(points), len(offsets)
+    map_x = (points[:, 0, None] + offsets[None, :] * normals[:, 0, None]).astype(np.float32)
+    map_y = (points[:, 1, None] + offsets[None, :] * normals[:, 1, None]).astype(np.float32)
+
+    rows = -(-n // REMAP_ROW_POINTS)
+    pad = rows * REMAP_ROW_POINTS - n
+    map_x = np.pad(map_x, ((0, pad), (0, 0)), mode='edge').reshape(rows, -1)
+    map_y = np.pad(map_y, ((0, pad), (0, 0)), mode='edge').reshape(rows, -1)
+
+    sampled = cv2.remap(image, map_x, map_y, cv2.INTER_LINEAR, borderMode=cv2.BORDER_REPLICATE)
+    return sampled.reshape(rows * REMAP_ROW_POINTS, s, *image.shape[2:])[:n].astype(np.float32)
+
+
+def _smooth(values, sigma_along, sigma_across=0.0):
+    """Suavização gaussiana: circular ao longo do contorno (eixo 0), borda replicada no eixo 1."""
+    radius = max(1, int(round(3 * sigma_along)))
+    padded = values[np.arange(-radius, len(values) + radius) % len(values)]
+    kernel_along = cv2.getGaussianKernel(2 * radius + 1, sigma_along)
+    if sigma_across > 0:
+        kernel_across = cv2.getGaussianKernel(2 * int(round(3 * sigma_across)) + 1, sigma_across)
+    else:
+        kernel_across = np.ones((1, 1))
+    out = cv2.sepFilter2D(padded, -1, kernel_across, kernel_along, borderType=cv2.BORDER_REPLICATE)
+    return out[radius:-radius]
+
+
+def refine_contour(image, contour, search=2.0, step=0.25, sigma=12.0, span=3, min_strength=8.0):
+    """Desloca cada ponto do contorno até a borda sub-pixel mais próxima ao longo da normal.
+
+    image: imagem contínua (1 ou 3 canais) em volta do contorno, como a de
+    image_processor.refinement_channel; numa máscara binária a borda não tem
+    informação sub-pixel.
+    Os pontos são primeiro suavizados ao longo do contorno (sigma em pontos,
+    ~pixels), o que tira a escada dos pixels e deixa as normais vizinhas
+    quase paralelas. Os perfis
+    amostrados nessas normais são então suavizados no sentido do contorno e
+    no da normal (equivale a um borrão 2D no referencial local, mas custa
+    O(N * amostras) em vez de O(área da imagem)); a borda é o máximo do módulo
+    da derivada ao longo da normal, ajustado por uma parábola.
+    Pontos sem borda clara (módulo abaixo de min_strength) ficam na curva suavizada.
+    Retorna (N, 1, 2) em float64.
+    """
+    points = as_points(contour).astype(np.float64)
+    if len(points) < 2 * span + 1:
+        return points.reshape(-1, 1, 2)
+
+    points = _smooth(points, sigma)
+    normals = contour_normals(points, span)
+    offsets = np.arange(-search, search + step / 2, step)
+    profiles = sample_profiles(image, points, normals, offsets)
+
+    profiles = _smooth(profiles, sigma, 1.0 / step)
+
+    gradient = np.gradient(profiles, step, axis=1)
+    if gradient.ndim == 3:
+        strength = np.sqrt((gradient ** 2).sum(axis=2))
+    else:
+        strength = np.abs(gradient)
+
+    peak = np.clip(strength.argmax(axis=1), 1, len(offsets) - 2)
+    rows = np.arange(len(points))
+    left, center, right = (strength[rows, peak - 1], strength[rows, peak],
+                           strength[rows, peak + 1])
+    denom = left - 2 * center + right
+    delta = np.where(denom < 0, 0.5 * (left - right) / np.where(denom < 0, denom, -1), 0.0)
+    shift = offsets[peak] + np.clip(delta, -0.5, 0.5) * step
+    shift[center < min_strength] = 0.0
+
+    return (points + shift[:, None] * normals).reshape(-1, 1, 2)
+
+
+def resample_uniform(contour, spacing, track_length=None, closed=True):
+    """Reamostra uma polilinha com espaçamento uniforme de spacing metros.
+
+    A escala vem de track_length (comprimento real da pista); sem ela,
+    spacing é em pixels. Retorna um Polyline.
+    """
+    points = as_points(contour).astype(np.float64)
+    path = np.vstack((points, points[:1])) if closed else points
+    seg = np.hypot(*np.diff(path, axis=0).T)
+    arc = np.concatenate(([0.0], np.cumsum(seg)))
+    perimeter = arc[-1]
+    scale = 1.0 if track_length is None else track_length / perimeter
+
+    count = max(3, int(round(perimeter * scale / spacing)))
+    stations = np.linspace(0.0, perimeter, count, endpoint=not closed)
+    line = Polyline.empty(count, closed=closed)
+    line.x[:] = np.interp(stations, arc, path[:, 0])
+    line.y[:] = np.interp(stations, arc, path[:, 1])
+    return line
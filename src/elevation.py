@@ -0,0 +1,155 @@
+import hashlib
+import os
+import cv2
+import numpy as np
+from scipy.spatial import cKDTree
+from .track_data import as_points
+
+# Meia largura (m) usada para medir a inclinação transversal da pista
+TRACK_HALF_WIDTH = 4.0
+# Faixa de altitudes (m) representada pelos tons do mapa (0 e o valor máximo do tipo)
+DEFAULT_HEIGHT_RANGE = (0.0, 10.0)
+# Perfis guardados por mapa; o mais antigo sai primeiro
+MAX_PROFILES = 64
+
+
+class ElevationProfile:
+    """Altitude e inclinação transversal amostradas ao longo da linha central de uma pista.
+
+    slope é dh/dn (m/m) na direção da normal (-ty, tx), o lado para onde
+    aponta a curvatura positiva de curvature_profile. Linhas que andam perto
+    da central (a racing line) herdam altitude e inclinação da estação mais
+    próxima, sem reamostrar o mapa.
+    """
+
+    def __init__(self, points, normals, height, slope, scale):
+        self.points = points
+        self.normals = normals
+        self.height = height
+        self.slope = slope
+        self.scale = scale
+        self._tree = cKDTree(points)
+
+    def along(self, line, scale=None):
+        """(altitude em cada ponto, rampa e inclinação lateral em rad) de line (N, 2) ou (..., N, 2).
+
+        grade[i] é a rampa do segmento i -> i+1 (positiva subindo) e bank[i]
+        a inclinação transversal no ponto i, positiva quando a pista desce
+        para o lado da curvatura positiva (como usam velocity_profile).
+        """
+        line = np.asarray(as_points(line), dtype=np.float64)
+        scale = self.scale if scale is None else np.asarray(scale, dtype=np.float64)[..., None]
+        _, nearest = self._tree.query(line, workers=-1)
+        offset = ((line - self.points[nearest]) * self.normals[nearest]).sum(axis=-1) * self.scale
+        slope = self.slope[nearest]
+        height = self.height[nearest] + slope * offset
+
+        ds = np.linalg.norm(np.roll(line, -1, axis=-2) - line, axis=-1) * scale
+        grade = np.arctan2(np.roll(height, -1, axis=-1) - height, np.maximum(ds, 1e-9))
+        return height, grade, -np.arctan(slope)
+
+    def summary(self):
+        return {'min': float(self.height.min()), 'max': float(self.height.max()),
+                'max_bank': float(np.degrees(np.abs(np.arctan(self.slope)).max()))}
+
+
+class HeightMap:
+    """Mapa de altura alinhado com a imagem da pista (um valor de altitude por pixel).
+
+    Rasters inteiros (8 ou 16 bits) vão de height_range[0] no preto a
+    height_range[1] no branco; rasters float já estão em metros. image_shape
+    (altura, largura) da imagem da pista permite um mapa em outra resolução.
+    Os perfis ficam em cache por linha central, escala e meia largura.
+    """
+
+    def __init__(self, heights, height_range=DEFAULT_HEIGHT_RANGE, image_shape=None):
+        heights = np.asarray(heights)
+        if heights.ndim == 3:
+            heights = heights[..., 0]
+        if np.issubdtype(heights.dtype, np.integer):
+            low, high = height_range
+            heights = low + heights.astype(np.float64) * ((high - low) / np.iinfo(heights.dtype).max)
+        self.heights = np.ascontiguousarray(heights, dtype=np.float64)
+        if min(self.heights.shape) < 2:
+            raise ValueError("O mapa de altura precisa de pelo menos 2x2 pixels")
+        rows, cols = self.heights.shape
+        if image_shape is None:
+            self._factor = np.ones(2)
+        else:
+            self._factor = np.array([cols / image_shape[1], rows / image_shape[0]], dtype=np.float64)
+        self._profiles = {}
+
+    @classmethod
+    def load(cls, path, height_range=DEFAULT_HEIGHT_RANGE, image_shape=None):
+        """Lê PNG/TIFF em tons de cinza (8 ou 16 bits) ou .npy em metros."""
+        if path.lower().endswith('.npy'):
+            raster = np.load(path, allow_pickle=False)
+        else:
+            raster = cv2.imread(path, cv2.IMREAD_ANYDEPTH | cv2.IMREAD_GRAYSCALE)
+        if raster is None:
+            raise ValueError(f"Mapa de altura ilegível: {path}")
+        return cls(raster, height_range, image_shape)
+
+    def sample(self, points):
+        """Altitude (m) em pixels da imagem da pista, por interpolação bilinear; aceita (..., 2)."""
+        xy = np.asarray(points, dtype=np.float64) * self._factor
+        rows, cols = self.heights.shape
+        x = np.clip(xy[..., 0], 0, cols - 1)
+        y = np.clip(xy[..., 1], 0, rows - 1)
+        i = np.minimum(y.astype(np.intp), rows - 2)
+        j = np.minimum(x.astype(np.intp), cols - 2)
+        fy, fx = y - i, x - j
+        h = self.heights
+        return ((h[i, j] * (1 - fx) + h[i, j + 1] * fx) * (1 - fy) +
+                (h[i + 1, j] * (1 - fx) + h[i + 1, j + 1] * fx) * fy)
+
+    def profile(self, centerline, scale, half_width=TRACK_HALF_WIDTH):
+        """ElevationProfile da linha central (pixels); scale converte pixels em metros."""
+        points = np.ascontiguousarray(as_points(centerline), dtype=np.float64)
+        key = hashlib.sha1(points.tobytes() + np.array([scale, half_width]).tobytes()).hexdigest()
+        if key in self._profiles:
+            return self._profiles[key]
+
+        tangent = np.roll(points, -1, axis=0) - np.roll(points, 1, axis=0)
+        tangent /= np.maximum(np.linalg.norm(tangent, axis=1, keepdims=True), 1e-12)
+        normals = np.column_stack((-tangent[:, 1], tangent[:, 0]))
+        offset = normals * (half_width / scale)
+        # Centro e bordas numa única interpolação
+        height, plus, minus = self.sample(np.stack((points, points + offset, points - offset)))
+        profile = ElevationProfile(points, normals, height, (plus - minus) / (2 * half_width), scale)
+
+        if len(self._profiles) >= MAX_PROFILES:
+            self._profiles.pop(next(iter(self._profiles)))
+        self._profiles[key] = profile
+        return profile
+
+
+_HEIGHT_MAPS = {}
+
+
+def load_height_map(path, height_range=DEFAULT_HEIGHT_RANGE, image_shape=None):
+    """HeightMap do arquivo, lido uma vez por processo (recarregado se o arquivo mudar)."""
+    key = (os.path.abspath(path), os.path.getmtime(path), tuple(height_range),
+           None if image_shape is None else tuple(image_shape[:2]))
+    if key not in _HEIGHT_MAPS:
+        _HEIGHT_MAPS[key] = HeightMap.load(path, height_range, image_shape)
+    return _HEIGHT_MAPS[key]
+
+
+def track_elevation(kart_params, centerline, scale=None):
+    """ElevationProfile de kart_params['height_map'] ao longo da linha central, ou None quando a pista é plana.
+
+    Sem scale, a linha central mede kart_params['track_length'] metros. O
+    perfil é da pista, não de uma linha candidata: as racing lines o
+    consultam com ElevationProfile.along.
+    """
+    if not kart_params or not kart_params.get('height_map'):
+        return None
+    if scale is None:
+        points = as_points(centerline).astype(np.float64)
+        perimeter = np.linalg.norm(np.roll(points, -1, axis=0) - points, axis=1).sum()
+        scale = kart_params.get('track_length', perimeter) / perimeter
+    height_map = load_height_map(kart_params['height_map'],
+                                 kart_params.get('height_range', DEFAULT_HEIGHT_RANGE),
+                                 kart_params.get('image_shape'))
+    return height_map.profile(centerline, scale, kart_params.get('track_half_width', TRACK_HALF_WIDTH))
@@ -0,0 +1,135 @@
+import json
+import os
+import cv2
+import numpy as np
+
+# Janela de matiz onde procuramos o amarelo (OpenCV usa H em 0-179)
+YELLOW_HUE_RANGE = (15, 45)
+DEFAULT_LIMITS = (np.array([20, 200, 200]), np.array([40, 255, 255]))
+
+
+class HSVCalibrator:
+    """Calibra automaticamente os limites HSV do traçado amarelo a partir do histograma."""
+
+    def __init__(self, cache_path=None, max_side=400, min_saturation=160, min_value=64):
+        self.cache_path = cache_path
+        self.max_side = max_side
+        self.min_saturation = min_saturation
+        self.min_value = min_value
+        self.cache = {}
+        if cache_path is not None and os.path.exists(cache_path):
+            self._load_cache()
+
+    def calibrate(self, image, camera_id='default', force=False):
+        """Retorna (lower, upper) para a câmera, calculando apenas se não houver cache."""
+        if not force and camera_id in self.cache:
+            lower, upper = self.cache[camera_id]
+            return np.array(lower), np.array(upper)
+
+        hsv = cv2.cvtColor(self._downscale(image), cv2.COLOR_BGR2HSV)
+        best = None
+        best_score = -1.0
+        for lower, upper in self._candidates(hsv):
+            score = self.contour_quality(cv2.inRange(hsv, lower, upper))
+            if score > best_score:
+                best, best_score = (lower, upper), score
+
+        if best is None or best_score <= 0:
+            best = DEFAULT_LIMITS
+
+        self.cache[camera_id] = (best[0].tolist(), best[1].tolist())
+        if self.cache_path is not None:
+            self._save_cache()
+        return best[0].copy(), best[1].copy()
+
+    def _downscale(self, image):
+        """Reduz a imagem por amostragem com passo inteiro (um resize INTER_AREA custaria mais que a calibração)."""
+        step = int(np.ceil(max(image.shape[:2]) / self.max_side))
+        if step <= 1:
+            return image
+        return np.ascontiguousarray(image[::step, ::step])
+
+    def _candidates(self, hsv):
+        """Gera limites candidatos a partir do histograma H-S-V e de Otsu em S e V."""
+        hist = cv2.calcHist([hsv], [0, 1, 2], None, [180, 8, 8], [0, 180, 0, 256, 0, 256])
+        h_min, h_max = YELLOW_HUE_RANGE
+        # Apenas pixels saturados e claros contam para o pico de matiz
+        s_bin = self.min_saturation // 32
+        v_bin = self.min_value // 32
+        hue_profile = hist[h_min:h_max + 1, s_bin:, v_bin:].sum(axis=(1, 2))
+        if hue_profile.max() <= 0:
+            return []
+
+        peak = int(np.argmax(hue_profile))
+        # Expande a banda de matiz enquanto o histograma estiver acima de 10% do pico
+        threshold = 0.1 * hue_profile[peak]
+        lo = peak
+        while lo > 0 and hue_profile[lo - 1] >= threshold:
+            lo -= 1
+        hi = peak
+        while hi < len(hue_profile) - 1 and hue_profile[hi + 1] >= threshold:
+            hi += 1
+        h_lo, h_hi = h_min + lo, h_min + hi
+
+        band = (hsv[..., 0] >= h_lo) & (hsv[..., 0] <= h_hi)
+        s_values = hsv[..., 1][band]
+        if s_values.size == 0:
+            return []
+        s_otsu = self._otsu(s_values)
+        v_values = hsv[..., 2][band & (hsv[..., 1] >= s_otsu)]
+        v_otsu = self._otsu(v_values) if v_values.size else s_otsu
+
+        candidates = []
+        for margin in (0, 3):
+            for s_low, v_low in ((s_otsu, v_otsu), (max(s_otsu, 200), max(v_otsu, 200)),
+                                 (s_otsu // 2 + 64, v_otsu // 2 + 64)):
+                lower = np.array([max(0, h_lo - margin), s_low, v_low])
+                upper = np.array([min(179, h_hi + margin), 255, 255])
+                candidates.append((lower, upper))
+        return candidates
+
+    @staticmethod
+    def _otsu(values):
+        """Limiar de Otsu sobre um vetor de valores uint8."""
+        t, _ = cv2.threshold(values.reshape(-1, 1).astype(np.uint8), 0, 255,
+                             cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+        return int(t)
+
+    @staticmethod
+    def contour_quality(mask):
+        """Pontua a máscara pela área, fechamento e razão perímetro/área do maior contorno."""
+        contours, hierarchy = cv2.findContours(mask, cv2.RETR_CCOMP, cv2.CHAIN_APPROX_SIMPLE)
+        if not contours:
+            return 0.0
+
+        areas = np.array([cv2.contourArea(c) for c in contours])
+        outer = hierarchy[0][:, 3] < 0
+        areas_outer = np.where(outer, areas, 0)
+        main = int(np.argmax(areas_outer))
+        enclosed = areas_outer[main]
+        image_area = mask.shape[0] * mask.shape[1]
+        if enclosed < 0.01 * image_area:
+            return 0.0
+
+        # Fechamento: maior buraco dentro do contorno principal (traçado em laço)
+        holes = areas[hierarchy[0][:, 3] == main]
+        closedness = holes.max() / enclosed if holes.size else 0.0
+
+        # Fração dos pixels da máscara que pertencem ao componente principal
+        filled = enclosed - (holes.sum() if holes.size else 0.0)
+        dominance = min(1.0, filled / max(1.0, float(cv2.countNonZero(mask))))
+
+        # Traçado é uma faixa fina: perímetro/área alto demais indica ruído serrilhado
+        perimeter = cv2.arcLength(contours[main], True)
+        ratio = perimeter / np.sqrt(enclosed)
+        regularity = 1.0 / (1.0 + max(0.0, ratio - 10.0) / 10.0)
+
+        return float(dominance * (0.5 + 0.5 * closedness) * regularity)
+
+    def _load_cache(self):
+        with open(self.cache_path, 'r') as f:
+            self.cache = {k: (v[0], v[1]) for k, v in json.load(f).items()}
+
+    def _save_cache(self):
+        with open(self.cache_path, 'w') as f:
+            json.dump(self.cache, f)
@@ -1,26 +1,139 @@
 import cv2
 import numpy as np
+from .contour_refinement import refine_contour
 
-def detect_yellow_track(image, lower=None, upper=None):
+# Acima deste tamanho o kernel quadrado é decomposto em duas passadas 1D
+SEPARABLE_MIN_SIZE = 15
+# Margem (pixels) em volta da máscara limpa onde o refinamento procura a borda
+REFINE_MARGIN = 5
+
+def detect_yellow_track(image, lower=None, upper=None, morph_size=7, epsilon_factor=0.001,
+                        separable=None, refine=False):
+    """Contorno do traçado amarelo.
+
+    Com refine=True o contorno é extraído com todos os pontos
+    (CHAIN_APPROX_NONE), sem approxPolyDP, e cada ponto é levado à borda
+    sub-pixel do amarelo (yellowness) perto da máscara limpa; o retorno passa
+    a ser float64 (N, 1, 2).
+    """
+    if lower is None:
+        lower = np.array([20, 200, 200])
+    if upper is None:
+        upper = np.array([40, 255, 255])
+
+    hsv = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
+    mask = cv2.inRange(hsv, lower, upper)
+    channel = yellowness(hsv, lower, upper) if refine else None
+    return contour_from_mask(mask, morph_size, epsilon_factor, separable, refine, channel)
+
+def contour_from_mask(mask, morph_size=7, epsilon_factor=0.001, separable=None, refine=False, channel=None):
+    """Contorno do traçado a partir de uma máscara já limiarizada (mesmas opções de detect_yellow_track).
+
+    channel é a imagem contínua usada no refinamento; sem ela a borda é
+    procurada na máscara limpa suavizada.
+    """
+    if separable is None:
+        separable = morph_size >= SEPARABLE_MIN_SIZE
+
+    chain = cv2.CHAIN_APPROX_NONE if refine else cv2.CHAIN_APPROX_SIMPLE
+    cleaned = clean_mask(mask, morph_size, separable)
+    main_contour = _largest_contour(cleaned, chain)
+    if main_contour is None:
+        return None
+
+    edges = refinement_channel(cleaned, channel) if refine else None
+    return _finish_contour(main_contour, edges, epsilon_factor, refine)
+
+def yellowness(hsv, lower, upper):
+    """Quanto cada pixel é amarelo: min(S, V) dentro da faixa de matiz, 0 fora dela (float32).
+
+    Ao contrário da máscara de inRange, varia suavemente na borda
+    antisserrilhada da pintura.
+    """
+    hue = hsv[..., 0]
+    inside = (hue >= lower[0]) & (hue <= upper[0])
+    return np.where(inside, np.minimum(hsv[..., 1], hsv[..., 2]), 0).astype(np.float32)
+
+def refinement_channel(cleaned, channel=None, margin=REFINE_MARGIN):
+    """Imagem onde o refinamento procura a borda, restrita à vizinhança da máscara limpa.
+
+    Sem channel usa a própria máscara limpa com um leve borrão.
+    """
+    if channel is None:
+        return cv2.GaussianBlur(cleaned.astype(np.float32), (0, 0), 1.0)
+    region = cv2.dilate(cleaned, cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (2 * margin + 1,) * 2))
+    return np.where(region > 0, channel, 0).astype(np.float32)
+
+def detect_yellow_tracks(image, lower=None, upper=None, morph_size=7, epsilon_factor=0.001,
+                         separable=None, refine=False, min_area_ratio=0.05, min_area=200):
+    """Todos os traçados significativos da imagem (vários layouts, pit lane, pista dividida).
+
+    Mantém cada componente com área pintada de pelo menos min_area pixels e
+    min_area_ratio da área do maior; componentes dentro do buraco de outro
+    (um traçado no miolo de outro) também contam. Retorna a lista de
+    contornos em ordem decrescente de área pintada, cada um no formato de
+    detect_yellow_track.
+    """
     if lower is None:
         lower = np.array([20, 200, 200])
     if upper is None:
         upper = np.array([40, 255, 255])
-    
+    if separable is None:
+        separable = morph_size >= SEPARABLE_MIN_SIZE
+
     hsv = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
     mask = cv2.inRange(hsv, lower, upper)
-    
-    kernel = np.ones((7, 7), np.uint8)
-    mask = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, kernel)
-    mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, kernel)
-    
-    contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-    
+    cleaned = clean_mask(mask, morph_size, separable)
+    edges = refinement_channel(cleaned, yellowness(hsv, lower, upper)) if refine else None
+
+    chain = cv2.CHAIN_APPROX_NONE if refine else cv2.CHAIN_APPROX_SIMPLE
+    # RETR_CCOMP: bordas externas de todos os componentes no primeiro nível,
+    # inclusive os que estão dentro de buracos de outros
+    contours, hierarchy = cv2.findContours(cleaned, cv2.RETR_CCOMP, chain)
+    if not contours:
+        return []
+
+    # Área pintada de cada componente: área da borda externa menos a dos buracos,
+    # para que um anel grande não esconda uma pit lane estreita
+    parent = hierarchy[0][:, 3]
+    areas = np.array([cv2.contourArea(c) for c in contours])
+    ink = np.where(parent < 0, areas, 0.0)
+    np.subtract.at(ink, parent[parent >= 0], areas[parent >= 0])
+
+    outer = np.flatnonzero(parent < 0)
+    threshold = max(min_area, min_area_ratio * ink[outer].max())
+    order = outer[np.argsort(-ink[outer], kind='stable')]
+    return [_finish_contour(contours[i], edges, epsilon_factor, refine) for i in order if ink[i] >= threshold]
+
+def _finish_contour(contour, edges, epsilon_factor, refine):
+    """Refinamento sub-pixel (na imagem edges) ou simplificação com approxPolyDP"""
+    if refine:
+        return refine_contour(edges, contour)
+
+    epsilon = epsilon_factor * cv2.arcLength(contour, True)
+    return cv2.approxPolyDP(contour, epsilon, True)
+
+def clean_mask(mask, morph_size=7, separable=False):
+    """Aplica fechamento seguido de abertura com kernel quadrado"""
+    if not separable:
+        kernel = np.ones((morph_size, morph_size), np.uint8)
+        mask = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, kernel)
+        return cv2.morphologyEx(mask, cv2.MORPH_OPEN, kernel)
+
+    # O quadrado k x k é a soma de Minkowski de uma linha e uma coluna,
+    # então duas passadas 1D dão exatamente o mesmo resultado
+    row = np.ones((1, morph_size), np.uint8)
+    col = np.ones((morph_size, 1), np.uint8)
+    mask = cv2.dilate(cv2.dilate(mask, row), col)
+    mask = cv2.erode(cv2.erode(mask, row), col)
+    mask = cv2.erode(cv2.erode(mask, row), col)
+    return cv2.dilate(cv2.dilate(mask, row), col)
+
+def _largest_contour(cleaned, chain=cv2.CHAIN_APPROX_SIMPLE):
+    """Maior contorno externo da máscara já limpa"""
+    contours, _ = cv2.findContours(cleaned, cv2.RETR_EXTERNAL, chain)
+
     if not contours:
         return None
-    
-    main_contour = max(contours, key=cv2.contourArea)
-    epsilon = 0.001 * cv2.arcLength(main_contour, True)
-    approx = cv2.approxPolyDP(main_contour, epsilon, True)
-    
-    return approx
\ No newline at end of file
+
+    return max(contours, key=cv2.contourArea)
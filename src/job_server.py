@@ -0,0 +1,308 @@
+import argparse
+import asyncio
+import base64
+import collections
+import hashlib
+import io
+import json
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import parse_qsl, urlsplit
+
+import numpy as np
+
+from .pipeline import process_job
+
+MAX_BODY = 32 * 1024 * 1024
+KART_PARAM_NAMES = ('max_speed', 'friction_coeff', 'track_length')
+REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+           413: 'Payload Too Large', 500: 'Internal Server Error',
+           503: 'Service Unavailable', 504: 'Gateway Timeout'}
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class JobServer:
+    """Serviço local (HTTP sobre TCP ou socket Unix) que calcula racing lines num pool de processos.
+
+    Requisições idênticas em andamento compartilham o mesmo job; quando há mais
+    de max_workers + max_queue jobs pendentes novas requisições recebem 503.
+    """
+
+    def __init__(self, max_workers=2, max_queue=8, timeout=30.0, executor=None, history=1000):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.timeout = timeout
+        # forkserver evita que os workers herdem os sockets abertos das conexões
+        self.executor = executor or ProcessPoolExecutor(
+            max_workers=max_workers, mp_context=multiprocessing.get_context('forkserver'))
+        self._own_executor = executor is None
+        self._inflight = {}
+        self._server = None
+        self.counters = collections.Counter()
+        self.latencies = collections.defaultdict(lambda: collections.deque(maxlen=history))
+
+    async def start(self, host='127.0.0.1', port=8765, path=None):
+        if path is not None:
+            self._server = await asyncio.start_unix_server(self._handle, path=path)
+        else:
+            self._server = await asyncio.start_server(self._handle, host, port)
+        return self._server
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        if self._own_executor:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+
+    @property
+    def port(self):
+        return self._server.sockets[0].getsockname()[1]
+
+    async def submit(self, kind, data, kart_params=None):
+        """Enfileira um job (ou reaproveita um idêntico em andamento) e aguarda o resultado."""
+        key = self._job_key(kind, data, kart_params)
+        job = self._inflight.get(key)
+        if job is None:
+            if len(self._inflight) >= self.max_workers + self.max_queue:
+                self.counters['rejected'] += 1
+                raise HTTPError(503, "Fila cheia, tente novamente")
+            loop = asyncio.get_running_loop()
+            task = self.executor.submit(process_job, kind, data, kart_params)
+            future = asyncio.wrap_future(task, loop=loop)
+            # Resultado de um job abandonado por timeout não precisa ser lido
+            future.add_done_callback(lambda f: f.cancelled() or f.exception())
+            job = {'task': task, 'future': future, 'waiters': 0}
+            self._inflight[key] = job
+            # O job só deixa de contar quando o worker termina de fato: cancel()
+            # não interrompe um job que já está rodando no pool
+            task.add_done_callback(lambda _: self._release(loop, key))
+        else:
+            self.counters['dedup_hits'] += 1
+
+        job['waiters'] += 1
+        start = time.perf_counter()
+        try:
+            result = await asyncio.wait_for(asyncio.shield(job['future']), self.timeout)
+        except asyncio.TimeoutError:
+            self.counters['timeouts'] += 1
+            # Sem ninguém esperando, o job ainda na fila pode ser descartado; se já
+            # estiver rodando continua contando para a fila até terminar
+            if job['waiters'] == 1:
+                job['task'].cancel()
+            raise HTTPError(504, "Tempo limite excedido")
+        finally:
+            job['waiters'] -= 1
+
+        total = time.perf_counter() - start
+        self._record('total', total)
+        for stage, seconds in result['stages'].items():
+            self._record(stage, seconds)
+        self._record('queue', max(0.0, total - result['stages'].get('worker', 0.0)))
+        self.counters['completed'] += 1
+        return result
+
+    def _release(self, loop, key):
+        """Chamado na thread do executor quando o job termina ou é cancelado."""
+        try:
+            loop.call_soon_threadsafe(self._inflight.pop, key, None)
+        except RuntimeError:
+            pass  # Loop já encerrado
+
+    def metrics(self):
+        stages = {}
+        for stage, values in self.latencies.items():
+            if values:
+                arr = np.fromiter(values, dtype=np.float64)
+                stages[stage] = {'count': len(arr), 'mean': float(arr.mean()),
+                                 'p50': float(np.percentile(arr, 50)),
+                                 'p95': float(np.percentile(arr, 95))}
+        return {
+            'in_flight': len(self._inflight),
+            'queue_depth': max(0, len(self._inflight) - self.max_workers),
+            'max_pending': self.max_workers + self.max_queue,
+            'counters': dict(self.counters),
+            'stages': stages,
+        }
+
+    def _record(self, stage, seconds):
+        self.latencies[stage].append(seconds)
+
+    @staticmethod
+    def _job_key(kind, data, kart_params):
+        digest = hashlib.sha256(kind.encode())
+        digest.update(data if isinstance(data, bytes) else np.ascontiguousarray(data).tobytes())
+        digest.update(json.dumps(kart_params or {}, sort_keys=True).encode())
+        return digest.hexdigest()
+
+    async def _handle(self, reader, writer):
+        try:
+            try:
+                method, target, headers, body = await self._read_request(reader)
+                status, content_type, payload = await self._route(method, target, headers, body)
+            except HTTPError as e:
+                status, content_type = e.status, 'application/json'
+                payload = json.dumps({'error': str(e)}).encode()
+            except ValueError as e:
+                self.counters['failed'] += 1
+                status, content_type = 400, 'application/json'
+                payload = json.dumps({'error': str(e)}).encode()
+            except Exception as e:
+                self.counters['failed'] += 1
+                status, content_type = 500, 'application/json'
+                payload = json.dumps({'error': str(e)}).encode()
+
+            head = (f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+                    f"Content-Type: {content_type}\r\n"
+                    f"Content-Length: {len(payload)}\r\n"
+                    "Connection: close\r\n")
+            if status == 503:
+                head += "Retry-After: 1\r\n"
+            writer.write(head.encode() + b"\r\n" + payload)
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def _read_request(self, reader):
+        request_line = await reader.readline()
+        parts = request_line.decode('latin-1').split()
+        if len(parts) != 3:
+            raise HTTPError(400, "Requisição inválida")
+        method, target, _ = parts
+
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+        length = int(headers.get('content-length', 0))
+        if length > MAX_BODY:
+            raise HTTPError(413, "Corpo da requisição grande demais")
+        body = await reader.readexactly(length) if length else b""
+        return method, target, headers, body
+
+    async def _route(self, method, target, headers, body):
+        url = urlsplit(target)
+        query = dict(parse_qsl(url.query))
+        self.counters['requests'] += 1
+
+        if url.path == '/metrics':
+            return 200, 'application/json', json.dumps(self.metrics()).encode()
+        if url.path == '/health':
+            return 200, 'application/json', b'{"status": "ok"}'
+        if url.path != '/racing-line':
+            raise HTTPError(404, "Rota desconhecida")
+        if method != 'POST':
+            raise HTTPError(405, "Use POST")
+
+        kind, data, kart_params = self._parse_job(headers, body, query)
+        result = await self.submit(kind, data, kart_params)
+
+        wants_npz = query.get('format') == 'npz' or 'application/x-npz' in headers.get('accept', '')
+        if wants_npz:
+            return 200, 'application/x-npz', encode_npz(result)
+        return 200, 'application/json', json.dumps(encode_json(result)).encode()
+
+    @staticmethod
+    def _parse_job(headers, body, query):
+        """Aceita JSON ({image: base64} ou {contour: [[x, y], ...]}) ou a imagem crua no corpo."""
+        content_type = headers.get('content-type', '')
+        if content_type.startswith('application/json'):
+            try:
+                request = json.loads(body)
+            except ValueError:
+                raise HTTPError(400, "JSON inválido")
+            kart_params = JobServer._kart_params(request.get('kart_params'))
+            if request.get('contour') is not None:
+                contour = np.asarray(request['contour'], dtype=np.int32).reshape(-1, 1, 2)
+                return 'contour', contour, kart_params
+            if request.get('image') is not None:
+                return 'image', base64.b64decode(request['image']), kart_params
+            raise HTTPError(400, "Informe 'image' ou 'contour'")
+
+        if not body:
+            raise HTTPError(400, "Corpo vazio")
+        kart_params = JobServer._kart_params({name: query[name] for name in KART_PARAM_NAMES if name in query})
+        return 'image', body, kart_params
+
+    @staticmethod
+    def _kart_params(values):
+        """Só os nomes de KART_PARAM_NAMES, convertidos em float positivo; o resto vira 400.
+
+        Caminhos de arquivo (height_map) e modelos de kart não vêm de clientes.
+        """
+        if not values:
+            return None
+        if not isinstance(values, dict):
+            raise HTTPError(400, "kart_params deve ser um objeto")
+        unknown = sorted(set(values) - set(KART_PARAM_NAMES))
+        if unknown:
+            raise HTTPError(400, f"Parâmetros não permitidos: {', '.join(map(str, unknown))}")
+        try:
+            params = {name: float(value) for name, value in values.items()}
+        except (TypeError, ValueError):
+            raise HTTPError(400, "kart_params devem ser números")
+        if not all(np.isfinite(value) and value > 0 for value in params.values()):
+            raise HTTPError(400, "kart_params devem ser números positivos")
+        return params
+
+
+def encode_json(result):
+    """Converte o resultado do pipeline em tipos serializáveis."""
+    def to_list(arr):
+        return None if arr is None else np.asarray(arr).reshape(-1, 2).tolist()
+    return {'contour': to_list(result['contour']),
+            'racing_line': to_list(result['racing_line']),
+            'lap_time': result['lap_time'],
+            'stages': result['stages']}
+
+
+def encode_npz(result):
+    """Empacota contorno, racing line e tempo em um .npz binário."""
+    buffer = io.BytesIO()
+    arrays = {name: np.asarray(result[name]) for name in ('contour', 'racing_line')
+              if result[name] is not None}
+    arrays['lap_time'] = np.array(np.nan if result['lap_time'] is None else result['lap_time'])
+    np.savez(buffer, **arrays)
+    return buffer.getvalue()
+
+
+async def serve(host, port, path, workers, queue, timeout):
+    server = JobServer(max_workers=workers, max_queue=queue, timeout=timeout)
+    srv = await server.start(host, port, path)
+    print(f"Servidor de racing line ouvindo em {path or f'{host}:{port}'}")
+    try:
+        async with srv:
+            await srv.serve_forever()
+    finally:
+        await server.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Servidor local de racing lines")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--unix-socket', default=None, help="Caminho de socket Unix (substitui host/porta)")
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--queue', type=int, default=8, help="Jobs extras aceitos além dos workers")
+    parser.add_argument('--timeout', type=float, default=30.0)
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args.host, args.port, args.unix_socket, args.workers, args.queue, args.timeout))
+    except KeyboardInterrupt:
+        print("Servidor encerrado!")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,7 @@
 import numpy as np
 import math
+from .track_data import Polyline, as_points
+from .vehicle_model import vehicle_envelope
 
 class RacingLineCalculator:
     def __init__(self, max_speed=55/3.6, friction_coeff=1.5):  # max_speed em m/s
@@ -36,8 +38,8 @@ class RacingLineCalculator:
         
     def calculate_curvatures(self, points):
         """Calcula a curvatura para cada ponto na curva simplificada."""
-        curvatures = []
         n = len(points)
+        curvatures = np.empty(n)
         for i in range(n):
             # Pontos anteriores e posteriores
             prev = points[i-1] if i > 0 else points[0]
@@ -67,7 +69,7 @@ class RacingLineCalculator:
             else:
                 curvature = 0
                 
-            curvatures.append(curvature)
+            curvatures[i] = curvature
             
         return curvatures
         
@@ -84,8 +86,8 @@ class RacingLineCalculator:
         curvatures = self.calculate_curvatures(simplified)
         
         # Gerar racing line
-        racing_line = []
         n = len(simplified)
+        racing_line = Polyline.empty(n)
         for i in range(n):
             curvature = curvatures[i]
             # Deslocamento lateral: quanto mais curva, mais para o lado externo
@@ -101,9 +103,9 @@ class RacingLineCalculator:
                 if norm > 0:
                     normal = normal / norm
                 new_point = simplified[i] + displacement * normal
-            racing_line.append(new_point)
+            racing_line[i] = new_point
             
-        return np.array(racing_line)
+        return racing_line.points
         
     def _calculate_displacement(self, curvature):
         if curvature < 1e-5:
@@ -114,4 +116,131 @@ class RacingLineCalculator:
         if radius > min_radius:
             return 0
         # Deslocamento proporcional à necessidade
-        return min_radius - radius  # Apenas um exemplo, pode ser ajustado
\ No newline at end of file
+        return min_radius - radius  # Apenas um exemplo, pode ser ajustado
+
+
+def curvature_profile(points, closed=True):
+    """Curvatura com sinal (1/raio) em cada ponto pelo círculo que passa pelos vizinhos."""
+    points = np.asarray(as_points(points), dtype=np.float64)
+    prev = np.roll(points, 1, axis=-2)
+    next_ = np.roll(points, -1, axis=-2)
+    if not closed:
+        prev[..., 0, :] = points[..., 0, :]
+        next_[..., -1, :] = points[..., -1, :]
+
+    d1 = points - prev
+    d2 = next_ - points
+    a = np.linalg.norm(d1, axis=-1)
+    b = np.linalg.norm(d2, axis=-1)
+    c = np.linalg.norm(next_ - prev, axis=-1)
+    cross = d1[..., 0] * d2[..., 1] - d1[..., 1] * d2[..., 0]
+    # k = 4 * área / (a * b * c) = 2 * (d1 x d2) / (a * b * c)
+    denom = a * b * c
+    valid = denom > 1e-12
+    return np.where(valid, 2 * cross / np.where(valid, denom, 1.0), 0.0)
+
+
+def velocity_profile(points, max_speed=55/3.6, friction_coeff=1.5, scale=1.0, closed=True, g=9.8,
+                     envelope=None, grade=None, bank=None):
+    """Perfil de velocidade (m/s) limitado pela aderência lateral e longitudinal.
+
+    points tem forma (N, 2) ou (..., N, 2) em pixels e scale converte pixels em
+    metros; max_speed, friction_coeff e scale aceitam as dimensões de lote de
+    points, de modo que várias variantes são avaliadas numa única passada.
+    Com envelope (GGVEnvelope de vehicle_model) os limites de curva, aceleração
+    e frenagem saem das tabelas do modelo (friction_coeff já entra nelas como
+    escala da aderência, ver vehicle_envelope); max_speed continua valendo
+    como limitador.
+    grade (rampa do segmento i -> i+1) e bank (inclinação transversal, positiva
+    descendo para o lado da curvatura positiva), em radianos, vêm de
+    ElevationProfile.along: a gravidade entra na aceleração e na frenagem e a
+    inclinação sustenta parte da força lateral na curva.
+    Retorna (velocidades em cada ponto, comprimento em metros de cada segmento).
+    """
+    points = np.asarray(as_points(points), dtype=np.float64)
+    scale = np.asarray(scale, dtype=np.float64)[..., None]
+    max_speed = np.asarray(max_speed, dtype=np.float64)[..., None]
+    mu_g = np.asarray(friction_coeff, dtype=np.float64)[..., None] * g
+
+    signed = curvature_profile(points, closed) / scale
+    curvature = np.abs(signed)
+    ds = np.linalg.norm(np.roll(points, -1, axis=-2) - points, axis=-1) * scale
+    if not closed:
+        ds[..., -1] = 0.0
+
+    # Aceleração lateral dada pela inclinação, a favor quando a curva vira para o lado baixo,
+    # e componente da gravidade ao longo de cada segmento
+    bank_g = 0.0 if bank is None else g * np.tan(bank) * np.sign(signed)
+    slope_g = 0.0 if grade is None else g * np.sin(grade)
+
+    # Limite em curva: v = sqrt((mu * g + g * tan(bank)) / k)
+    if envelope is None:
+        v = np.minimum(max_speed, np.sqrt(np.maximum(mu_g + bank_g, 0.0) / np.maximum(curvature, 1e-12)))
+    else:
+        v = np.minimum(max_speed, envelope.corner_speed(curvature, bank_g))
+    shape = np.broadcast_shapes(v.shape, ds.shape, mu_g.shape, np.shape(bank_g), np.shape(slope_g))
+    v = np.array(np.broadcast_to(v, shape))
+    ds = np.broadcast_to(ds, shape)
+    curvature = np.broadcast_to(curvature, shape)
+    bank_g = np.broadcast_to(bank_g, shape)
+    slope_g = np.broadcast_to(slope_g, shape)
+    mu_g = np.broadcast_to(mu_g, shape[:-1] + (1,))[..., 0]
+    n = shape[-1]
+
+    # Passadas de aceleração e frenagem no círculo de atrito; em pista fechada
+    # duas voltas garantem a continuidade na linha de chegada
+    laps = 2 if closed else 1
+    forward = list(range(n)) * laps if closed else list(range(n - 1))
+    for i in forward:
+        j = (i + 1) % n
+        a_lat = v[..., i] ** 2 * curvature[..., i] - bank_g[..., i]
+        if envelope is None:
+            a_long = np.sqrt(np.maximum(mu_g ** 2 - a_lat ** 2, 0.0))
+        else:
+            a_long = envelope.acceleration(v[..., i], a_lat)
+        a_long = a_long - slope_g[..., i]
+        v[..., j] = np.minimum(v[..., j],
+                               np.sqrt(np.maximum(v[..., i] ** 2 + 2 * a_long * ds[..., i], 0.0)))
+    backward = list(range(n - 1, -1, -1)) * laps if closed else list(range(n - 1, 0, -1))
+    for i in backward:
+        j = (i - 1) % n
+        a_lat = v[..., i] ** 2 * curvature[..., i] - bank_g[..., i]
+        if envelope is None:
+            a_long = np.sqrt(np.maximum(mu_g ** 2 - a_lat ** 2, 0.0))
+        else:
+            a_long = envelope.braking(v[..., i], a_lat)
+        # Subida ajuda a frear: o segmento j -> i é percorrido no sentido da volta
+        a_long = a_long + slope_g[..., j]
+        v[..., j] = np.minimum(v[..., j], np.sqrt(np.maximum(v[..., i] ** 2 + 2 * a_long * ds[..., j], 0.0)))
+
+    return v, ds
+
+
+def segment_times(v, ds):
+    """Tempo em cada segmento usando a velocidade média das extremidades."""
+    v_mean = 0.5 * (v + np.roll(v, -1, axis=-1))
+    return ds / np.maximum(v_mean, 1e-6)
+
+
+def estimate_lap_time(points, kart_params, closed=True, elevation=None):
+    """Tempo de volta (s) sobre a linha, escalada para kart_params['track_length'] metros.
+
+    Com elevation (ElevationProfile da linha central, ver
+    elevation.track_elevation) rampas e inclinações da pista entram no perfil
+    de velocidade; o mapa não é amostrado aqui.
+    """
+    points = np.asarray(as_points(points), dtype=np.float64)
+    if len(points) < 3:
+        return None
+
+    perimeter = np.linalg.norm(np.roll(points, -1, axis=0) - points, axis=1).sum()
+    if perimeter <= 0:
+        return None
+    scale = kart_params.get('track_length', perimeter) / perimeter
+    grade = bank = None
+    if elevation is not None:
+        _, grade, bank = elevation.along(points, scale)
+    v, ds = velocity_profile(points, kart_params.get('max_speed', 55/3.6),
+                             kart_params.get('friction_coeff', 1.5), scale, closed,
+                             envelope=vehicle_envelope(kart_params), grade=grade, bank=bank)
+    return float(segment_times(v, ds).sum())
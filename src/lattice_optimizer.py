@@ -0,0 +1,202 @@
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from .elevation import track_elevation
+from .kart_physics import curvature_profile, segment_times, velocity_profile
+from .track_data import Polyline, as_points
+from .vehicle_model import vehicle_envelope
+
+G = 9.8
+
+
+def station_frames(centerline):
+    """Normais unitárias e curvatura com sinal em cada estação da linha central."""
+    points = as_points(centerline).astype(np.float64)
+    tangent = np.roll(points, -1, axis=0) - np.roll(points, 1, axis=0)
+    tangent /= np.maximum(np.linalg.norm(tangent, axis=1, keepdims=True), 1e-12)
+    normal = np.column_stack((-tangent[:, 1], tangent[:, 0]))
+    return points, normal, curvature_profile(points)
+
+
+def transition_costs(points, normal, curvature, offsets, window, scale, max_speed, friction_coeff,
+                     smoothing=0.05, envelope=None, elevation=None):
+    """Tempo (s) de cada transição (i, k) -> (i+1, k+d) com |d| <= window.
+
+    offsets tem forma (N, K) em pixels. A curvatura do caminho é aproximada pela
+    curva paralela à linha central, k / (1 - n k), o que mantém o custo de
+    primeira ordem e o DP em O(N * K * window). Retorna (N, K, 2*window+1),
+    com infinito nas transições que saem da grade. Com envelope (GGVEnvelope)
+    a velocidade em curva vem da tabela do modelo de kart. Com elevation
+    (ElevationProfile da linha central) a inclinação transversal entra no
+    limite em curva, como em velocity_profile, e a rampa alonga o trecho.
+    """
+    n_st, n_off = offsets.shape
+    lattice = points[:, None, :] + offsets[..., None] * normal[:, None, :]
+    shifts = np.arange(-window, window + 1)
+    target = np.arange(n_off)[:, None] + shifts[None, :]
+    valid = (target >= 0) & (target < n_off)
+    target = np.clip(target, 0, n_off - 1)
+
+    nxt = np.roll(np.arange(n_st), -1)
+    dest = lattice[nxt][:, target]                       # (N, K, D, 2)
+    ds = np.linalg.norm(dest - lattice[:, :, None, :], axis=-1) * scale
+
+    mean_offset = 0.5 * (offsets[:, :, None] + offsets[nxt][:, target])
+    k = curvature[:, None, None]
+    k_path = np.abs(k / np.maximum(1.0 - mean_offset * k, 0.05)) / scale
+    bank_g = 0.0
+    if elevation is not None:
+        # Nós da grade como K linhas paralelas (K, N, 2) para consultar o perfil
+        height, _, bank = elevation.along(lattice.transpose(1, 0, 2), scale)
+        height, bank = height.T, bank.T
+        rise = height[nxt][:, target] - height[:, :, None]
+        ds = np.hypot(ds, rise)
+        bank_g = (G * np.tan(bank) * np.sign(curvature)[:, None])[:, :, None]
+    if envelope is None:
+        v = np.minimum(max_speed, np.sqrt(np.maximum(friction_coeff * G + bank_g, 0.0) /
+                                          np.maximum(k_path, 1e-12)))
+    else:
+        v = np.minimum(max_speed, envelope.corner_speed(k_path, np.broadcast_to(bank_g, k_path.shape)))
+
+    # Penaliza ziguezague lateral, que a aproximação de primeira ordem não enxerga
+    lateral = (offsets[nxt][:, target] - offsets[:, :, None]) * scale
+    cost = ds / v + smoothing * lateral ** 2 / np.maximum(ds, 1e-6)
+    return np.where(valid[None], cost, np.inf)
+
+
+def solve_lattice(costs, start=None, end=None):
+    """DP sobre a grade (estação x deslocamento), de 0 até N (fechando em 0).
+
+    start/end fixam o índice de deslocamento na primeira estação e na chegada.
+    Retorna (índices por estação, custo total).
+    """
+    n_st, n_off, n_shift = costs.shape
+    window = n_shift // 2
+    shifts = np.arange(-window, window + 1)
+
+    value = np.zeros(n_off)
+    if start is not None:
+        value = np.full(n_off, np.inf)
+        value[start] = 0.0
+    back = np.empty((n_st, n_off), dtype=np.int64)
+
+    for i in range(n_st):
+        # Chegar em j vindo de j - d com custo costs[i, j - d, d]
+        source = np.arange(n_off)[:, None] - shifts[None, :]
+        ok = (source >= 0) & (source < n_off)
+        source = np.clip(source, 0, n_off - 1)
+        total = np.where(ok, value[source] + costs[i, source, np.arange(n_shift)[None, :]], np.inf)
+        choice = np.argmin(total, axis=1)
+        back[i] = source[np.arange(n_off), choice]
+        value = total[np.arange(n_off), choice]
+
+    last = int(np.argmin(value)) if end is None else end
+    path = np.empty(n_st, dtype=np.int64)
+    node = last
+    for i in range(n_st - 1, -1, -1):
+        node = back[i, node]
+        path[i] = node
+    return path, float(value[last])
+
+
+def _solve_closed(costs):
+    """Pista fechada: resolve livre, depois fixa largada = chegada no índice encontrado."""
+    path, _ = solve_lattice(costs)
+    return solve_lattice(costs, start=path[0], end=path[0])[0]
+
+
+def _solve_segment(args):
+    costs, start, end = args
+    return solve_lattice(costs, start=start, end=end)[0]
+
+
+def split_at_straights(curvature, parts, straight_curvature=0.005):
+    """Estações no meio das retas mais longas, usadas como pontos de corte."""
+    straight = np.abs(curvature) < straight_curvature
+    if straight.all() or not straight.any():
+        return np.linspace(0, len(curvature), parts, endpoint=False).astype(int)
+    shift = int(np.argmin(straight))
+    rolled = np.roll(straight, -shift).astype(np.int8)
+    edges = np.diff(np.concatenate(([0], rolled, [0])))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+    order = np.argsort(ends - starts)[::-1][:parts]
+    middles = (starts[order] + ends[order]) // 2 + shift
+    return np.sort(middles % len(curvature))
+
+
+def optimize_racing_line(centerline, kart_params, track_width=8.0, num_offsets=15, window=2,
+                         refine=False, coarse_step=4, workers=1):
+    """Linha de tempo mínimo por programação dinâmica numa grade lateral.
+
+    centerline: saída de calculate_centerline; track_width em metros.
+    refine: resolve primeiro numa grade grossa (uma estação a cada coarse_step)
+    e depois numa faixa estreita em volta dessa solução.
+    workers > 1: corta a pista no meio das retas mais longas, com o
+    deslocamento nesses pontos fixado pela solução grossa, e resolve os
+    trechos em paralelo.
+    Com kart_params['height_map'] o perfil de altitude é montado uma vez na
+    linha central e vale para as arestas da grade e para o tempo final.
+    Retorna (racing line (N, 1, 2), tempo de volta estimado).
+    """
+    points, normal, curvature = station_frames(centerline)
+    perimeter = np.linalg.norm(np.roll(points, -1, axis=0) - points, axis=1).sum()
+    scale = kart_params.get('track_length', perimeter) / perimeter
+    max_speed = kart_params.get('max_speed', 55/3.6)
+    friction = kart_params.get('friction_coeff', 1.5)
+    envelope = vehicle_envelope(kart_params)
+    elevation = track_elevation(kart_params, points, scale)
+    half = 0.5 * track_width / scale
+    base_offsets = np.linspace(-half, half, num_offsets)
+    n_st = len(points)
+
+    if refine or workers > 1:
+        # Solução grossa: menos estações, mesma largura
+        idx = np.arange(0, n_st, coarse_step)
+        coarse_pts, coarse_normal, coarse_curv = station_frames(points[idx])
+        coarse_costs = transition_costs(coarse_pts, coarse_normal, coarse_curv,
+                                        np.tile(base_offsets, (len(idx), 1)), window,
+                                        scale, max_speed, friction, envelope=envelope,
+                                        elevation=elevation)
+        coarse_path = _solve_closed(coarse_costs)
+        guide = np.interp(np.arange(n_st), np.append(idx, n_st),
+                          np.append(base_offsets[coarse_path], base_offsets[coarse_path[0]]))
+    else:
+        guide = np.zeros(n_st)
+
+    if refine:
+        # Faixa fina em volta da solução grossa, limitada às bordas da pista
+        band = 2.0 * (base_offsets[1] - base_offsets[0])
+        offsets = np.clip(guide[:, None] + np.linspace(-band, band, num_offsets)[None, :], -half, half)
+    else:
+        offsets = np.tile(base_offsets, (n_st, 1))
+
+    costs = transition_costs(points, normal, curvature, offsets, window, scale, max_speed, friction,
+                             envelope=envelope, elevation=elevation)
+
+    if workers > 1:
+        cuts = split_at_straights(curvature / scale, workers)
+        fixed = np.abs(offsets[cuts] - guide[cuts, None]).argmin(axis=1)
+        jobs = []
+        for j, cut in enumerate(cuts):
+            nxt = cuts[(j + 1) % len(cuts)]
+            stations = np.arange(cut, nxt if nxt > cut else nxt + n_st) % n_st
+            jobs.append((costs[stations], fixed[j], fixed[(j + 1) % len(cuts)]))
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            parts = list(executor.map(_solve_segment, jobs))
+        path = np.empty(n_st, dtype=np.int64)
+        for j, cut in enumerate(cuts):
+            stations = (cut + np.arange(len(parts[j]))) % n_st
+            path[stations] = parts[j]
+    else:
+        path = _solve_closed(costs)
+
+    racing_line = Polyline.empty(n_st)
+    racing_line[:] = points + offsets[np.arange(n_st), path][:, None] * normal
+
+    grade = bank = None
+    if elevation is not None:
+        _, grade, bank = elevation.along(racing_line.points, scale)
+    v, ds = velocity_profile(racing_line.points, max_speed, friction, scale, envelope=envelope,
+                             grade=grade, bank=bank)
+    lap_time = float(segment_times(v, ds).sum())
+    return racing_line.as_cv(), lap_time
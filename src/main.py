@@ -2,9 +2,15 @@ import cv2
 import os
 import numpy as np
 from .color_optimizer import ColorOptimizer
-from .racing_line_processor import process_image
+from .racing_line_processor import compute_track, render_results, render_tracks
+from .pipeline import KART_PARAMS, image_kart_params, run_multi_pipeline
+from .track_fingerprint import TrackLibrary, compute_fingerprint, params_key
+from .kart_physics import estimate_lap_time
+from .elevation import track_elevation
+from .track_segments import TrackSegmentation, format_segments, segment_track
 
-def main():
+def main(multi_track=False):
+    """Processa input_images; com multi_track cada traçado da imagem vira uma pista separada"""
     # Configurações - caminhos absolutos
     base_dir = os.path.dirname(os.path.abspath(__file__))
     project_dir = os.path.dirname(base_dir)  # Diretório raiz do projeto
@@ -12,6 +18,9 @@ def main():
     input_folder = os.path.join(project_dir, 'input_images')
     output_folder = os.path.join(project_dir, 'output_images')
     intermediate_folder = os.path.join(project_dir, 'intermediate')
+    library_folder = os.path.join(project_dir, 'track_library')
+    # Mapas de altura alinhados com as imagens: height_maps/<nome da imagem>.png
+    height_map_folder = os.path.join(project_dir, 'height_maps')
     
     # Cria as pastas se não existirem
     os.makedirs(input_folder, exist_ok=True)
@@ -20,11 +29,10 @@ def main():
     
     # Inicializar otimizador de cor
     color_optimizer = ColorOptimizer()
-    kart_params = {
-        'max_speed': 55/3.6,  # 55 km/h -> m/s
-        'friction_coeff': 1.5,
-        'track_length': 943  # Comprimento da pista em metros
-    }
+    kart_params = dict(KART_PARAMS)
+    
+    # Pistas já processadas em sessões anteriores
+    library = TrackLibrary(library_folder)
     
     # Processar cada imagem na pasta
     image_files = [f for f in os.listdir(input_folder) if f.lower().endswith(('.png', '.jpg', '.jpeg'))]
@@ -44,12 +52,44 @@ def main():
             print(f"Erro ao carregar imagem: {image_path}")
             continue
         
-        # Processar a imagem
-        result_img, yellow_only, racing_only, lap_time = process_image(image, color_optimizer, kart_params)
+        track_params = image_kart_params(kart_params, image, image_file, height_map_folder)
+        if 'height_map' in track_params:
+            print(f"  Usando mapa de altura: {track_params['height_map']}")
+        
+        if multi_track:
+            process_multi_track(image, image_file, color_optimizer, track_params,
+                                output_folder, intermediate_folder)
+            continue
+        
+        # Reaproveitar o traçado se a pista já é conhecida e não mudou
+        fingerprint = compute_fingerprint(image)
+        known = library.match(fingerprint, image)
+        
+        if known is not None:
+            contour, racing_line = known['contour'], known['racing_line']
+            if str(known['params_key']) == params_key(track_params):
+                lap_time = None if np.isnan(known['lap_time']) else float(known['lap_time'])
+            else:
+                lap_time = estimate_lap_time(racing_line, track_params,
+                                             elevation=track_elevation(track_params, contour))
+            # Entradas gravadas antes da segmentação não a trazem
+            segments = TrackSegmentation.from_arrays(known)
+            if segments is None:
+                segments = segment_track(racing_line, track_length=track_params['track_length'])
+            dx, dy = known['shift']
+            print(f"  Pista já conhecida ({known['name']}), reaproveitando o traçado "
+                  f"(deslocamento {dx:+.0f}, {dy:+.0f} px)")
+        else:
+            contour, racing_line, lap_time = compute_track(image, color_optimizer, track_params)
+            if contour is not None:
+                # Atualizar otimizador apenas com pistas novas ou modificadas
+                color_optimizer.update(image)
+                segments = segment_track(racing_line, track_length=track_params['track_length'])
+                library.add(os.path.splitext(image_file)[0], fingerprint, contour, racing_line,
+                            lap_time, track_params, segments, image)
         
-        if result_img is not None:
-            # Atualizar otimizador com a imagem original
-            color_optimizer.update(image)
+        if contour is not None:
+            result_img, yellow_only, racing_only = render_results(image, contour, racing_line)
             
             # Salvar resultados
             processed_path = os.path.join(output_folder, f"processed_{image_file}")
@@ -65,8 +105,33 @@ def main():
             print(f"  Racing line salvo em: {racing_path}")
             if lap_time is not None:
                 print(f"  Tempo estimado: {lap_time:.2f} segundos")
+            for line in format_segments(segments, track_params['braking_distance']).splitlines():
+                print(f"  {line}")
     
     print("Processamento concluído!")
 
+def process_multi_track(image, image_file, color_optimizer, kart_params, output_folder, intermediate_folder):
+    """Um pipeline por traçado; a imagem é lida e a saída anotada gravada uma única vez"""
+    lower, upper = color_optimizer.get_limits()
+    tracks = run_multi_pipeline(image, kart_params, lower, upper)
+    if not tracks:
+        print("  Nenhum traçado encontrado")
+        return
+    
+    color_optimizer.update(image)
+    stem = os.path.splitext(image_file)[0]
+    for i, track in enumerate(tracks, 1):
+        # Dados de cada traçado em arquivos separados
+        track_path = os.path.join(intermediate_folder, f"track{i}_{stem}.npz")
+        np.savez(track_path, contour=track['contour'], racing_line=track['racing_line'],
+                 lap_time=np.nan if track['lap_time'] is None else track['lap_time'],
+                 track_length=track['track_length'])
+        lap = "-" if track['lap_time'] is None else f"{track['lap_time']:.2f} s"
+        print(f"  Traçado {i}: {track['track_length']:.0f} m, tempo estimado {lap} ({track_path})")
+    
+    processed_path = os.path.join(output_folder, f"processed_{image_file}")
+    cv2.imwrite(processed_path, render_tracks(image, tracks))
+    print(f"  Resultado final salvo em: {processed_path}")
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,143 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+import cv2
+import numpy as np
+from .image_processor import detect_yellow_track, detect_yellow_tracks
+from .contour_refinement import resample_uniform
+from .track_geometry import calculate_centerline, generate_racing_line
+from .elevation import DEFAULT_HEIGHT_RANGE, track_elevation
+from .kart_physics import estimate_lap_time
+
+DEFAULT_KART_PARAMS = {
+    'max_speed': 55/3.6,  # 55 km/h -> m/s
+    'friction_coeff': 1.5,
+    'track_length': 943  # Comprimento da pista em metros
+}
+
+# Kart completo usado pelas ferramentas de linha de comando (main, sensitivity)
+KART_PARAMS = dict(DEFAULT_KART_PARAMS, **{
+    'kart_class': 'rental',  # Modelo de kart (ver vehicle_model.py)
+    'mass': 160,  # kg (kart + piloto)
+    'braking_distance': 15,  # metros antes de cada curva
+    'height_range': DEFAULT_HEIGHT_RANGE  # altitudes (m) do preto e do branco do mapa de altura
+})
+
+
+def image_kart_params(kart_params, image, image_file, height_map_folder):
+    """kart_params da imagem: com height_maps/<nome>.png alinhado a ela, inclui o mapa de altura"""
+    track_params = dict(kart_params)
+    height_path = os.path.join(height_map_folder, os.path.splitext(image_file)[0] + '.png')
+    if os.path.exists(height_path):
+        track_params.update(height_map=height_path, image_shape=list(image.shape[:2]))
+    return track_params
+
+
+def run_pipeline(image=None, contour=None, kart_params=None, lower=None, upper=None, num_points=100,
+                 refine=False, spacing=None):
+    """Executa detecção, racing line e tempo de volta.
+
+    Recebe uma imagem BGR ou um contorno já extraído. refine ativa o contorno
+    sub-pixel; com spacing (metros) a linha central é reamostrada com
+    espaçamento uniforme em vez de num_points pontos. Com
+    kart_params['height_map'] o mapa de altura é amostrado uma vez ao longo da
+    linha central (em cache por pista) e rampas e inclinações entram no tempo
+    de volta. Retorna um dicionário com
+    contour, racing_line, lap_time e o tempo gasto em cada etapa (stages).
+    """
+    params = dict(DEFAULT_KART_PARAMS)
+    if kart_params:
+        params.update(kart_params)
+    stages = {}
+
+    if contour is None:
+        if image is None:
+            raise ValueError("É preciso informar uma imagem ou um contorno")
+        start = time.perf_counter()
+        contour = detect_yellow_track(image, lower, upper, refine=refine)
+        stages['detect'] = time.perf_counter() - start
+    else:
+        contour = np.asarray(contour)
+        if not np.issubdtype(contour.dtype, np.floating):
+            contour = contour.astype(np.int32)
+        contour = contour.reshape(-1, 1, 2)
+
+    if contour is None or len(contour) < 3:
+        return {'contour': None, 'racing_line': None, 'lap_time': None, 'stages': stages}
+
+    start = time.perf_counter()
+    if spacing is None:
+        centerline = calculate_centerline(contour, num_points)
+    else:
+        centerline = resample_uniform(contour, spacing, params['track_length']).as_cv()
+    racing_line = generate_racing_line(centerline, params['max_speed'], params['friction_coeff'])
+    stages['racing_line'] = time.perf_counter() - start
+
+    elevation = None
+    if params.get('height_map'):
+        start = time.perf_counter()
+        elevation = track_elevation(params, centerline)
+        stages['elevation'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    lap_time = estimate_lap_time(racing_line, params, elevation=elevation)
+    stages['lap_time'] = time.perf_counter() - start
+
+    return {'contour': contour, 'racing_line': racing_line, 'lap_time': lap_time, 'stages': stages}
+
+
+def run_multi_pipeline(image, kart_params=None, lower=None, upper=None, num_points=100,
+                       refine=False, spacing=None, workers=None, min_area_ratio=0.05):
+    """Executa o pipeline para cada traçado significativo da imagem.
+
+    A detecção roda uma vez; cada componente segue para run_pipeline num pool
+    de threads. kart_params['track_length'] vale para o maior traçado e os
+    demais recebem o comprimento proporcional ao seu perímetro, na mesma
+    escala da imagem. Retorna uma lista de resultados de run_pipeline, do
+    maior para o menor traçado, cada um com 'track_length'.
+    """
+    params = dict(DEFAULT_KART_PARAMS)
+    if kart_params:
+        params.update(kart_params)
+
+    start = time.perf_counter()
+    contours = detect_yellow_tracks(image, lower, upper, refine=refine, min_area_ratio=min_area_ratio)
+    detect_time = time.perf_counter() - start
+    if not contours:
+        return []
+
+    perimeters = [cv2.arcLength(np.asarray(c, np.float32), True) for c in contours]
+    meters_per_pixel = params['track_length'] / perimeters[0]
+
+    def process(index):
+        component_params = dict(params, track_length=perimeters[index] * meters_per_pixel)
+        result = run_pipeline(contour=contours[index], kart_params=component_params,
+                              num_points=num_points, spacing=spacing)
+        result['track_length'] = component_params['track_length']
+        result['stages']['detect'] = detect_time
+        return result
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(process, range(len(contours))))
+
+
+def decode_image(data):
+    """Decodifica bytes de JPG/PNG em uma imagem BGR."""
+    image = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+    if image is None:
+        raise ValueError("Não foi possível decodificar a imagem")
+    return image
+
+
+def process_job(kind, data, kart_params=None):
+    """Ponto de entrada dos processos do job_server; data são bytes de imagem ou pontos do contorno."""
+    start = time.perf_counter()
+    if kind == 'image':
+        image = decode_image(data)
+        decode_time = time.perf_counter() - start
+        result = run_pipeline(image=image, kart_params=kart_params)
+        result['stages']['decode'] = decode_time
+    else:
+        result = run_pipeline(contour=data, kart_params=kart_params)
+    result['stages']['worker'] = time.perf_counter() - start
+    return result
@@ -1,12 +1,19 @@
 import cv2
 import numpy as np
+from .track_data import Polyline, as_points
+from .image_processor import detect_yellow_track
+from .kart_physics import estimate_lap_time
+from .elevation import track_elevation
+
+# Cores (BGR) das racing lines quando há vários traçados na mesma imagem
+TRACK_COLORS = [(0, 0, 255), (255, 0, 255), (255, 128, 0), (0, 200, 0), (0, 128, 255), (255, 255, 0)]
 
 def generate_racing_line(contour, displacement_factor=0.3):
     if contour is None or len(contour) < 3:
         return None
     
-    points = contour.squeeze()
-    racing_line = []
+    points = as_points(contour)
+    racing_line = Polyline.empty(len(points))
     
     for i in range(len(points)):
         prev = points[i-1] if i > 0 else points[-1]
@@ -33,10 +40,28 @@ def generate_racing_line(contour, displacement_factor=0.3):
         
         # Aplicar deslocamento
         displacement = displacement_factor * curvature * 50
-        new_point = curr + displacement * normal
-        racing_line.append(new_point)
+        racing_line[i] = curr + displacement * normal
     
-    return np.array(racing_line).reshape(-1, 1, 2)
+    return racing_line.as_cv()
+
+def displacement_field(contour):
+    """Deslocamento de generate_racing_line por unidade de displacement_factor.
+
+    A racing line é linear no fator: points + displacement_factor * campo.
+    Retorna (points (N, 2), campo (N, 2)), calculados de uma vez com numpy.
+    """
+    points = as_points(contour).astype(np.float64)
+    in_vec = points - np.roll(points, 1, axis=0)
+    out_vec = np.roll(points, -1, axis=0) - points
+    in_len = np.linalg.norm(in_vec, axis=1, keepdims=True)
+    out_len = np.linalg.norm(out_vec, axis=1, keepdims=True)
+    in_vec = np.where(in_len > 0, in_vec / np.where(in_len > 0, in_len, 1.0), in_vec)
+    out_vec = np.where(out_len > 0, out_vec / np.where(out_len > 0, out_len, 1.0), out_vec)
+
+    normal = np.column_stack((-in_vec[:, 1], in_vec[:, 0]))
+    dot = np.clip((in_vec * out_vec).sum(axis=1), -1.0, 1.0)
+    curvature = np.arccos(dot) / (np.linalg.norm(in_vec, axis=1) + np.linalg.norm(out_vec, axis=1) + 1e-5)
+    return points, (curvature * 50)[:, None] * normal
 
 def draw_racing_line(image, yellow_contour, racing_line):
     result = image.copy()
@@ -49,4 +74,44 @@ def draw_racing_line(image, yellow_contour, racing_line):
             pt2 = tuple(racing_line[i][0].astype(int))
             cv2.line(result, pt1, pt2, (0, 0, 255), 3)
     
-    return result
\ No newline at end of file
+    return result
+
+def compute_track(image, color_optimizer, kart_params):
+    """Detecta o traçado com os limites aprendidos e calcula racing line e tempo de volta"""
+    lower, upper = color_optimizer.get_limits()
+    contour = detect_yellow_track(image, lower, upper)
+    if contour is None:
+        return None, None, None
+    
+    racing_line = generate_racing_line(contour)
+    lap_time = estimate_lap_time(racing_line, kart_params, elevation=track_elevation(kart_params, contour))
+    return contour, racing_line, lap_time
+
+def render_results(image, contour, racing_line):
+    """Gera a imagem final e as camadas intermediárias (só traçado e só racing line)"""
+    result_img = draw_racing_line(image, contour, racing_line)
+    
+    yellow_only = np.zeros_like(image)
+    cv2.drawContours(yellow_only, [contour], -1, (0, 255, 255), 2)
+    
+    racing_only = np.zeros_like(image)
+    cv2.polylines(racing_only, [racing_line.astype(np.int32)], False, (0, 0, 255), 3)
+    
+    return result_img, yellow_only, racing_only
+
+def render_tracks(image, tracks):
+    """Desenha todos os traçados numa única cópia da imagem, com cor e tempo de volta de cada um"""
+    result = image.copy()
+    for i, track in enumerate(tracks):
+        color = TRACK_COLORS[i % len(TRACK_COLORS)]
+        contour = np.asarray(track['contour']).astype(np.int32)
+        cv2.drawContours(result, [contour], -1, (0, 255, 255), 2)
+        if track['racing_line'] is not None:
+            cv2.polylines(result, [np.asarray(track['racing_line']).astype(np.int32)], True, color, 2)
+
+        label = f"{i + 1}"
+        if track['lap_time'] is not None:
+            label += f": {track['lap_time']:.1f}s"
+        x, y, _, _ = cv2.boundingRect(contour)
+        cv2.putText(result, label, (x, max(y - 6, 12)), cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
+    return result
@@ -0,0 +1,190 @@
+import os
+import cv2
+import numpy as np
+from .elevation import track_elevation
+from .image_processor import detect_yellow_track
+from .kart_physics import segment_times, velocity_profile
+from .pipeline import DEFAULT_KART_PARAMS, KART_PARAMS, image_kart_params
+from .racing_line_processor import displacement_field
+from .track_segments import segment_track
+from .track_fingerprint import TrackLibrary, compute_fingerprint
+from .vehicle_model import vehicle_envelope
+
+PARAMETERS = ('friction_coeff', 'max_speed', 'displacement_factor')
+# Passo relativo das diferenças centrais
+RELATIVE_STEP = 1e-3
+
+
+def sensitivity_analysis(contour, kart_params, displacement_factor=0.3, corners=None,
+                         relative_step=RELATIVE_STEP):
+    """Derivadas do tempo de volta e de cada setor em relação a friction_coeff, max_speed e displacement_factor.
+
+    A geometria (pontos e campo de deslocamento da racing line) é calculada
+    uma vez; as 2 * P variantes perturbadas mais a base são avaliadas numa
+    única chamada de velocity_profile, usando as dimensões de lote.
+    Os setores começam na entrada de cada curva e vão até a entrada da
+    seguinte, então somam a volta. O modelo de kart (kart_class) e o mapa de
+    altura (height_map) entram como em estimate_lap_time; variantes com o
+    mesmo atrito compartilham o envelope g-g-v. Retorna um dicionário com lap_time,
+    d_lap (P,), corners (C, 2), corner_time (C,), d_corner (P, C),
+    sector_time (C,) e d_sector (P, C).
+    """
+    params = dict(DEFAULT_KART_PARAMS)
+    params.update(kart_params)
+    base = np.array([params.get('friction_coeff', 1.5), params.get('max_speed', 55/3.6),
+                     displacement_factor], dtype=np.float64)
+    steps = relative_step * np.maximum(np.abs(base), 1e-3)
+
+    # Linha 0: base; linhas 2k+1 e 2k+2: parâmetro k com +h e -h
+    values = np.tile(base, (1 + 2 * len(PARAMETERS), 1))
+    for k in range(len(PARAMETERS)):
+        values[2 * k + 1, k] += steps[k]
+        values[2 * k + 2, k] -= steps[k]
+
+    points, field = displacement_field(contour)
+    lines = points[None] + values[:, 2, None, None] * field[None]
+    perimeters = np.linalg.norm(np.roll(lines, -1, axis=1) - lines, axis=2).sum(axis=1)
+    scales = params.get('track_length', perimeters[0]) / perimeters
+
+    grade = bank = None
+    # Mapa amostrado uma vez ao longo da linha central, na escala dela
+    center_perimeter = np.linalg.norm(np.roll(points, -1, axis=0) - points, axis=1).sum()
+    elevation = track_elevation(params, points, params.get('track_length', center_perimeter) / center_perimeter)
+    if elevation is not None:
+        _, grade, bank = elevation.along(lines, scales)
+
+    # Com modelo de kart o envelope depende do atrito: uma chamada por valor de atrito
+    times = np.empty(lines.shape[:2])
+    for friction in np.unique(values[:, 0]):
+        rows = values[:, 0] == friction
+        envelope = vehicle_envelope(dict(params, friction_coeff=float(friction)))
+        v, ds = velocity_profile(lines[rows], values[rows, 1], values[rows, 0], scales[rows],
+                                 envelope=envelope,
+                                 grade=None if grade is None else grade[rows],
+                                 bank=None if bank is None else bank[rows])
+        times[rows] = segment_times(v, ds)
+
+    if corners is None:
+        segments = segment_track(lines[0], scales[0])
+        corners = np.column_stack((segments.entry_index, segments.exit_index))
+    corners = np.asarray(corners, dtype=int).reshape(-1, 2)
+    starts = corners[:, 0]
+    in_corner = _interval_times(times, starts, corners[:, 1])
+    sectors = _interval_times(times, starts, np.roll(starts, -1))
+
+    lap = times.sum(axis=1)
+    d_lap = (lap[1::2] - lap[2::2]) / (2 * steps)
+    return {
+        'parameters': PARAMETERS,
+        'values': base,
+        'lap_time': float(lap[0]),
+        'd_lap': d_lap,
+        'corners': corners,
+        'corner_time': in_corner[0],
+        'd_corner': (in_corner[1::2] - in_corner[2::2]) / (2 * steps[:, None]),
+        'sector_time': sectors[0],
+        'd_sector': (sectors[1::2] - sectors[2::2]) / (2 * steps[:, None]),
+        'racing_line': lines[0],
+    }
+
+
+def _interval_times(times, start, end):
+    """Soma dos tempos dos segmentos start..end-1 de cada intervalo (end <= start dá a volta)."""
+    n = times.shape[-1]
+    # Soma acumulada de duas voltas para intervalos que cruzam a linha de chegada
+    cumulative = np.concatenate((np.zeros(times.shape[:-1] + (1,)),
+                                 np.cumsum(np.concatenate((times, times), axis=-1), axis=-1)), axis=-1)
+    end = np.where(end <= start, end + n, end)
+    return cumulative[..., end] - cumulative[..., start]
+
+
+def format_report(result):
+    """Relatório em texto: sensibilidade da volta e de cada setor."""
+    names = result['parameters']
+    lines = [f"Tempo de volta: {result['lap_time']:.3f} s"]
+    for name, value, d in zip(names, result['values'], result['d_lap']):
+        lines.append(f"  d(volta)/d({name}) = {d:+.4f} s por unidade (valor atual {value:.3f})")
+
+    for title, key in (('Curva', 'corner'), ('Setor', 'sector')):
+        lines.append("")
+        lines.append(f"{title:>5} {'Índices':>11} {'Tempo (s)':>10}" +
+                     ''.join(f" {'d/d ' + n:>24}" for n in names))
+        starts = result['corners'][:, 0]
+        ends = result['corners'][:, 1] if key == 'corner' else np.roll(starts, -1)
+        for c in range(len(starts)):
+            row = f"{c + 1:>5} {f'{starts[c]}-{ends[c]}':>11} {result[key + '_time'][c]:>10.3f}"
+            row += ''.join(f" {d:>+24.4f}" for d in result['d_' + key][:, c])
+            lines.append(row)
+
+    if len(result['corners']):
+        lines.append("")
+        for k, name in enumerate(names):
+            worst = int(np.argmax(np.abs(result['d_corner'][k])))
+            lines.append(f"Curva mais sensível a {name}: {worst + 1}")
+    return "\n".join(lines)
+
+
+def draw_sensitivity(image, result, parameter):
+    """Sobreposição: cada curva colorida pelo |d(tempo na curva)/d(parâmetro)|, do azul (pouco) ao vermelho (muito)."""
+    k = result['parameters'].index(parameter)
+    line = result['racing_line']
+    overlay = image.copy()
+    cv2.polylines(overlay, [line.astype(np.int32).reshape(-1, 1, 2)], True, (200, 200, 200), 2)
+    if len(result['corners']) == 0:
+        return overlay
+
+    magnitude = np.abs(result['d_corner'][k])
+    level = (255 * magnitude / max(magnitude.max(), 1e-12)).astype(np.uint8)
+    colors = cv2.applyColorMap(level.reshape(-1, 1), cv2.COLORMAP_JET)[:, 0]
+
+    n = len(line)
+    for c, (start, end) in enumerate(result['corners']):
+        idx = np.arange(start, end + 1 if end > start else end + n + 1) % n
+        color = tuple(int(x) for x in colors[c])
+        cv2.polylines(overlay, [line[idx].astype(np.int32).reshape(-1, 1, 2)], False, color, 5)
+        x, y = line[idx[len(idx) // 2]].astype(int)
+        cv2.putText(overlay, f"{c + 1}: {result['d_corner'][k, c]:+.2f}", (int(x) + 6, int(y) - 6),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.45, color, 2)
+    cv2.putText(overlay, f"d(curva)/d({parameter})", (10, 20), cv2.FONT_HERSHEY_SIMPLEX, 0.6,
+                (255, 255, 255), 2)
+    return overlay
+
+
+def main():
+    """Modo de análise: sensibilidade de cada imagem em input_images, com relatório e sobreposições."""
+    project_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    input_folder = os.path.join(project_dir, 'input_images')
+    output_folder = os.path.join(project_dir, 'output_images')
+    os.makedirs(output_folder, exist_ok=True)
+    library = TrackLibrary(os.path.join(project_dir, 'track_library'))
+    height_map_folder = os.path.join(project_dir, 'height_maps')
+
+    for image_file in sorted(os.listdir(input_folder)):
+        if not image_file.lower().endswith(('.png', '.jpg', '.jpeg')):
+            continue
+        image = cv2.imread(os.path.join(input_folder, image_file))
+        if image is None:
+            continue
+
+        # Geometria já conhecida vem da biblioteca de pistas
+        known = library.match(compute_fingerprint(image), image)
+        contour = known['contour'] if known is not None else detect_yellow_track(image)
+        if contour is None:
+            print(f"{image_file}: traçado não encontrado")
+            continue
+
+        # Mesmos parâmetros (kart, mapa de altura) do processamento principal
+        kart_params = image_kart_params(KART_PARAMS, image, image_file, height_map_folder)
+        result = sensitivity_analysis(contour, kart_params)
+        stem = os.path.splitext(image_file)[0]
+        report = format_report(result)
+        with open(os.path.join(output_folder, f"sensitivity_{stem}.txt"), 'w') as f:
+            f.write(report + "\n")
+        for parameter in PARAMETERS:
+            cv2.imwrite(os.path.join(output_folder, f"sensitivity_{parameter}_{stem}.jpg"),
+                        draw_sensitivity(image, result, parameter))
+        print(f"{image_file}\n{report}\n")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,335 @@
+import argparse
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from multiprocessing import shared_memory
+
+import cv2
+import numpy as np
+from .image_processor import contour_from_mask
+from .pipeline import DEFAULT_KART_PARAMS, run_pipeline
+
+DEFAULT_LOWER = (20, 200, 200)
+DEFAULT_UPPER = (40, 255, 255)
+
+
+class SharedRing:
+    """Slots de tamanho fixo num bloco de multiprocessing.shared_memory.
+
+    Os processos trocam só descritores (slot, forma); cada um abre o bloco
+    pelo nome e enxerga os dados sem cópia. Quem cria o anel é quem o destrói
+    (unlink).
+    """
+
+    def __init__(self, slots, slot_bytes, name=None):
+        self.slots = slots
+        self.slot_bytes = slot_bytes
+        self._owner = name is None
+        if self._owner:
+            self.shm = shared_memory.SharedMemory(create=True, size=slots * slot_bytes)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def view(self, slot, shape, dtype=np.uint8):
+        """Array numpy sobre o slot (sem cópia)."""
+        shape = tuple(shape)
+        if int(np.prod(shape)) * np.dtype(dtype).itemsize > self.slot_bytes:
+            raise ValueError(f"Quadro {shape} não cabe no slot de {self.slot_bytes} bytes")
+        return np.ndarray(shape, dtype, buffer=self.shm.buf, offset=slot * self.slot_bytes)
+
+    def close(self):
+        self.shm.close()
+        if self._owner:
+            self.shm.unlink()
+
+
+def _detect(frame, mask, lower, upper, options):
+    """Máscara do quadro (gravada em mask) e contorno; retorna (contorno, erro)."""
+    try:
+        cv2.inRange(cv2.cvtColor(frame, cv2.COLOR_BGR2HSV), lower, upper, dst=mask)
+        return contour_from_mask(mask, options['morph_size'], refine=options['refine']), None
+    except Exception as e:
+        return None, f"{type(e).__name__}: {e}"
+
+
+def _solve(contour, error, kart_params, num_points, spacing):
+    """Racing line e tempo de volta do contorno; retorna (resultado, erro)."""
+    result = {'contour': contour, 'racing_line': None, 'lap_time': None}
+    if error is None and contour is not None:
+        try:
+            result = run_pipeline(contour=contour, kart_params=kart_params, num_points=num_points,
+                                  spacing=spacing)
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+    return result, error
+
+
+def _detect_worker(frame_name, mask_name, slots, frame_bytes, mask_bytes, jobs, physics, free,
+                   options, hold_frames):
+    """Etapa OpenCV: quadro -> máscara (no anel de máscaras) -> contorno."""
+    frames = SharedRing(slots, frame_bytes, frame_name)
+    masks = SharedRing(slots, mask_bytes, mask_name)
+    lower, upper = np.array(options['lower']), np.array(options['upper'])
+    try:
+        while True:
+            job = jobs.get()
+            if job is None:
+                break
+            index, slot, shape, stages = job
+            start = time.perf_counter()
+            frame, mask = frames.view(slot, shape), masks.view(slot, shape[:2])
+            contour, error = _detect(frame, mask, lower, upper, options)
+            del frame, mask
+            stages['detect'] = time.perf_counter() - start
+            if not hold_frames:
+                free.put(slot)
+                slot = None
+            physics.put((index, slot, shape, stages, contour, error))
+    finally:
+        frames.close()
+        masks.close()
+
+
+def _physics_worker(physics, results, kart_params, num_points, spacing):
+    """Etapa Python: racing line e tempo de volta a partir do contorno (pequeno, vai pela fila)."""
+    while True:
+        job = physics.get()
+        if job is None:
+            break
+        index, slot, shape, stages, contour, error = job
+        result, error = _solve(contour, error, kart_params, num_points, spacing)
+        stages.update(result.pop('stages', {}))
+        result.update(index=index, slot=slot, shape=shape, stages=stages, error=error)
+        results.put(result)
+
+
+class ShmPipeline:
+    """Leitura, detecção e física em estágios independentes ligados por anéis de memória compartilhada.
+
+    Threads de leitura (E/S e decodificação, que liberam o GIL) gravam cada
+    quadro num slot livre do anel de quadros; processos de detecção leem o
+    quadro e gravam a máscara no mesmo slot do anel de máscaras; o contorno
+    segue por fila para os processos de física. Só descritores e contornos
+    cruzam as filas. Com hold_frames o slot só é devolvido depois que o
+    resultado é entregue (o on_result de run recebe quadro e máscara);
+    sem ele, logo após a detecção. Os slots têm o tamanho do primeiro quadro
+    legível, ou max_side x max_side quando informado; quadros maiores são
+    processados na própria thread de leitura, sem memória compartilhada, com
+    o mesmo resultado.
+    """
+
+    def __init__(self, kart_params=None, lower=DEFAULT_LOWER, upper=DEFAULT_UPPER, morph_size=7,
+                 refine=False, num_points=100, spacing=None, readers=2, detect_workers=2,
+                 physics_workers=2, slots=None, max_side=None, hold_frames=False):
+        self.kart_params = dict(DEFAULT_KART_PARAMS, **(kart_params or {}))
+        self.options = {'lower': tuple(int(v) for v in lower), 'upper': tuple(int(v) for v in upper),
+                        'morph_size': morph_size, 'refine': refine}
+        self.num_points = num_points
+        self.spacing = spacing
+        self.readers = readers
+        self.detect_workers = detect_workers
+        self.physics_workers = physics_workers
+        self.slots = slots or 2 * detect_workers + readers
+        self.hold_frames = hold_frames
+        self.max_side = max_side
+        self._context = multiprocessing.get_context('forkserver')
+
+    def run(self, paths, on_result=None):
+        """Processa os arquivos; retorna os resultados na ordem de paths.
+
+        Cada resultado tem input, contour, racing_line, lap_time, error e o
+        tempo de cada etapa (stages: read, wait, detect, racing_line, lap_time).
+        on_result(result, frame, mask) é chamado no processo principal à
+        medida que os resultados chegam; frame e mask só existem com hold_frames.
+        """
+        paths = list(paths)
+        pixels, preloaded = self._slot_pixels(paths)
+        frame_bytes, mask_bytes = pixels * 3, pixels
+        frames = SharedRing(self.slots, frame_bytes)
+        masks = SharedRing(self.slots, mask_bytes)
+        ctx = self._context
+        free, jobs, physics, results = ctx.Queue(), ctx.Queue(), ctx.Queue(), ctx.Queue()
+        for slot in range(self.slots):
+            free.put(slot)
+
+        detectors = [ctx.Process(target=_detect_worker, daemon=True,
+                                 args=(frames.name, masks.name, self.slots, frame_bytes,
+                                       mask_bytes, jobs, physics, free, self.options,
+                                       self.hold_frames))
+                     for _ in range(self.detect_workers)]
+        solvers = [ctx.Process(target=_physics_worker, daemon=True,
+                               args=(physics, results, self.kart_params, self.num_points, self.spacing))
+                   for _ in range(self.physics_workers)]
+        for process in detectors + solvers:
+            process.start()
+
+        output = [None] * len(paths)
+        pending = queue.Queue()
+        for index in range(len(paths)):
+            pending.put(index)
+        direct = queue.Queue()
+        stop = threading.Event()
+        readers = [threading.Thread(target=self._read_frames,
+                                    args=(paths, preloaded, pending, frames, free, jobs, direct, stop),
+                                    daemon=True)
+                   for _ in range(min(self.readers, max(1, len(paths))))]
+        finished = False
+        try:
+            for reader in readers:
+                reader.start()
+
+            received = 0
+            while received < len(paths):
+                # Falhas de leitura e quadros maiores que o slot não passam pelos workers
+                while not direct.empty():
+                    result, held = direct.get()
+                    index = result['index']
+                    output[index] = self._deliver(result, paths, frames, masks, free, on_result, held)
+                    received += 1
+                try:
+                    result = results.get(timeout=0.05)
+                except queue.Empty:
+                    self._check_workers(detectors + solvers)
+                    continue
+                index = result['index']
+                output[index] = self._deliver(result, paths, frames, masks, free, on_result)
+                received += 1
+            finished = True
+        finally:
+            stop.set()
+            for reader in readers:
+                reader.join()
+            if finished:
+                # Sentinelas por etapa: a física só para depois que a detecção esvaziou
+                for _ in detectors:
+                    jobs.put(None)
+                for process in detectors:
+                    process.join()
+                for _ in solvers:
+                    physics.put(None)
+                for process in solvers:
+                    process.join()
+            else:
+                for process in detectors + solvers:
+                    process.terminate()
+            frames.close()
+            masks.close()
+        return output
+
+    def _slot_pixels(self, paths):
+        """(pixels por slot, {índice: quadro já decodificado}) a partir de max_side ou do primeiro quadro legível."""
+        if self.max_side is not None:
+            return self.max_side * self.max_side, {}
+        for index, path in enumerate(paths):
+            image = cv2.imread(path)
+            if image is not None:
+                return image.shape[0] * image.shape[1], {index: image}
+        return 1, {}
+
+    @staticmethod
+    def _check_workers(processes):
+        """Os workers só saem pelas sentinelas; um processo morto antes disso deixaria run esperando para sempre."""
+        dead = [process.exitcode for process in processes if not process.is_alive()]
+        if dead:
+            raise RuntimeError(f"Worker encerrado durante o processamento (exit code {dead})")
+
+    def _read_frames(self, paths, preloaded, pending, frames, free, jobs, direct, stop):
+        """Thread de leitura: decodifica e copia para um slot livre (espera quando o anel está cheio)."""
+        while not stop.is_set():
+            try:
+                index = pending.get_nowait()
+            except queue.Empty:
+                return
+            start = time.perf_counter()
+            image = preloaded.pop(index, None)
+            if image is None:
+                image = cv2.imread(paths[index])
+            stages = {'read': time.perf_counter() - start}
+            if image is None:
+                direct.put(({'index': index, 'slot': None, 'contour': None, 'racing_line': None,
+                             'lap_time': None, 'error': "imagem ilegível", 'stages': stages}, None))
+                continue
+            if image.nbytes > frames.slot_bytes:
+                direct.put(self._process_direct(index, image, stages))
+                continue
+
+            start = time.perf_counter()
+            slot = None
+            while slot is None and not stop.is_set():
+                try:
+                    slot = free.get(timeout=0.1)
+                except queue.Empty:
+                    pass
+            if slot is None:
+                return
+            stages['wait'] = time.perf_counter() - start
+            frames.view(slot, image.shape)[...] = image
+            jobs.put((index, slot, image.shape, stages))
+
+    def _process_direct(self, index, image, stages):
+        """Detecção e física de um quadro que não cabe no slot, nesta thread; retorna (resultado, (quadro, máscara))."""
+        start = time.perf_counter()
+        mask = np.empty(image.shape[:2], np.uint8)
+        contour, error = _detect(image, mask, np.array(self.options['lower']), np.array(self.options['upper']),
+                                 self.options)
+        stages['detect'] = time.perf_counter() - start
+        result, error = _solve(contour, error, self.kart_params, self.num_points, self.spacing)
+        stages.update(result.pop('stages', {}))
+        result.update(index=index, slot=None, stages=stages, error=error)
+        return result, ((image, mask) if self.hold_frames else None)
+
+    def _deliver(self, result, paths, frames, masks, free, on_result, held=None):
+        index, slot, shape = result.pop('index'), result.pop('slot'), result.pop('shape', None)
+        result['input'] = paths[index]
+        if on_result is not None:
+            frame = mask = None
+            if slot is not None:
+                frame, mask = frames.view(slot, shape), masks.view(slot, shape[:2])
+            elif held is not None:
+                frame, mask = held
+            on_result(result, frame, mask)
+        if slot is not None:
+            free.put(slot)
+        return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pipeline em estágios com memória compartilhada")
+    parser.add_argument('inputs', nargs='+', help="Imagens ou pastas")
+    parser.add_argument('--readers', type=int, default=2)
+    parser.add_argument('--detect-workers', type=int, default=2)
+    parser.add_argument('--physics-workers', type=int, default=2)
+    parser.add_argument('--slots', type=int, default=None)
+    parser.add_argument('--max-side', type=int, default=None,
+                        help="Lado máximo do quadro por slot (padrão: tamanho do primeiro quadro)")
+    args = parser.parse_args()
+
+    paths = []
+    for path in args.inputs:
+        if os.path.isdir(path):
+            paths.extend(os.path.join(path, name) for name in sorted(os.listdir(path))
+                         if name.lower().endswith(('.png', '.jpg', '.jpeg')))
+        else:
+            paths.append(path)
+
+    pipeline = ShmPipeline(readers=args.readers, detect_workers=args.detect_workers,
+                           physics_workers=args.physics_workers, slots=args.slots,
+                           max_side=args.max_side)
+    start = time.perf_counter()
+    results = pipeline.run(paths)
+    elapsed = time.perf_counter() - start
+    for result in results:
+        lap = "-" if result['lap_time'] is None else f"{result['lap_time']:.2f} s"
+        stages = ", ".join(f"{k} {v * 1e3:.0f} ms" for k, v in result['stages'].items())
+        print(f"{result['input']}: {result['error'] or lap} ({stages})")
+    print(f"{len(paths)} imagens em {elapsed:.2f} s ({len(paths) / max(elapsed, 1e-9):.1f} imagens/s)")
+
+
+if __name__ == '__main__':
+    main()
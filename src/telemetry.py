@@ -0,0 +1,275 @@
+import csv
+import itertools
+import os
+import numpy as np
+from scipy.spatial import cKDTree
+from .kart_physics import segment_times, velocity_profile
+from .vehicle_model import vehicle_envelope
+from .track_data import as_points
+from .track_segments import corner_intervals, segment_track
+
+CHUNK_SIZE = 500_000
+DEFAULT_COLUMNS = ('t', 'x', 'y')
+EARTH_RADIUS = 6371000.0
+
+
+def read_samples(path, columns=DEFAULT_COLUMNS, chunk_size=CHUNK_SIZE):
+    """Lê um log de telemetria em blocos de (t, x, y) sem carregar o arquivo inteiro.
+
+    Aceita CSV com cabeçalho, .npy (N, 3) ou estruturado, e binário cru (.bin)
+    com registros float64 (t, x, y). Os arquivos binários são mapeados em memória.
+    """
+    ext = os.path.splitext(path)[1].lower()
+    if ext == '.csv':
+        yield from _read_csv(path, columns, chunk_size)
+        return
+
+    if ext == '.npy':
+        data = np.load(path, mmap_mode='r')
+    else:
+        data = np.memmap(path, dtype=np.float64, mode='r').reshape(-1, 3)
+
+    for start in range(0, len(data), chunk_size):
+        block = data[start:start + chunk_size]
+        if block.dtype.names:
+            yield tuple(np.asarray(block[name], dtype=np.float64) for name in columns)
+        else:
+            block = np.asarray(block, dtype=np.float64)
+            yield block[:, 0], block[:, 1], block[:, 2]
+
+
+def _read_csv(path, columns, chunk_size):
+    with open(path, 'r', newline='') as f:
+        header = next(csv.reader([f.readline()]))
+        index = [header.index(name) for name in columns]
+        while True:
+            lines = list(itertools.islice(f, chunk_size))
+            if not lines:
+                break
+            block = np.loadtxt(lines, delimiter=',', usecols=index, ndmin=2)
+            yield block[:, 0], block[:, 1], block[:, 2]
+
+
+def latlon_to_local(lat, lon, lat0, lon0):
+    """Projeção equiretangular de graus para metros em torno de (lat0, lon0)."""
+    x = np.radians(lon - lon0) * EARTH_RADIUS * np.cos(np.radians(lat0))
+    y = -np.radians(lat - lat0) * EARTH_RADIUS  # y cresce para baixo, como na imagem
+    return x, y
+
+
+class TrackProjector:
+    """Projeta pontos na linha de referência, devolvendo posição em arco e desvio lateral."""
+
+    def __init__(self, line, scale=1.0, density=4):
+        points = as_points(line).astype(np.float64) * scale
+        self.points = points
+        self.n = len(points)
+        self.start = points
+        self.delta = np.roll(points, -1, axis=0) - points
+        self.seg_len = np.hypot(self.delta[:, 0], self.delta[:, 1])
+        self.station = np.concatenate(([0.0], np.cumsum(self.seg_len)[:-1]))
+        self.length = float(self.seg_len.sum())
+
+        # Amostras densas da linha para achar o segmento candidato via KD-tree
+        spacing = np.median(self.seg_len[self.seg_len > 0]) / density
+        counts = np.maximum(1, np.ceil(self.seg_len / spacing).astype(int))
+        seg_ids = np.repeat(np.arange(self.n), counts)
+        offsets = np.arange(len(seg_ids)) - np.repeat(np.cumsum(counts) - counts, counts)
+        frac = offsets / counts[seg_ids]
+        dense = self.start[seg_ids] + frac[:, None] * self.delta[seg_ids]
+        self._tree = cKDTree(dense)
+        self._dense_seg = seg_ids
+
+    def project(self, x, y):
+        """Retorna (estação em metros, desvio lateral com sinal em metros)."""
+        x = np.asarray(x, dtype=np.float64)
+        y = np.asarray(y, dtype=np.float64)
+        _, nearest = self._tree.query(np.column_stack((x, y)), workers=-1)
+        base = self._dense_seg[nearest]
+
+        # Testa o segmento do vizinho mais próximo e os dois adjacentes;
+        # as contas por componente evitam temporários (M, 3, 2)
+        candidates = (base[:, None] + np.array([-1, 0, 1])[None, :]) % self.n
+        dx = self.delta[candidates, 0]
+        dy = self.delta[candidates, 1]
+        rx = x[:, None] - self.start[candidates, 0]
+        ry = y[:, None] - self.start[candidates, 1]
+        len2 = np.maximum(self.seg_len[candidates] ** 2, 1e-12)
+        t = np.clip((rx * dx + ry * dy) / len2, 0.0, 1.0)
+        ex = rx - t * dx
+        ey = ry - t * dy
+        dist2 = ex * ex + ey * ey
+        best = np.argmin(dist2, axis=1)
+
+        rows = np.arange(len(x))
+        seg = candidates[rows, best]
+        station = self.station[seg] + t[rows, best] * self.seg_len[seg]
+        cross = dx[rows, best] * ry[rows, best] - dy[rows, best] * rx[rows, best]
+        lateral = np.sign(cross) * np.sqrt(dist2[rows, best])
+        return station, lateral
+
+
+class LapAnalyzer:
+    """Alinha um log de telemetria à racing line e compara volta a volta.
+
+    O log é consumido em blocos (ver read_samples); o estado carregado entre
+    blocos é apenas a última amostra e acumuladores por volta e curva, então
+    a memória não cresce com a duração do log.
+    """
+
+    def __init__(self, racing_line, kart_params, affine=None, corners=None, segments=None):
+        """affine (2x3) leva as coordenadas do log para pixels da imagem da racing line.
+
+        As curvas vêm de corners (pares de índices) ou de segments
+        (TrackSegmentation da mesma linha); sem nenhum dos dois a linha é
+        segmentada aqui.
+        """
+        points = as_points(racing_line).astype(np.float64)
+        perimeter = np.hypot(*(np.roll(points, -1, axis=0) - points).T).sum()
+        self.scale = kart_params.get('track_length', perimeter) / perimeter
+        self.affine = None if affine is None else np.asarray(affine, dtype=np.float64)
+        self.projector = TrackProjector(points, self.scale)
+
+        # Tempo de referência acumulado ao longo da linha
+        v, ds = velocity_profile(points, kart_params.get('max_speed', 55/3.6),
+                                 kart_params.get('friction_coeff', 1.5), self.scale,
+                                 envelope=vehicle_envelope(kart_params))
+        times = segment_times(v, ds)
+        self.ref_station = self.projector.station
+        self.ref_time = np.concatenate(([0.0], np.cumsum(times)[:-1]))
+        self.ref_lap_time = float(times.sum())
+
+        if corners is None:
+            if segments is None:
+                segments = segment_track(points, self.scale)
+            corners = np.column_stack((segments.entry_index, segments.exit_index))
+        self.corners = np.asarray(corners, dtype=int).reshape(-1, 2)
+        self.corner_entry = self.ref_station[self.corners[:, 0]]
+        self.corner_exit = self.ref_station[self.corners[:, 1] % len(points)]
+        self._bounds, self._corner_id = corner_intervals(self.corner_entry, self.corner_exit,
+                                                         self.projector.length)
+
+        self._last = None       # última amostra (t, estação contínua)
+        self._boundary_times = {}
+        self._lateral = {}      # (volta, curva) -> [soma |desvio|, máximo, contagem]
+
+    def _to_track_frame(self, x, y):
+        """Sem affine, x e y já estão em metros no referencial da linha."""
+        if self.affine is None:
+            return x, y
+        px = self.affine[0, 0] * x + self.affine[0, 1] * y + self.affine[0, 2]
+        py = self.affine[1, 0] * x + self.affine[1, 1] * y + self.affine[1, 2]
+        return px * self.scale, py * self.scale
+
+    def feed(self, t, x, y):
+        """Processa um bloco de amostras (arrays t, x, y)."""
+        if len(t) == 0:
+            return
+        station, lateral = self.projector.project(*self._to_track_frame(x, y))
+        length = self.projector.length
+
+        # Desembrulha a estação: cada passagem pela linha de chegada soma uma volta
+        if self._last is not None:
+            prev_t, prev_g = self._last
+            start_lap = np.floor(prev_g / length)
+            wrapped = np.concatenate(([prev_g - start_lap * length], station))
+            t_all = np.concatenate(([prev_t], t))
+        else:
+            start_lap = 0.0
+            wrapped = station
+            t_all = t
+        jumps = np.diff(wrapped)
+        laps = np.concatenate(([0.0], np.cumsum((jumps < -length / 2).astype(float) -
+                                                (jumps > length / 2).astype(float))))
+        g = wrapped + (laps + start_lap) * length
+        self._last = (t_all[-1], g[-1])
+        self._record_boundaries(t_all, g)
+
+        # Desvio lateral por volta e curva, apenas das amostras novas
+        g_new = g[-len(t):]
+        lap_ids = np.floor(g_new / length).astype(np.int64)
+        s = g_new - lap_ids * length
+        corner_ids = self._corner_at(s)
+        inside = corner_ids >= 0
+        if not inside.any():
+            return
+        keys = lap_ids[inside] * len(self.corners) + corner_ids[inside]
+        dev = np.abs(lateral[inside])
+        unique, inverse = np.unique(keys, return_inverse=True)
+        sums = np.bincount(inverse, dev)
+        counts = np.bincount(inverse)
+        maxima = np.zeros(len(unique))
+        np.maximum.at(maxima, inverse, dev)
+        for key, total, peak, count in zip(unique, sums, maxima, counts):
+            acc = self._lateral.setdefault(int(key), [0.0, 0.0, 0])
+            acc[0] += total
+            acc[1] = max(acc[1], peak)
+            acc[2] += int(count)
+
+    def _corner_at(self, s):
+        """Índice da curva que contém cada estação, ou -1 (busca binária nos intervalos)."""
+        segment = np.searchsorted(self._bounds, s, side='right') - 1
+        return self._corner_id[np.clip(segment, 0, len(self._corner_id) - 1)]
+
+    def _record_boundaries(self, t, g):
+        """Interpola o instante em que a estação contínua cruza largada, entradas e saídas."""
+        length = self.projector.length
+        g_mono = np.maximum.accumulate(g)
+        first_lap = int(np.floor(g_mono[0] / length))
+        last_lap = int(np.floor(g_mono[-1] / length))
+        laps = np.arange(first_lap, last_lap + 1)
+        marks = np.concatenate(([0.0], self.corner_entry, self.corner_exit))
+        targets = (laps[:, None] * length + marks[None, :])
+        # Saídas antes da entrada pertencem à volta seguinte
+        wrap = np.concatenate(([False], np.zeros(len(self.corners), bool),
+                               self.corner_exit < self.corner_entry))
+        targets = targets + wrap[None, :] * length
+        crossed = (targets > g_mono[0]) & (targets <= g_mono[-1])
+        times = np.interp(targets[crossed], g_mono, t)
+        lap_idx, mark_idx = np.nonzero(crossed)
+        for lap, mark, when in zip(laps[lap_idx], mark_idx, times):
+            self._boundary_times[(int(lap), int(mark))] = float(when)
+
+    def results(self):
+        """Voltas completas com tempo, e por curva o delta de tempo e o desvio lateral."""
+        n_corners = len(self.corners)
+        ref_corner = np.array([self._ref_between(a, b) for a, b in
+                               zip(self.corner_entry, self.corner_exit)])
+        laps = sorted({lap for lap, mark in self._boundary_times if mark == 0})
+        report = []
+        for lap in laps:
+            start = self._boundary_times.get((lap, 0))
+            end = self._boundary_times.get((lap + 1, 0))
+            if start is None or end is None:
+                continue
+            corners = []
+            for k in range(n_corners):
+                entry = self._boundary_times.get((lap, 1 + k))
+                exit_ = self._boundary_times.get((lap, 1 + n_corners + k))
+                acc = self._lateral.get(lap * n_corners + k)
+                corners.append({
+                    'corner': k,
+                    'time': None if entry is None or exit_ is None else exit_ - entry,
+                    'delta_time': None if entry is None or exit_ is None else exit_ - entry - ref_corner[k],
+                    'mean_lateral': None if acc is None else acc[0] / acc[2],
+                    'max_lateral': None if acc is None else acc[1],
+                })
+            report.append({'lap': lap, 'lap_time': end - start,
+                           'delta_time': end - start - self.ref_lap_time, 'corners': corners})
+        return report
+
+    def _ref_between(self, entry, exit_):
+        t_entry = np.interp(entry, self.ref_station, self.ref_time)
+        t_exit = np.interp(exit_, self.ref_station, self.ref_time)
+        if exit_ < entry:
+            t_exit += self.ref_lap_time
+        return t_exit - t_entry
+
+
+def analyze_log(path, racing_line, kart_params, affine=None, columns=DEFAULT_COLUMNS,
+                chunk_size=CHUNK_SIZE):
+    """Atalho: lê o log em blocos e devolve LapAnalyzer.results()."""
+    analyzer = LapAnalyzer(racing_line, kart_params, affine)
+    for t, x, y in read_samples(path, columns, chunk_size):
+        analyzer.feed(t, x, y)
+    return analyzer.results()
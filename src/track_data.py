@@ -0,0 +1,108 @@
+import numpy as np
+
+
+def as_points(points):
+    """Retorna uma visão (N, 2) de um Polyline ou de um array no formato do OpenCV (N, 1, 2).
+
+    Dimensões de lote são preservadas: (..., N, 1, 2) vira (..., N, 2).
+    """
+    if isinstance(points, Polyline):
+        return points.points
+    points = np.asarray(points)
+    if points.ndim >= 3 and points.shape[-2] == 1:
+        return points[..., 0, :]
+    if points.ndim >= 2 and points.shape[-1] == 2:
+        return points
+    return points.reshape(-1, 2)
+
+
+class Polyline:
+    """Sequência de pontos em um único bloco contíguo (N, 2).
+
+    x e y são visões das colunas e as_cv() devolve a visão (N, 1, 2) esperada
+    pelo OpenCV, sem cópias. A capacidade é reservada de antemão para que os
+    geradores preencham o buffer em vez de acumular listas de arrays.
+    """
+
+    __slots__ = ('_data', '_size', 'closed')
+
+    def __init__(self, capacity=0, dtype=np.float64, closed=True):
+        self._data = np.empty((capacity, 2), dtype=dtype)
+        self._size = 0
+        self.closed = closed
+
+    @classmethod
+    def empty(cls, size, dtype=np.float64, closed=True):
+        """Polyline com size pontos não inicializados, pronto para ser preenchido."""
+        line = cls(size, dtype, closed)
+        line._size = size
+        return line
+
+    @classmethod
+    def from_array(cls, points, dtype=None, closed=True, copy=False):
+        """Envolve um array (N, 2) ou (N, 1, 2); reaproveita a memória quando possível."""
+        points = as_points(points)
+        if dtype is not None and points.dtype != dtype:
+            points = points.astype(dtype)
+        elif copy or not points.flags['C_CONTIGUOUS']:
+            points = np.array(points, order='C')
+        line = cls.__new__(cls)
+        line._data = points
+        line._size = len(points)
+        line.closed = closed
+        return line
+
+    def __len__(self):
+        return self._size
+
+    def __getitem__(self, index):
+        return self.points[index]
+
+    def __setitem__(self, index, value):
+        self.points[index] = value
+
+    def __array__(self, dtype=None):
+        return self.as_cv() if dtype is None else self.as_cv().astype(dtype)
+
+    @property
+    def dtype(self):
+        return self._data.dtype
+
+    @property
+    def points(self):
+        return self._data[:self._size]
+
+    @property
+    def x(self):
+        return self._data[:self._size, 0]
+
+    @property
+    def y(self):
+        return self._data[:self._size, 1]
+
+    def as_cv(self):
+        """Visão (N, 1, 2) compartilhando a memória do buffer."""
+        return self.points.reshape(-1, 1, 2)
+
+    def append(self, point):
+        if self._size == len(self._data):
+            self.reserve(max(16, 2 * len(self._data)))
+        self._data[self._size] = point
+        self._size += 1
+
+    def reserve(self, capacity):
+        if capacity <= len(self._data):
+            return
+        data = np.empty((capacity, 2), dtype=self._data.dtype)
+        data[:self._size] = self._data[:self._size]
+        self._data = data
+
+    def segment_lengths(self):
+        """Comprimento de cada segmento; inclui o de fechamento quando closed."""
+        pts = self.points
+        diffs = np.diff(pts, axis=0, append=pts[:1]) if self.closed else np.diff(pts, axis=0)
+        return np.hypot(diffs[:, 0], diffs[:, 1])
+
+    def length(self):
+        return float(self.segment_lengths().sum())
+
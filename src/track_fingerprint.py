@@ -0,0 +1,138 @@
+import hashlib
+import json
+import os
+import cv2
+import numpy as np
+
+# Faixa larga e fixa: a assinatura não pode depender dos limites aprendidos.
+# V mínimo baixo para tolerar mudanças de iluminação entre sessões.
+FINGERPRINT_LOWER = np.array([20, 100, 50])
+FINGERPRINT_UPPER = np.array([40, 255, 255])
+# Lado da máscara usada para registrar a imagem nova com a guardada
+REGISTRATION_SIDE = 512
+# Pico mínimo da correlação de fase para aceitar o deslocamento
+MIN_RESPONSE = 0.3
+# Campos com coordenadas em pixels, deslocados junto com a imagem
+PIXEL_FIELDS = ('contour', 'racing_line', 'seg_points')
+
+
+def compute_fingerprint(image, mask_size=128, grid_size=32):
+    """Assinatura barata do traçado: ocupação da máscara amarela numa grade grid_size x grid_size.
+
+    A imagem é reduzida antes da conversão para HSV, então o custo é uma
+    pequena fração de uma detecção completa.
+    """
+    small = cv2.resize(image, (mask_size, mask_size), interpolation=cv2.INTER_LINEAR)
+    mask = cv2.inRange(cv2.cvtColor(small, cv2.COLOR_BGR2HSV), FINGERPRINT_LOWER, FINGERPRINT_UPPER)
+    grid = cv2.resize(mask, (grid_size, grid_size), interpolation=cv2.INTER_AREA)
+    # Suaviza para tolerar pequenos deslocamentos da câmera
+    return cv2.GaussianBlur(grid, (3, 3), 0)
+
+
+def fingerprint_distance(a, b):
+    """Maior diferença local de ocupação (0-1); b pode ter várias assinaturas empilhadas."""
+    b = np.asarray(b)
+    diff = np.abs(b.astype(np.int16) - a.astype(np.int16)).reshape(*b.shape[:-2], -1)
+    return diff.max(axis=-1) / 255.0
+
+
+def registration_mask(image, side=REGISTRATION_SIDE):
+    """Máscara amarela amostrada com passo inteiro (até side pixels no lado maior), em float32."""
+    step = max(1, int(np.ceil(max(image.shape[:2]) / side)))
+    small = np.ascontiguousarray(image[::step, ::step])
+    mask = cv2.inRange(cv2.cvtColor(small, cv2.COLOR_BGR2HSV), FINGERPRINT_LOWER, FINGERPRINT_UPPER)
+    return cv2.GaussianBlur(mask, (5, 5), 0).astype(np.float32), step
+
+
+def register(reference, mask, step):
+    """Deslocamento (dx, dy) em pixels da imagem de mask em relação à de reference, e o pico da correlação."""
+    window = cv2.createHanningWindow(reference.shape[::-1], cv2.CV_32F)
+    (dx, dy), response = cv2.phaseCorrelate(reference.astype(np.float32), mask, window)
+    return np.array([dx * step, dy * step]), response
+
+
+def params_key(kart_params):
+    return hashlib.sha1(json.dumps(kart_params, sort_keys=True).encode()).hexdigest()
+
+
+class TrackLibrary:
+    """Pistas já processadas, guardadas em disco e indexadas pela assinatura.
+
+    A assinatura só escolhe candidatos: a geometria guardada está em pixels
+    da imagem de origem, então match com a imagem exige o mesmo tamanho e
+    registra as duas imagens por correlação de fase, devolvendo contorno,
+    racing line e segmentação deslocados para a imagem nova.
+    """
+
+    def __init__(self, folder, tolerance=0.3):
+        self.folder = folder
+        self.tolerance = tolerance
+        self.entries = []
+        for name in sorted(os.listdir(folder)) if os.path.isdir(folder) else []:
+            if name.endswith('.npz'):
+                with np.load(os.path.join(folder, name)) as data:
+                    self.entries.append({key: data[key] for key in data.files})
+        self._signatures = (np.stack([e['fingerprint'] for e in self.entries])
+                            if self.entries else None)
+
+    def match(self, fingerprint, image=None):
+        """Retorna a pista conhecida mais parecida dentro da tolerância, ou None.
+
+        Com image só valem entradas gravadas com imagem do mesmo tamanho que
+        registram com ela; a entrada devolvida é uma cópia com as coordenadas
+        em pixels deslocadas (shift) para image.
+        """
+        if self._signatures is None:
+            return None
+        distances = fingerprint_distance(fingerprint, self._signatures)
+        mask = None
+        for best in np.argsort(distances, kind='stable'):
+            if distances[best] > self.tolerance:
+                return None
+            entry = self.entries[best]
+            if image is None:
+                return entry
+            if 'image_shape' not in entry or tuple(entry['image_shape']) != image.shape[:2]:
+                continue
+            if mask is None:
+                mask, step = registration_mask(image)
+            shift, response = register(entry['registration'], mask, step)
+            if response < MIN_RESPONSE:
+                continue
+            entry = dict(entry, shift=shift)
+            for field in PIXEL_FIELDS:
+                if field in entry:
+                    entry[field] = self._translate(entry[field], shift)
+            return entry
+        return None
+
+    @staticmethod
+    def _translate(points, shift):
+        points = np.asarray(points)
+        moved = points.astype(np.float64) + shift.reshape((1,) * (points.ndim - 1) + (2,))
+        return np.round(moved).astype(points.dtype) if np.issubdtype(points.dtype, np.integer) else moved
+
+    def add(self, name, fingerprint, contour, racing_line, lap_time, kart_params, segments=None,
+            image=None):
+        """Guarda a pista; segments (TrackSegmentation) vai junto no mesmo arquivo.
+
+        Com image guarda também o tamanho e a máscara de registro, que match usa.
+        """
+        entry = {
+            'name': np.array(name),
+            'fingerprint': fingerprint,
+            'contour': np.asarray(contour),
+            'racing_line': np.asarray(racing_line),
+            'lap_time': np.array(np.nan if lap_time is None else lap_time),
+            'params_key': np.array(params_key(kart_params)),
+        }
+        if segments is not None:
+            entry.update(segments.to_arrays())
+        if image is not None:
+            entry['image_shape'] = np.array(image.shape[:2])
+            entry['registration'] = registration_mask(image)[0].astype(np.uint8)
+        os.makedirs(self.folder, exist_ok=True)
+        np.savez(os.path.join(self.folder, f"{len(self.entries):04d}_{name}.npz"), **entry)
+        self.entries.append(entry)
+        self._signatures = np.stack([e['fingerprint'] for e in self.entries])
+        return entry
@@ -1,20 +1,22 @@
 import numpy as np
 import cv2
+from .track_data import Polyline, as_points
 
 def calculate_centerline(contour, num_points=100):
     """Calcula uma linha central suave para a pista"""
-    # Calcula o comprimento total do contorno
+    # Calcula o comprimento total do contorno (arcLength só aceita int32 e float32)
+    if contour.dtype != np.int32:
+        contour = contour.astype(np.float32)
     perimeter = cv2.arcLength(contour, True)
     
     # Gera pontos equidistantes ao longo do contorno
-    points = []
+    points = Polyline.empty(num_points)
     for i in range(num_points):
         dist = (i / num_points) * perimeter
         # Obtém o ponto na distância especificada
-        point = get_point_at_distance(contour, dist)
-        points.append(point)
+        points[i] = get_point_at_distance(contour, dist)
     
-    return np.array(points).reshape((-1, 1, 2))
+    return points.as_cv()
 
 def get_point_at_distance(contour, distance):
     """Obtém um ponto no contorno a uma certa distância do início"""
@@ -38,8 +40,8 @@ def get_point_at_distance(contour, distance):
 
 def generate_racing_line(centerline, max_speed, friction_coeff):
     """Gera a linha de corrida ideal baseada em física"""
-    points = centerline.squeeze()
-    racing_line = []
+    points = as_points(centerline)
+    racing_line = Polyline.empty(len(points))
     
     # Parâmetros físicos
     g = 9.8  # gravidade
@@ -80,7 +82,6 @@ def generate_racing_line(centerline, max_speed, friction_coeff):
         else:
             displacement = np.array([0, 0])
             
-        racing_point = curr_point + displacement
-        racing_line.append(racing_point)
+        racing_line[i] = curr_point + displacement
     
-    return np.array(racing_line).reshape((-1, 1, 2))
\ No newline at end of file
+    return racing_line.as_cv()
\ No newline at end of file
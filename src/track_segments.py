@@ -0,0 +1,225 @@
+import numpy as np
+from .kart_physics import curvature_profile
+from .track_data import as_points
+
+# Limiares de curvatura (1/m) da histerese: entra na curva acima de
+# ENTER_CURVATURE (raio 40 m) e só sai abaixo de EXIT_CURVATURE (raio ~67 m)
+ENTER_CURVATURE = 0.025
+EXIT_CURVATURE = 0.015
+# Desvio padrão (m) da suavização da curvatura ao longo da linha
+SMOOTHING = 4.0
+
+CORNER_FIELDS = ('entry_index', 'exit_index', 'apex_index', 'entry', 'exit', 'apex',
+                 'direction', 'min_radius')
+
+
+class TrackSegmentation:
+    """Divisão da linha em retas e curvas, guardada em arrays de intervalos.
+
+    bounds (S + 1) são as estações (m) onde cada trecho começa, de 0 até o
+    comprimento da volta; corner_id (S) diz a que curva o trecho pertence
+    (-1 nas retas). Uma curva que cruza a linha de chegada vira dois trechos
+    com o mesmo corner_id. Os campos de curva (C) trazem entrada, ápice e
+    saída (índice do ponto e estação), direction (+1 à direita, -1 à esquerda,
+    com y para baixo como na imagem) e min_radius em metros.
+    """
+
+    __slots__ = ('points', 'station', 'length', 'bounds', 'corner_id') + CORNER_FIELDS
+
+    def __init__(self, points, station, length, bounds, corner_id, **corners):
+        self.points = points
+        self.station = station
+        self.length = float(length)
+        self.bounds = bounds
+        self.corner_id = corner_id
+        for field in CORNER_FIELDS:
+            setattr(self, field, corners[field])
+
+    def __len__(self):
+        return len(self.entry)
+
+    def segment_at(self, s):
+        """Índice do trecho que contém cada estação (m), por busca binária."""
+        s = np.mod(s, self.length)
+        return np.searchsorted(self.bounds, s, side='right') - 1
+
+    def corner_at(self, s):
+        """Índice da curva que contém cada estação, ou -1 nas retas."""
+        return self.corner_id[self.segment_at(s)]
+
+    def point_at(self, s):
+        """Posição (pixels) na linha para cada estação (m)."""
+        s = np.mod(np.asarray(s, dtype=np.float64), self.length)
+        closed = np.vstack((self.points, self.points[:1]))
+        stations = np.append(self.station, self.length)
+        return np.column_stack((np.interp(s, stations, closed[:, 0]), np.interp(s, stations, closed[:, 1])))
+
+    def braking_points(self, distance):
+        """Estações (m) e posições (pixels) a distance metros antes da entrada de cada curva."""
+        stations = np.mod(self.entry - distance, self.length)
+        return stations, self.point_at(stations)
+
+    def sectors(self):
+        """Setores (início, fim) em metros: da entrada de uma curva até a entrada da seguinte."""
+        return np.column_stack((self.entry, np.roll(self.entry, -1)))
+
+    def to_arrays(self, prefix='seg_'):
+        """Arrays para guardar junto com a pista (np.savez)."""
+        arrays = {name: getattr(self, name) for name in ('points', 'station', 'bounds', 'corner_id')}
+        arrays.update({field: getattr(self, field) for field in CORNER_FIELDS})
+        arrays['length'] = np.array(self.length)
+        return {prefix + name: value for name, value in arrays.items()}
+
+    @classmethod
+    def from_arrays(cls, arrays, prefix='seg_'):
+        """Reconstrói a partir de to_arrays; None se a entrada não tem segmentação."""
+        if prefix + 'bounds' not in arrays:
+            return None
+        values = {name: np.asarray(arrays[prefix + name]) for name in
+                  ('points', 'station', 'bounds', 'corner_id') + CORNER_FIELDS}
+        return cls(length=float(arrays[prefix + 'length']), **values)
+
+
+def segment_track(line, scale=1.0, track_length=None, enter_curvature=ENTER_CURVATURE,
+                  exit_curvature=EXIT_CURVATURE, min_length=3.0, smoothing=SMOOTHING):
+    """Segmenta uma linha fechada em retas e curvas por histerese na curvatura.
+
+    scale converte pixels em metros; com track_length (comprimento real da
+    volta) a escala é calculada a partir dele. A curvatura é suavizada numa janela
+    gaussiana de smoothing metros antes dos limiares, para que o serrilhado
+    da linha não vire curvas. Curvas mais curtas que min_length metros são
+    descartadas e uma troca de sentido dentro de uma curva (S) a divide em
+    duas. O raio mínimo vem da curvatura sem suavizar.
+    """
+    points = as_points(line).astype(np.float64)
+    n = len(points)
+    seg_len = np.hypot(*(np.roll(points, -1, axis=0) - points).T)
+    if track_length is not None:
+        scale = track_length / seg_len.sum()
+    seg_len = seg_len * scale
+    station = np.concatenate(([0.0], np.cumsum(seg_len)[:-1]))
+    length = float(seg_len.sum())
+
+    curvature = curvature_profile(points) / scale
+    smooth = _smooth_circular(curvature, smoothing * n / max(length, 1e-12))
+    in_corner = _hysteresis(np.abs(smooth), enter_curvature, exit_curvature)
+    runs = _corner_runs(in_corner, np.sign(smooth))
+
+    # Descarta curvas curtas demais; comprimento somado de modo circular
+    cumulative = np.concatenate(([0.0], np.cumsum(np.concatenate((seg_len, seg_len)))))
+    if len(runs):
+        run_length = cumulative[runs[:, 1]] - cumulative[runs[:, 0]]
+        runs = runs[run_length >= min_length]
+
+    entry_index = runs[:, 0] % n if len(runs) else np.empty(0, int)
+    exit_index = runs[:, 1] % n if len(runs) else np.empty(0, int)
+    # Ápice no máximo da curvatura suavizada; raio mínimo pela curvatura bruta
+    spans = [np.arange(a, b) % n for a, b in runs]
+    apex_index = np.array([idx[np.argmax(np.abs(smooth[idx]))] for idx in spans], dtype=int)
+    peak_curvature = np.array([np.abs(curvature[idx]).max() for idx in spans])
+
+    corners = {
+        'entry_index': entry_index,
+        'exit_index': exit_index,
+        'apex_index': apex_index,
+        'entry': station[entry_index],
+        'exit': station[exit_index],
+        'apex': station[apex_index],
+        'direction': np.sign(smooth[apex_index]).astype(int),
+        'min_radius': 1.0 / np.maximum(peak_curvature, 1e-12),
+    }
+    bounds, corner_id = corner_intervals(corners['entry'], corners['exit'], length)
+    return TrackSegmentation(points, station, length, bounds, corner_id, **corners)
+
+
+def _smooth_circular(values, sigma):
+    """Suavização gaussiana circular; sigma em pontos."""
+    if sigma < 0.5:
+        return values
+    radius = min(int(np.ceil(3 * sigma)), len(values) // 2)
+    x = np.arange(-radius, radius + 1)
+    kernel = np.exp(-0.5 * (x / sigma) ** 2)
+    padded = values[np.arange(-radius, len(values) + radius) % len(values)]
+    return np.convolve(padded, kernel / kernel.sum(), mode='valid')
+
+
+def _hysteresis(abs_curvature, enter, exit_):
+    """Marca os pontos em curva: liga acima de enter, desliga abaixo de exit_ (volta fechada)."""
+    high = abs_curvature > enter
+    low = abs_curvature < exit_
+    if not high.any():
+        return np.zeros(len(abs_curvature), bool)
+    if not low.any():
+        return np.ones(len(abs_curvature), bool)
+
+    # Começa num ponto de reta para que o estado inicial seja conhecido,
+    # e propaga o último limiar cruzado
+    shift = int(np.argmax(low))
+    high = np.roll(high, -shift)
+    low = np.roll(low, -shift)
+    last = np.maximum.accumulate(np.where(high | low, np.arange(len(high)), 0))
+    return np.roll(high[last], shift)
+
+
+def _corner_runs(in_corner, sign):
+    """Trechos contínuos em curva, (início, fim exclusivo), divididos quando o sentido muda.
+
+    Os índices podem passar de N quando a curva cruza a linha de chegada.
+    """
+    n = len(in_corner)
+    if in_corner.all():
+        # Sem retas: começa numa troca de sentido, se houver
+        flips = np.flatnonzero(sign != np.roll(sign, 1))
+        if len(flips) == 0:
+            return np.array([[0, n]])
+        shift = int(flips[0])
+    else:
+        shift = int(np.argmin(in_corner))
+    inside = np.roll(in_corner, -shift)
+    direction = np.roll(sign, -shift)
+    starts = inside & ~np.concatenate(([False], inside[:-1]))
+    flips = inside & np.concatenate(([False], inside[:-1])) & (direction != np.concatenate(([0], direction[:-1])))
+    begin = np.flatnonzero(starts | flips)
+    # Cada trecho termina no próximo começo ou no primeiro ponto de reta
+    ends = np.append(np.flatnonzero(~inside), n)
+    next_straight = ends[np.searchsorted(ends, begin)]
+    next_begin = np.append(begin[1:], n)
+    end = np.minimum(next_straight, next_begin)
+    return np.column_stack((begin, end)) + shift
+
+
+def corner_intervals(entry, exit_, length):
+    """Limites ordenados dos trechos e a curva de cada um (-1 nas retas).
+
+    entry e exit_ são as estações (m) de cada curva; exit_ < entry indica
+    uma curva que cruza a linha de chegada.
+    """
+    marks = [0.0, length]
+    for a, b in zip(entry, exit_):
+        marks += [a, b]
+    bounds = np.unique(marks)
+    mids = 0.5 * (bounds[:-1] + bounds[1:])
+    corner_id = np.full(len(mids), -1)
+    for k, (a, b) in enumerate(zip(entry, exit_)):
+        inside = (mids >= a) & (mids < b) if a < b else (mids >= a) | (mids < b)
+        corner_id[inside] = k
+    return bounds, corner_id
+
+
+def format_segments(segments, braking_distance=None):
+    """Relatório em texto: uma linha por curva e os setores entre elas."""
+    lines = [f"{len(segments)} curvas em {segments.length:.0f} m"]
+    if braking_distance is not None:
+        braking, _ = segments.braking_points(braking_distance)
+    for k in range(len(segments)):
+        side = 'direita' if segments.direction[k] > 0 else 'esquerda'
+        row = (f"  Curva {k + 1:>2} ({side:>8}): entrada {segments.entry[k]:6.1f} m, "
+               f"ápice {segments.apex[k]:6.1f} m, saída {segments.exit[k]:6.1f} m, "
+               f"raio mínimo {segments.min_radius[k]:5.1f} m")
+        if braking_distance is not None:
+            row += f", frenagem {braking[k]:6.1f} m"
+        lines.append(row)
+    for k, (start, end) in enumerate(segments.sectors()):
+        lines.append(f"  Setor {k + 1:>2}: {start:6.1f} m -> {end:6.1f} m "
+                     f"({np.mod(end - start, segments.length) or segments.length:.1f} m)")
+    return "\n".join(lines)
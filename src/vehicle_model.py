@@ -0,0 +1,270 @@
+import hashlib
+import json
+import os
+import numpy as np
+
+G = 9.8
+AIR_DENSITY = 1.2  # kg/m³
+# friction_coeff em que as classes têm a aderência nominal; outros valores escalam grip
+REFERENCE_FRICTION = 1.5
+
+CACHE_FOLDER = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'vehicle_cache')
+# Variável de ambiente que troca a pasta do cache em disco
+CACHE_ENV = 'KART_VEHICLE_CACHE'
+# Envelopes mantidos em memória e arquivos mantidos na pasta; os mais antigos saem primeiro
+MAX_ENVELOPES = 64
+MAX_CACHE_FILES = 64
+
+# Classes de kart. torque_curve: pares (rpm, N.m); gear_ratios multiplicam o
+# final_drive (coroa / pinhão); karts de marcha única têm uma só relação.
+KART_CLASSES = {
+    'rental': {
+        'mass': 160,              # kg (kart + piloto)
+        'torque_curve': [(1500, 20.0), (2500, 26.0), (3000, 25.5), (3600, 23.0), (3800, 21.0)],
+        'max_rpm': 3800,          # motor limitado (4 tempos de aluguel)
+        'clutch_rpm': 2000,
+        'gear_ratios': [1.0],
+        'final_drive': 3.3,
+        'wheel_radius': 0.14,     # m
+        'drivetrain_efficiency': 0.9,
+        'drag_area': 0.5,         # Cd * A (m²)
+        'rolling_coeff': 0.02,
+        'grip': 1.3,              # coeficiente de atrito lateral do pneu
+        'longitudinal_grip': 1.2,
+        'brake_fraction': 0.7,    # freio só no eixo traseiro
+    },
+    'x30': {
+        'mass': 160,
+        'torque_curve': [(6000, 6.0), (9000, 11.0), (11000, 14.0), (13000, 13.5), (15000, 11.5),
+                         (16000, 10.0)],
+        'max_rpm': 16000,
+        'clutch_rpm': 6000,
+        'gear_ratios': [1.0],
+        'final_drive': 6.7,
+        'wheel_radius': 0.135,
+        'drivetrain_efficiency': 0.92,
+        'drag_area': 0.45,
+        'rolling_coeff': 0.015,
+        'grip': 1.7,
+        'longitudinal_grip': 1.5,
+        'brake_fraction': 0.7,
+    },
+    'kz': {
+        'mass': 175,
+        'torque_curve': [(5000, 12.0), (8000, 18.0), (11000, 24.0), (12500, 25.0), (14000, 23.0),
+                         (14500, 21.0)],
+        'max_rpm': 14500,
+        'clutch_rpm': 5000,
+        'gear_ratios': [3.3, 2.6, 2.1, 1.8, 1.6, 1.45],
+        'final_drive': 3.6,
+        'wheel_radius': 0.135,
+        'drivetrain_efficiency': 0.9,
+        'drag_area': 0.45,
+        'rolling_coeff': 0.015,
+        'grip': 1.8,
+        'longitudinal_grip': 1.6,
+        'brake_fraction': 1.0,    # freio nas quatro rodas
+    },
+}
+
+
+class GGVEnvelope:
+    """Envelope g-g-v tabelado: acelerações disponíveis por velocidade e fração lateral.
+
+    accel[i, j] e brake[i, j] são as acelerações longitudinais (m/s², freio
+    positivo) na velocidade speeds[i] usando a fração lateral[j] da aderência
+    lateral máxima lateral_max[i]. As grades são uniformes, então as consultas
+    são só aritmética de índices e interpolação bilinear.
+    """
+
+    def __init__(self, speeds, lateral, lateral_max, accel, brake):
+        self.speeds = np.asarray(speeds, dtype=np.float64)
+        self.lateral = np.asarray(lateral, dtype=np.float64)
+        self.lateral_max = np.asarray(lateral_max, dtype=np.float64)
+        self.accel = np.asarray(accel, dtype=np.float64)
+        self.brake = np.asarray(brake, dtype=np.float64)
+        # Curvatura máxima em cada velocidade, decrescente: k = a_lat / v²
+        self.corner_curvature = self.lateral_max / np.maximum(self.speeds, 0.1) ** 2
+        self._dv = self.speeds[1] - self.speeds[0]
+        self._dl = self.lateral[1] - self.lateral[0]
+
+    @property
+    def top_speed(self):
+        return float(self.speeds[-1])
+
+    def corner_speed(self, curvature, bank_accel=0.0):
+        """Maior velocidade em que a curvatura (1/m) ainda cabe na aderência lateral.
+
+        bank_accel (m/s²) é a parte da aceleração lateral sustentada pela
+        inclinação da pista.
+        """
+        if np.all(np.asarray(bank_accel) == 0):
+            return np.interp(curvature, self.corner_curvature[::-1], self.speeds[::-1])
+        curvature, bank_accel = np.broadcast_arrays(np.asarray(curvature, dtype=np.float64), bank_accel)
+        # Folga (1/m) em cada velocidade da grade; decrescente com a velocidade
+        margin = ((self.lateral_max[:, None] + bank_accel.ravel()) / np.maximum(self.speeds, 0.1)[:, None] ** 2
+                  - curvature.ravel())
+        last = np.clip((margin >= 0).sum(axis=0) - 1, 0, len(self.speeds) - 2)
+        cols = np.arange(margin.shape[1])
+        m0, m1 = margin[last, cols], margin[last + 1, cols]
+        frac = np.clip(m0 / np.where(m0 > m1, m0 - m1, 1.0), 0.0, 1.0)
+        speed = self.speeds[last] + frac * self._dv
+        speed = np.where(margin[-1] >= 0, self.speeds[-1], speed)
+        return speed.reshape(curvature.shape)
+
+    def _lookup(self, table, v, a_lat):
+        x = np.clip((v - self.speeds[0]) / self._dv, 0, len(self.speeds) - 1)
+        lat_max = np.interp(v, self.speeds, self.lateral_max)
+        y = np.clip(np.abs(a_lat) / lat_max / self._dl, 0, len(self.lateral) - 1)
+        i = np.minimum(x.astype(np.intp), len(self.speeds) - 2)
+        j = np.minimum(y.astype(np.intp), len(self.lateral) - 2)
+        fx, fy = x - i, y - j
+        return ((table[i, j] * (1 - fx) + table[i + 1, j] * fx) * (1 - fy) +
+                (table[i, j + 1] * (1 - fx) + table[i + 1, j + 1] * fx) * fy)
+
+    def acceleration(self, v, a_lat):
+        """Aceleração longitudinal máxima (m/s², pode ser negativa acima da velocidade final)."""
+        return self._lookup(self.accel, v, a_lat)
+
+    def braking(self, v, a_lat):
+        """Desaceleração máxima (m/s², positiva)."""
+        return self._lookup(self.brake, v, a_lat)
+
+    def save(self, path):
+        np.savez(path, speeds=self.speeds, lateral=self.lateral, lateral_max=self.lateral_max,
+                 accel=self.accel, brake=self.brake)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(data['speeds'], data['lateral'], data['lateral_max'], data['accel'], data['brake'])
+
+
+class VehicleModel:
+    """Modelo de kart: curva de torque, relações, arrasto, resistência ao rolamento e pneus."""
+
+    def __init__(self, kart_class='rental', **overrides):
+        if kart_class not in KART_CLASSES:
+            raise ValueError(f"Classe de kart desconhecida: {kart_class}")
+        self.kart_class = kart_class
+        self.params = dict(KART_CLASSES[kart_class])
+        self.params.update(overrides)
+
+    @classmethod
+    def from_params(cls, kart_params):
+        """Modelo de kart_params['kart_class']; chaves do modelo presentes em kart_params (mass, grip...) o sobrescrevem.
+
+        friction_coeff escala a aderência da classe (lateral e longitudinal)
+        por friction_coeff / REFERENCE_FRICTION, como uma pista mais ou menos
+        aderente; grip ou longitudinal_grip explícitos não são escalados.
+        """
+        kart_class = kart_params['kart_class']
+        overrides = {key: value for key, value in kart_params.items()
+                     if key in KART_CLASSES.get(kart_class, {})}
+        model = cls(kart_class, **overrides)
+        scale = kart_params.get('friction_coeff', REFERENCE_FRICTION) / REFERENCE_FRICTION
+        for key in ('grip', 'longitudinal_grip'):
+            if key not in overrides:
+                model.params[key] *= scale
+        return model
+
+    def key(self):
+        payload = {'kart_class': self.kart_class, **self.params}
+        return hashlib.sha1(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+
+    def engine_force(self, v):
+        """Força de tração (N) na roda, na melhor marcha para cada velocidade."""
+        p = self.params
+        v = np.asarray(v, dtype=np.float64)
+        rpm_curve, torque_curve = np.array(p['torque_curve'], dtype=np.float64).T
+        ratios = np.asarray(p['gear_ratios'], dtype=np.float64) * p['final_drive']
+
+        rpm = v[..., None] / p['wheel_radius'] * ratios * 60 / (2 * np.pi)
+        # Abaixo da rotação da embreagem o motor patina a embreagem nessa rotação
+        torque = np.interp(np.maximum(rpm, p['clutch_rpm']), rpm_curve, torque_curve)
+        force = np.where(rpm <= p['max_rpm'],
+                         torque * ratios * p['drivetrain_efficiency'] / p['wheel_radius'], 0.0)
+        return force.max(axis=-1)
+
+    def resistance(self, v):
+        """Arrasto aerodinâmico mais resistência ao rolamento (N)."""
+        p = self.params
+        return 0.5 * AIR_DENSITY * p['drag_area'] * v ** 2 + p['rolling_coeff'] * p['mass'] * G
+
+    def build_envelope(self, speed_step=0.25, lateral_steps=21):
+        """Calcula o envelope g-g-v na grade (velocidade x fração lateral)."""
+        p = self.params
+        ratios = np.asarray(p['gear_ratios'], dtype=np.float64) * p['final_drive']
+        # Velocidade no limite de rotação da marcha mais longa
+        v_limit = p['max_rpm'] * 2 * np.pi / 60 * p['wheel_radius'] / ratios.min()
+        speeds = np.arange(0.0, v_limit + speed_step, speed_step)
+        lateral = np.linspace(0.0, 1.0, lateral_steps)
+
+        lateral_max = np.full(len(speeds), p['grip'] * G)
+        # Círculo de atrito (elipse quando a aderência longitudinal é diferente)
+        traction = p['longitudinal_grip'] * G * np.sqrt(1.0 - lateral ** 2)
+        resist = (self.resistance(speeds) / p['mass'])[:, None]
+        engine = (self.engine_force(speeds) / p['mass'])[:, None]
+
+        accel = np.minimum(engine, traction[None, :]) - resist
+        brake = p['brake_fraction'] * traction[None, :] + resist
+
+        # A tabela termina na velocidade final, onde a aceleração em reta zera
+        positive = np.flatnonzero(accel[:, 0] > 0)
+        last = min(len(speeds), positive[-1] + 2) if positive.size else 2
+        return GGVEnvelope(speeds[:last], lateral, lateral_max[:last], accel[:last], brake[:last])
+
+    def envelope(self, cache_folder=None):
+        """Envelope do modelo; calculado uma vez e guardado em disco e em memória.
+
+        Sem cache_folder usa default_cache_folder(), resolvida a cada chamada.
+        """
+        key = self.key()
+        if key in _ENVELOPES:
+            return _ENVELOPES[key]
+        if cache_folder is None:
+            cache_folder = default_cache_folder()
+        path = os.path.join(cache_folder, f"{self.kart_class}_{key[:16]}.npz")
+        if os.path.exists(path):
+            envelope = GGVEnvelope.load(path)
+        else:
+            envelope = self.build_envelope()
+            os.makedirs(cache_folder, exist_ok=True)
+            # Escreve num temporário e renomeia: outro processo nunca lê um arquivo pela metade
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                envelope.save(f)
+            os.replace(tmp_path, path)
+            _prune_cache(cache_folder)
+        if len(_ENVELOPES) >= MAX_ENVELOPES:
+            _ENVELOPES.pop(next(iter(_ENVELOPES)))
+        _ENVELOPES[key] = envelope
+        return envelope
+
+
+_ENVELOPES = {}
+
+
+def default_cache_folder():
+    """Pasta do cache em disco: $KART_VEHICLE_CACHE ou CACHE_FOLDER."""
+    return os.environ.get(CACHE_ENV) or CACHE_FOLDER
+
+
+def _prune_cache(cache_folder):
+    """Apaga os envelopes mais antigos da pasta além de MAX_CACHE_FILES."""
+    paths = [os.path.join(cache_folder, name) for name in os.listdir(cache_folder) if name.endswith('.npz')]
+    if len(paths) <= MAX_CACHE_FILES:
+        return
+    try:
+        paths.sort(key=os.path.getmtime)
+        for path in paths[:len(paths) - MAX_CACHE_FILES]:
+            os.remove(path)
+    except OSError:
+        pass  # outro processo apagou algum arquivo ao mesmo tempo
+
+
+def vehicle_envelope(kart_params):
+    """Envelope g-g-v para kart_params, ou None quando não há kart_class (modelo de atrito simples)."""
+    if not kart_params or kart_params.get('kart_class') is None:
+        return None
+    return VehicleModel.from_params(kart_params).envelope()
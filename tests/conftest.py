@@ -0,0 +1,13 @@
+import os
+import sys
+
+import pytest
+
+# Permite importar src/ e os scripts da raiz sem instalar o pacote
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(autouse=True)
+def vehicle_cache(tmp_path, monkeypatch):
+    """Envelopes em disco vão para tmp_path, não para a pasta do repositório."""
+    monkeypatch.setenv('KART_VEHICLE_CACHE', str(tmp_path / 'vehicle_cache'))
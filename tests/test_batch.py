@@ -0,0 +1,43 @@
+import json
+
+import cv2
+import numpy as np
+
+import batch
+
+
+def _write_inputs(folder):
+    folder.mkdir()
+    image = np.zeros((400, 600, 3), np.uint8)
+    cv2.ellipse(image, (300, 200), (240, 150), 0, 0, 360, (0, 255, 255), 20)
+    cv2.imwrite(str(folder / 'oval.png'), image)
+    cv2.imwrite(str(folder / 'empty.png'), np.zeros((100, 100, 3), np.uint8))
+    (folder / 'broken.jpg').write_bytes(b'not an image')
+
+
+def test_both_stages_run_headless_with_json_and_exit_codes(tmp_path):
+    images, tracks, lines = tmp_path / 'images', tmp_path / 'tracks', tmp_path / 'lines'
+    _write_inputs(images)
+    config = tmp_path / 'batch.json'
+    config.write_text(json.dumps({'quiet': True, 'extract': {'morph_size': 5}}))
+
+    report = tmp_path / 'extract.json'
+    code = batch.main(['extract', str(images), '-o', str(tracks), '--workers', '2',
+                       '--config', str(config), '--json', str(report)])
+    records = {r['input'].rsplit('/', 1)[-1]: r for r in json.loads(report.read_text())}
+    assert code == batch.EXIT_FAILED
+    assert records['oval.png']['status'] == 'ok'
+    assert records['empty.png']['status'] == 'no_track'
+    assert records['broken.jpg']['status'] == 'error'
+    assert (tracks / 'contour_oval.npy').exists()
+
+    report = tmp_path / 'racing.json'
+    code = batch.main(['racing-line', str(tracks), '--images', str(images), '-o', str(lines),
+                       '--track-length', '300', '-q', '--json', str(report)])
+    (record,) = json.loads(report.read_text())
+    assert code == batch.EXIT_OK
+    assert record['lap_time'] > 0
+    assert np.load(record['outputs']['racing_line']).shape[1:] == (1, 2)
+    assert (lines / 'racing_oval.jpg').exists()
+
+    assert batch.main(['extract', str(tmp_path / 'missing'), '-q']) == batch.EXIT_NO_INPUT
@@ -0,0 +1,63 @@
+import os
+
+import cv2
+import numpy as np
+import pytest
+
+from src.color_optimizer import ColorOptimizer
+from src.image_processor import detect_yellow_track
+
+SAMPLE_IMAGE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                            'input_images', 'tracado-jeep-sim.jpg')
+
+
+def _track_image(hue, seed=0):
+    rng = np.random.default_rng(seed)
+    hsv = np.zeros((120, 160, 3), np.uint8)
+    hsv[:, 40:120] = (hue, 230, 230)
+    hsv[:, 40:120, 1:] -= rng.integers(0, 20, (120, 80, 2), dtype=np.uint8)
+    return cv2.cvtColor(hsv, cv2.COLOR_HSV2BGR)
+
+
+def test_background_refit_swaps_limits_without_blocking():
+    optimizer = ColorOptimizer(background=True)
+    before = optimizer.get_limits()
+    for seed in range(3):
+        optimizer.update(_track_image(30, seed))
+    optimizer.wait(timeout=30)
+
+    assert not optimizer.busy()
+    assert optimizer.version >= 1
+    lower, upper = optimizer.get_limits()
+    assert optimizer.get_limits() is not before
+    assert lower[0] <= 30 <= upper[0]
+    assert 0 < optimizer.confidence <= 1
+    assert "confiança" in optimizer.status_text()
+
+
+def test_limits_open_up_on_a_darker_image_and_survive_a_failed_refit(monkeypatch):
+    image = cv2.imread(SAMPLE_IMAGE)
+    dark = (image * 0.7).astype(np.uint8)
+    # Os limites iniciais não aceitam nenhum pixel da imagem escura
+    optimizer = ColorOptimizer(limits=(np.array([20, 200, 200]), np.array([40, 255, 255])))
+    optimizer.update(dark)
+    lower, _ = optimizer.get_limits()
+    assert optimizer.version == 1
+    assert lower[2] < 200
+    assert detect_yellow_track(dark, *optimizer.get_limits()) is not None
+
+    # Limites aprendidos não dependem de onde se partiu
+    loose = ColorOptimizer(limits=(np.array([20, 100, 100]), np.array([40, 255, 255])))
+    loose.update(dark)
+    assert np.allclose(loose.get_limits()[0], lower, atol=3)
+
+    background = ColorOptimizer(background=True)
+    monkeypatch.setattr(background, '_limits_from_cluster', lambda track: 1 / 0)
+    background.update(image)
+    with pytest.raises(ZeroDivisionError):
+        background.wait(timeout=30)
+    assert not background.busy()
+    monkeypatch.undo()
+    background.update(image)
+    background.wait(timeout=30)
+    assert background.version == 1
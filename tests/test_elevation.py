@@ -0,0 +1,56 @@
+import cv2
+import numpy as np
+
+from src.elevation import HeightMap, load_height_map, track_elevation
+from src.kart_physics import estimate_lap_time, velocity_profile
+
+
+def _circle(radius=150.0, center=(200.0, 200.0), n=200):
+    t = np.linspace(0, 2 * np.pi, n, endpoint=False)
+    return np.column_stack((center[0] + radius * np.cos(t), center[1] + radius * np.sin(t)))
+
+
+def test_banking_speeds_up_corners_and_flat_map_changes_nothing(tmp_path):
+    line = _circle()
+    yy, xx = np.mgrid[0:400, 0:400]
+    # Cone: a pista sobe para fora da curva (inclinação favorável de 0.2 m/m, escala 1 m/px)
+    cone = 0.2 * np.hypot(xx - 200.0, yy - 200.0)
+    flat = np.full((400, 400), 3.0)
+    params = {'max_speed': 60.0, 'friction_coeff': 1.0, 'track_length': 2 * np.pi * 150}
+
+    base = estimate_lap_time(line, params)
+    assert np.isclose(estimate_lap_time(line, params, elevation=HeightMap(flat).profile(line, 1.0)), base)
+
+    profile = HeightMap(cone).profile(line, 1.0)
+    _, grade, bank = profile.along(line)
+    assert np.allclose(grade, 0.0, atol=1e-4)
+    assert np.all(np.abs(np.tan(bank) - 0.2) < 1e-3)
+    # v² / r = g (mu + tan(bank)) no círculo inteiro
+    v, _ = velocity_profile(line, 60.0, 1.0, 1.0, bank=bank)
+    assert np.allclose(v, np.sqrt(9.8 * 1.2 * 150), rtol=1e-3)
+    assert estimate_lap_time(line, params, elevation=profile) < base
+
+    # Mesmo mapa em disco: carregado uma vez, perfis em cache por linha central
+    path = str(tmp_path / 'cone.png')
+    cv2.imwrite(path, np.round(cone / 60.0 * 65535).astype(np.uint16))
+    height_map = load_height_map(path, (0.0, 60.0))
+    assert load_height_map(path, (0.0, 60.0)) is height_map
+    assert height_map.profile(line, 1.0) is height_map.profile(line.copy(), 1.0)
+    params = dict(params, kart_class='rental', height_map=path, height_range=(0.0, 60.0))
+    profile = track_elevation(params, line)
+    assert track_elevation(params, line.copy()) is profile
+    assert estimate_lap_time(line, params, elevation=profile) < estimate_lap_time(line, params)
+
+
+def test_climbing_costs_more_than_descending_saves():
+    # Reta longa de ida e volta numa rampa: subir custa mais do que descer devolve
+    t = np.linspace(0, 1, 100, endpoint=False)
+    line = np.concatenate((np.column_stack((50 + 300 * t, np.full(100, 50.0))),
+                           np.column_stack((350 - 300 * t, np.full(100, 60.0)))))
+    _, xx = np.mgrid[0:100, 0:400]
+    ramp = HeightMap(0.05 * xx)
+    params = {'max_speed': 15.0, 'friction_coeff': 1.2, 'track_length': 620, 'kart_class': 'rental'}
+    _, grade, _ = ramp.profile(line, 1.0).along(line)
+    assert np.isclose(np.tan(grade[10]), 0.05, atol=1e-3)
+    assert np.isclose(np.tan(grade[110]), -0.05, atol=1e-3)
+    assert estimate_lap_time(line, params, elevation=ramp.profile(line, 1.0)) > estimate_lap_time(line, params)
@@ -0,0 +1,167 @@
+"""Saídas de referência das cinco implementações de racing line.
+
+Os arquivos em tests/golden guardam, para cada pista, o contorno detectado e
+a racing line e o tempo de volta de cada variante, além do tempo de execução
+de cada uma. Para regravar depois de uma mudança intencional:
+
+    UPDATE_GOLDEN=1 python -m pytest tests/test_golden.py
+
+Os tempos de execução dependem da máquina, então a comparação com
+timings.json só roda quando pedida:
+
+    RUN_BENCHMARKS=1 python -m pytest tests/test_golden.py
+"""
+import json
+import os
+import time
+
+import cv2
+import numpy as np
+import pytest
+
+import generate_racing_line as script_generator
+from src.image_processor import detect_yellow_track
+from src.kart_physics import RacingLineCalculator, estimate_lap_time
+from src.pipeline import DEFAULT_KART_PARAMS
+from src.racing_line_processor import generate_racing_line as processor_racing_line
+from src.track_geometry import calculate_centerline, generate_racing_line as geometry_racing_line
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SAMPLE_IMAGE = os.path.join(BASE_DIR, 'input_images', 'tracado-jeep-sim.jpg')
+GOLDEN_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'golden')
+TIMINGS_FILE = os.path.join(GOLDEN_DIR, 'timings.json')
+UPDATE = os.environ.get('UPDATE_GOLDEN') == '1'
+BENCHMARK = os.environ.get('RUN_BENCHMARKS') == '1'
+
+# Tolerâncias: reescritas vetorizadas mudam a ordem das operações em ponto flutuante
+LINE_ATOL = 1e-6     # pixels
+LAP_RTOL = 1e-6
+# Uma variante falha no teste de tempo se ficar TIMING_SLACK vezes mais lenta que a referência
+TIMING_SLACK = 10.0
+TIMING_FLOOR = 0.05  # s
+
+
+def _draw_track(points, size=(600, 800), thickness=24):
+    image = np.zeros(size + (3,), np.uint8)
+    cv2.polylines(image, [np.round(points).astype(np.int32)], True, (0, 255, 255), thickness)
+    return image
+
+
+def _oval():
+    t = np.linspace(0, 2 * np.pi, 400, endpoint=False)
+    return _draw_track(np.column_stack((400 + 320 * np.cos(t), 300 + 200 * np.sin(t))))
+
+
+def _kidney():
+    t = np.linspace(0, 2 * np.pi, 400, endpoint=False)
+    r = 220 + 60 * np.cos(2 * t) + 25 * np.sin(3 * t)
+    return _draw_track(np.column_stack((400 + 1.3 * r * np.cos(t), 300 + r * np.sin(t))))
+
+
+def _hairpins():
+    # Retângulo com um grampo entrando pelo lado de baixo
+    points = np.array([(80, 80), (720, 80), (720, 520), (480, 520), (480, 260), (360, 260),
+                       (360, 520), (80, 520)], np.float64)
+    return _draw_track(points, thickness=30)
+
+
+def _sample():
+    return cv2.imread(SAMPLE_IMAGE)
+
+
+# Pista -> (imagem, comprimento em metros); as sintéticas são curtas para que
+# as curvas limitem a velocidade e o tempo de volta dependa da linha
+TRACKS = {'oval': (_oval, 150), 'kidney': (_kidney, 200), 'hairpins': (_hairpins, 250),
+          'jeep_sim': (_sample, 943)}
+
+def _kart_racing_app(contour):
+    # Importar o app cria pastas no diretório atual e o pool do ColorOptimizer:
+    # só quando a variante roda, e não ao coletar os testes
+    import kart_racing_app
+    return kart_racing_app.calculate_racing_line(contour, cv2.arcLength(contour, True))
+
+
+VARIANTS = {
+    'kart_physics': lambda c: RacingLineCalculator().calculate_optimal_path(c[:, 0].astype(np.float64)),
+    'racing_line_processor': lambda c: processor_racing_line(c),
+    'track_geometry': lambda c: geometry_racing_line(calculate_centerline(c, 100),
+                                                     DEFAULT_KART_PARAMS['max_speed'],
+                                                     DEFAULT_KART_PARAMS['friction_coeff']),
+    'generate_racing_line': lambda c: script_generator.RacingLineGenerator().generate_racing_line(c),
+    'kart_racing_app': _kart_racing_app,
+}
+
+
+def _golden_path(track):
+    return os.path.join(GOLDEN_DIR, f"{track}.npz")
+
+
+@pytest.fixture
+def app_folder(tmp_path, monkeypatch):
+    """Pastas criadas pelo import do kart_racing_app ficam no diretório temporário."""
+    monkeypatch.chdir(tmp_path)
+
+
+@pytest.fixture(scope='module')
+def contours():
+    return {name: detect_yellow_track(make()) for name, (make, _) in TRACKS.items()}
+
+
+def _outputs(contour, track_length):
+    kart_params = dict(DEFAULT_KART_PARAMS, track_length=track_length)
+    outputs = {}
+    for variant, run in VARIANTS.items():
+        line = np.asarray(run(contour), dtype=np.float64).reshape(-1, 2)
+        outputs[f"{variant}_line"] = line
+        outputs[f"{variant}_lap"] = np.array(estimate_lap_time(line, kart_params))
+    return outputs
+
+
+@pytest.mark.parametrize('track', list(TRACKS))
+def test_matches_golden(track, contours, app_folder):
+    contour = contours[track]
+    assert contour is not None
+    outputs = _outputs(contour, TRACKS[track][1])
+
+    if UPDATE:
+        os.makedirs(GOLDEN_DIR, exist_ok=True)
+        np.savez(_golden_path(track), contour=contour, **outputs)
+
+    with np.load(_golden_path(track)) as golden:
+        assert np.array_equal(contour, golden['contour'])
+        for variant in VARIANTS:
+            line = outputs[f"{variant}_line"]
+            assert line.shape == golden[f"{variant}_line"].shape, variant
+            np.testing.assert_allclose(line, golden[f"{variant}_line"], rtol=0, atol=LINE_ATOL,
+                                       err_msg=variant)
+            np.testing.assert_allclose(outputs[f"{variant}_lap"], golden[f"{variant}_lap"],
+                                       rtol=LAP_RTOL, err_msg=variant)
+
+
+def _best_time(run, contour, repeat=3):
+    best = np.inf
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run(contour)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+@pytest.mark.skipif(not (BENCHMARK or UPDATE), reason='defina RUN_BENCHMARKS=1 para medir os tempos')
+@pytest.mark.parametrize('variant', list(VARIANTS))
+def test_variant_timing(variant, contours, app_folder):
+    """Mede cada variante na imagem de exemplo; acusa regressões grandes de desempenho."""
+    elapsed = _best_time(VARIANTS[variant], contours['jeep_sim'])
+
+    timings = {}
+    if os.path.exists(TIMINGS_FILE):
+        with open(TIMINGS_FILE) as f:
+            timings = json.load(f)
+    if UPDATE:
+        timings[variant] = elapsed
+        with open(TIMINGS_FILE, 'w') as f:
+            json.dump(timings, f, indent=2, sort_keys=True)
+
+    print(f"{variant}: {elapsed * 1e3:.2f} ms (referência {timings.get(variant, float('nan')) * 1e3:.2f} ms)")
+    assert variant in timings
+    assert elapsed <= max(TIMING_SLACK * timings[variant], TIMING_FLOOR)
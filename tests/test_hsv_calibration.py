@@ -0,0 +1,53 @@
+import os
+
+import cv2
+import numpy as np
+import pytest
+
+from src.hsv_calibration import HSVCalibrator
+from src.image_processor import detect_yellow_track
+
+SAMPLE_IMAGE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                            'input_images', 'tracado-jeep-sim.jpg')
+
+
+@pytest.mark.parametrize('gain', [0.5, 0.7, 1.3])
+def test_calibration_recovers_the_track_under_other_exposures(gain):
+    image = cv2.imread(SAMPLE_IMAGE)
+    reference = cv2.contourArea(detect_yellow_track(image, *HSVCalibrator().calibrate(image)))
+    exposed = np.clip(image * gain, 0, 255).astype(np.uint8)
+
+    lower, upper = HSVCalibrator().calibrate(exposed)
+    contour = detect_yellow_track(exposed, lower, upper)
+    assert contour is not None
+    assert abs(cv2.contourArea(contour) / reference - 1) < 0.05
+    # Os limites fixos antigos perdem o traçado quando a imagem escurece
+    if gain < 1:
+        assert lower[2] < 200
+
+
+def test_calibration_is_cached_per_camera(tmp_path):
+    image = cv2.imread(SAMPLE_IMAGE)
+    path = str(tmp_path / 'hsv.json')
+    lower, upper = HSVCalibrator(path).calibrate(image, 'cam1')
+    # Outra instância lê o cache e não recalibra, mesmo com outra imagem
+    cached = HSVCalibrator(path).calibrate(np.zeros_like(image), 'cam1')
+    assert np.array_equal(cached[0], lower) and np.array_equal(cached[1], upper)
+
+
+def test_contour_quality_prefers_a_clean_closed_loop():
+    quality = HSVCalibrator.contour_quality
+    ring = np.zeros((300, 400), np.uint8)
+    cv2.ellipse(ring, (200, 150), (150, 100), 0, 0, 360, 255, 15)
+    disk = np.zeros_like(ring)
+    cv2.ellipse(disk, (200, 150), (150, 100), 0, 0, 360, 255, -1)
+    noisy = ring.copy()
+    noisy[np.random.default_rng(0).random(ring.shape) < 0.05] = 255
+    tiny = np.zeros_like(ring)
+    cv2.circle(tiny, (50, 50), 5, 255, -1)
+
+    assert quality(np.zeros_like(ring)) == 0.0
+    assert quality(tiny) == 0.0
+    assert quality(ring) > 0.8
+    assert quality(disk) < quality(ring)
+    assert quality(noisy) < quality(ring)
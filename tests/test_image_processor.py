@@ -0,0 +1,80 @@
+import os
+import cv2
+import numpy as np
+import pytest
+
+from src.image_processor import clean_mask, detect_yellow_track, detect_yellow_tracks
+from src.contour_refinement import resample_uniform
+from src.kart_physics import curvature_profile, estimate_lap_time
+from src.pipeline import run_pipeline
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SAMPLE_IMAGE = os.path.join(BASE_DIR, 'input_images', 'tracado-jeep-sim.jpg')
+
+
+def _random_mask(rng):
+    h, w = rng.integers(60, 300, 2)
+    mask = np.zeros((h, w), np.uint8)
+    for _ in range(rng.integers(1, 15)):
+        center = (int(rng.integers(-20, w + 20)), int(rng.integers(-20, h + 20)))
+        radius = int(rng.integers(2, 60))
+        if rng.random() < 0.5:
+            cv2.circle(mask, center, radius, 255, int(rng.integers(1, 8)))
+        else:
+            axes = (radius, int(rng.integers(2, 40)))
+            cv2.ellipse(mask, center, axes, float(rng.integers(0, 180)), 0, 360, 255, -1)
+    mask[rng.random((h, w)) < 0.01] = 255
+    return mask
+
+
+@pytest.mark.parametrize('morph_size', [3, 7, 8, 15, 31])
+def test_separable_kernel_matches_square_kernel(morph_size):
+    mask = _random_mask(np.random.default_rng(morph_size))
+    assert np.array_equal(clean_mask(mask, morph_size, separable=False),
+                          clean_mask(mask, morph_size, separable=True))
+
+
+def test_empty_mask_returns_none():
+    image = np.zeros((50, 50, 3), np.uint8)
+    assert detect_yellow_track(image) is None
+
+
+def test_refined_contour_is_unbiased_and_smoother():
+    radius, center = 150.3, 180.37
+    yy, xx = np.mgrid[:360, :360]
+    image = np.zeros((360, 360, 3), np.uint8)
+    image[np.hypot(xx - center, yy - center) < radius] = (0, 255, 255)
+
+    refined = detect_yellow_track(image, refine=True)[:, 0]
+    error = np.hypot(refined[:, 0] - center, refined[:, 1] - center) - radius
+    assert abs(error.mean()) < 0.05
+    assert error.std() < 0.15
+
+    approx = detect_yellow_track(image)
+    noise = [curvature_profile(resample_uniform(c, 5.0).points).std() for c in (refined, approx)]
+    assert noise[0] < 0.5 * noise[1]
+
+
+def test_detect_yellow_tracks_keeps_nested_layouts_and_pit_lane():
+    image = np.zeros((600, 800, 3), np.uint8)
+    cv2.ellipse(image, (400, 300), (350, 250), 0, 0, 360, (0, 255, 255), 25)
+    cv2.ellipse(image, (400, 300), (150, 100), 0, 0, 360, (0, 255, 255), 20)
+    cv2.line(image, (100, 585), (700, 585), (0, 255, 255), 12)
+    cv2.circle(image, (780, 20), 3, (0, 255, 255), -1)
+
+    tracks = detect_yellow_tracks(image)
+    assert len(tracks) == 3
+    assert np.array_equal(tracks[0], detect_yellow_track(image))
+    boxes = [cv2.boundingRect(c) for c in tracks]
+    assert boxes[1][1] > 150 and boxes[2][1] > 550
+
+
+def test_refined_lap_time_is_stable_across_spacings():
+    image = cv2.imread(SAMPLE_IMAGE)
+    contour = detect_yellow_track(image, refine=True)
+    # Linha central direto do contorno refinado; com 5 m ou mais as cordas já cortam os grampos
+    params = {'max_speed': 55 / 3.6, 'friction_coeff': 1.5, 'track_length': 943}
+    center = [estimate_lap_time(resample_uniform(contour, s, 943).points, params) for s in (5, 2, 1, 0.5)]
+    assert max(center) / min(center) < 1.03
+    laps = [run_pipeline(image=image, refine=True, spacing=s)['lap_time'] for s in (2, 1, 0.5)]
+    assert max(laps) / min(laps) < 1.03
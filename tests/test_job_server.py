@@ -0,0 +1,170 @@
+import asyncio
+import base64
+import io
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from src import job_server
+from src.job_server import HTTPError, JobServer
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SAMPLE_IMAGE = os.path.join(BASE_DIR, 'input_images', 'tracado-jeep-sim.jpg')
+
+
+def _circle_contour(radius=200, n=120):
+    t = np.linspace(0, 2 * np.pi, n, endpoint=False)
+    return np.stack([300 + radius * np.cos(t), 300 + radius * np.sin(t)], axis=1).astype(int).tolist()
+
+
+async def _request(port, method, path, body=b"", headers=None):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    lines = [f"{method} {path} HTTP/1.1", "Host: localhost", f"Content-Length: {len(body)}"]
+    lines += [f"{k}: {v}" for k, v in (headers or {}).items()]
+    writer.write(("\r\n".join(lines) + "\r\n\r\n").encode() + body)
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    head, _, payload = response.partition(b"\r\n\r\n")
+    return int(head.split()[1]), payload
+
+
+def _run(coro_factory, **server_kwargs):
+    async def runner():
+        server = JobServer(**server_kwargs)
+        await server.start(port=0)
+        try:
+            return await coro_factory(server)
+        finally:
+            await server.close()
+    return asyncio.run(runner())
+
+
+def test_contour_request_returns_json():
+    async def scenario(server):
+        body = json.dumps({'contour': _circle_contour(), 'kart_params': {'track_length': 500}}).encode()
+        return await _request(server.port, 'POST', '/racing-line', body,
+                              {'Content-Type': 'application/json'})
+    status, payload = _run(scenario)
+    result = json.loads(payload)
+    assert status == 200
+    assert len(result['racing_line']) == 100
+    assert result['lap_time'] > 0
+
+
+def test_image_request_returns_npz():
+    with open(SAMPLE_IMAGE, 'rb') as f:
+        data = f.read()
+
+    async def scenario(server):
+        return await _request(server.port, 'POST', '/racing-line?format=npz&track_length=943', data,
+                              {'Content-Type': 'image/jpeg'})
+    status, payload = _run(scenario)
+    assert status == 200
+    arrays = np.load(io.BytesIO(payload))
+    assert arrays['contour'].shape[1:] == (1, 2)
+    assert float(arrays['lap_time']) > 0
+
+
+def test_identical_requests_are_deduplicated():
+    with open(SAMPLE_IMAGE, 'rb') as f:
+        body = json.dumps({'image': base64.b64encode(f.read()).decode()}).encode()
+
+    async def scenario(server):
+        results = await asyncio.gather(*[
+            _request(server.port, 'POST', '/racing-line', body, {'Content-Type': 'application/json'})
+            for _ in range(3)])
+        return results, server.metrics()
+    results, metrics = _run(scenario)
+    assert all(status == 200 for status, _ in results)
+    assert len({payload for _, payload in results}) == 1
+    assert metrics['counters']['dedup_hits'] >= 1
+
+
+def test_backpressure_rejects_when_full():
+    async def scenario(server):
+        jobs = [server.submit('contour', np.array(_circle_contour(radius=r)).reshape(-1, 1, 2))
+                for r in (100, 150)]
+        return await asyncio.gather(*jobs, return_exceptions=True)
+    results = _run(scenario, max_workers=1, max_queue=0)
+    assert isinstance(results[1], HTTPError) and results[1].status == 503
+    assert results[0]['lap_time'] > 0
+
+
+def test_timeout_and_metrics_endpoint():
+    with open(SAMPLE_IMAGE, 'rb') as f:
+        data = f.read()
+
+    async def scenario(server):
+        timed_out = await _request(server.port, 'POST', '/racing-line', data, {'Content-Type': 'image/jpeg'})
+        metrics = await _request(server.port, 'GET', '/metrics')
+        return timed_out, metrics
+    (status, _), (metrics_status, payload) = _run(scenario, timeout=1e-4)
+    metrics = json.loads(payload)
+    assert status == 504
+    assert metrics_status == 200
+    assert metrics['counters']['timeouts'] == 1
+    assert 'queue_depth' in metrics
+
+
+def test_invalid_image_is_bad_request():
+    async def scenario(server):
+        return await _request(server.port, 'POST', '/racing-line', b"not an image",
+                              {'Content-Type': 'image/jpeg'})
+    status, _ = _run(scenario)
+    assert status == 400
+
+
+def test_timed_out_running_job_still_counts_for_backpressure(monkeypatch):
+    release = threading.Event()
+
+    def slow_job(kind, data, kart_params=None):
+        release.wait(10)
+        return {'contour': None, 'racing_line': None, 'lap_time': None, 'stages': {}}
+    monkeypatch.setattr(job_server, 'process_job', slow_job)
+
+    async def scenario(server):
+        first = await asyncio.gather(server.submit('contour', np.zeros((3, 1, 2), int)),
+                                     return_exceptions=True)
+        # O worker continua ocupado: a fila ainda está cheia
+        second = await asyncio.gather(server.submit('contour', np.ones((3, 1, 2), int)),
+                                      return_exceptions=True)
+        in_flight = server.metrics()['in_flight']
+        release.set()
+        for _ in range(100):
+            if not server.metrics()['in_flight']:
+                break
+            await asyncio.sleep(0.01)
+        third = await server.submit('contour', np.ones((3, 1, 2), int))
+        return first[0], second[0], in_flight, third
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        first, second, in_flight, third = _run(scenario, max_workers=1, max_queue=0, timeout=0.05,
+                                               executor=executor)
+    assert first.status == 504
+    assert second.status == 503
+    assert in_flight == 1
+    assert third['stages'] == {}
+
+
+def test_kart_params_are_restricted_to_the_allow_list():
+    async def scenario(server):
+        statuses = []
+        for kart_params in ({'height_map': '/etc/passwd'}, {'kart_class': 'kz', 'mass': 1e9},
+                            {'track_length': 'longa'}, {'max_speed': -1}, ['track_length']):
+            body = json.dumps({'contour': _circle_contour(), 'kart_params': kart_params}).encode()
+            status, _ = await _request(server.port, 'POST', '/racing-line', body,
+                                       {'Content-Type': 'application/json'})
+            statuses.append(status)
+        status, _ = await _request(server.port, 'POST', '/racing-line?track_length=abc', b"x",
+                                   {'Content-Type': 'image/jpeg'})
+        statuses.append(status)
+        return statuses, server.metrics()['counters']
+    statuses, counters = _run(scenario)
+    assert statuses == [400] * 6
+    assert 'completed' not in counters
+    assert JobServer._kart_params({'track_length': '500', 'max_speed': 12}) == {'track_length': 500.0,
+                                                                             'max_speed': 12.0}
@@ -0,0 +1,68 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+import pytest
+
+from src import lattice_optimizer
+from src.image_processor import detect_yellow_track
+from src.elevation import track_elevation
+from src.kart_physics import estimate_lap_time, segment_times, velocity_profile
+from src.lattice_optimizer import optimize_racing_line
+from src.pipeline import KART_PARAMS
+from src.track_geometry import calculate_centerline
+from src.vehicle_model import vehicle_envelope
+
+SAMPLE_IMAGE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                            'input_images', 'tracado-jeep-sim.jpg')
+
+
+@pytest.fixture(scope='module')
+def image():
+    return cv2.imread(SAMPLE_IMAGE)
+
+
+@pytest.fixture(scope='module')
+def centerline(image):
+    return calculate_centerline(detect_yellow_track(image))
+
+
+# Na pista de exemplo: ~77 s na grade completa contra ~83 s pela linha central
+@pytest.mark.parametrize('options, factor', [({}, 0.95), ({'workers': 2}, 0.95), ({'refine': True}, 0.99)])
+def test_optimized_line_beats_centerline(centerline, options, factor):
+    line, lap_time = optimize_racing_line(centerline, KART_PARAMS, **options)
+    assert line.shape == centerline.shape
+    # A escala (track_length) vem da linha central nos dois casos
+    assert lap_time < factor * estimate_lap_time(centerline, KART_PARAMS)
+
+
+@pytest.mark.parametrize('refine', [False, True])
+def test_parallel_segments_match_serial(centerline, refine, monkeypatch):
+    parallel = optimize_racing_line(centerline, KART_PARAMS, refine=refine, workers=3)
+    # Mesmos trechos resolvidos um a um no processo principal
+    monkeypatch.setattr(lattice_optimizer, 'ProcessPoolExecutor', lambda max_workers: ThreadPoolExecutor(1))
+    serial = optimize_racing_line(centerline, KART_PARAMS, refine=refine, workers=3)
+    np.testing.assert_array_equal(parallel[0], serial[0])
+    assert parallel[1] == serial[1]
+
+
+def test_height_map_changes_optimized_time(centerline, image, tmp_path):
+    # Rampa ao longo de x: a pista sobe e desce em cada volta
+    _, xx = np.mgrid[0:image.shape[0], 0:image.shape[1]]
+    path = str(tmp_path / 'ramp.npy')
+    np.save(path, 0.1 * xx.astype(np.float64))
+    hilly = dict(KART_PARAMS, height_map=path, image_shape=list(image.shape[:2]))
+
+    line, lap_time = optimize_racing_line(centerline, hilly)
+    _, flat_time = optimize_racing_line(centerline, KART_PARAMS)
+    assert lap_time > flat_time
+
+    # O tempo informado é o da própria linha com rampas e inclinações
+    elevation = track_elevation(hilly, centerline)
+    points = line.reshape(-1, 2)
+    scale = elevation.scale
+    _, grade, bank = elevation.along(points, scale)
+    v, ds = velocity_profile(points, hilly['max_speed'], hilly['friction_coeff'], scale,
+                             envelope=vehicle_envelope(hilly), grade=grade, bank=bank)
+    assert lap_time == pytest.approx(segment_times(v, ds).sum())
@@ -0,0 +1,45 @@
+import numpy as np
+
+from src.elevation import HeightMap
+from src.kart_physics import estimate_lap_time
+from src.racing_line_processor import displacement_field
+from src.sensitivity import PARAMETERS, sensitivity_analysis
+
+
+def _kidney(n=240):
+    t = np.linspace(0, 2 * np.pi, n, endpoint=False)
+    r = 150 + 40 * np.cos(2 * t) + 15 * np.sin(3 * t)
+    return np.column_stack((300 + r * np.cos(t), 250 + 0.8 * r * np.sin(t))).reshape(-1, 1, 2)
+
+
+def test_batched_derivatives_match_separate_reruns(tmp_path):
+    contour = _kidney()
+    ramp = np.tile(np.linspace(0.0, 8.0, 600), (500, 1)) + np.linspace(0.0, 3.0, 500)[:, None]
+    path = str(tmp_path / 'ramp.npy')
+    np.save(path, ramp)
+    params = {'max_speed': 80 / 3.6, 'friction_coeff': 1.5, 'track_length': 250,
+              'kart_class': 'rental', 'mass': 170, 'height_map': path}
+    displacement = 0.3
+    step = 1e-3
+    result = sensitivity_analysis(contour, params, displacement, relative_step=step)
+
+    points, field = displacement_field(contour)
+    perimeter = np.linalg.norm(np.roll(points, -1, axis=0) - points, axis=1).sum()
+    elevation = HeightMap(ramp).profile(points, params['track_length'] / perimeter)
+
+    def lap(friction, max_speed, factor):
+        variant = dict(params, friction_coeff=friction, max_speed=max_speed)
+        return estimate_lap_time(points + factor * field, variant, elevation=elevation)
+
+    base = np.array([params['friction_coeff'], params['max_speed'], displacement])
+    assert np.isclose(result['lap_time'], lap(*base), rtol=1e-9)
+    for k, name in enumerate(PARAMETERS):
+        h = step * base[k]
+        plus, minus = base.copy(), base.copy()
+        plus[k] += h
+        minus[k] -= h
+        assert np.isclose(result['d_lap'][k], (lap(*plus) - lap(*minus)) / (2 * h), rtol=1e-6, atol=1e-9), name
+
+    # O modelo de kart muda o resultado (antes era ignorado em silêncio)
+    flat = dict(params, kart_class=None, height_map=None)
+    assert not np.isclose(sensitivity_analysis(contour, flat, displacement)['lap_time'], result['lap_time'])
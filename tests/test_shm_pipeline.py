@@ -0,0 +1,76 @@
+import multiprocessing
+
+import cv2
+import numpy as np
+import pytest
+
+from src.pipeline import run_pipeline
+from src.shm_pipeline import DEFAULT_LOWER, DEFAULT_UPPER, ShmPipeline
+
+
+def test_shared_memory_pipeline_matches_run_pipeline(tmp_path):
+    paths = []
+    # O último traçado não cabe no slot de 600x600 e segue fora da memória compartilhada
+    for i, (size, axes) in enumerate([((400, 600), (240, 150)), ((400, 600), (200, 120)),
+                                      ((400, 600), (260, 100)), ((800, 700), (300, 200))]):
+        image = np.zeros(size + (3,), np.uint8)
+        cv2.ellipse(image, (300, 200), axes, 0, 0, 360, (0, 255, 255), 20)
+        paths.append(str(tmp_path / f"track{i}.png"))
+        cv2.imwrite(paths[-1], image)
+    paths.append(str(tmp_path / 'empty.png'))
+    cv2.imwrite(paths[-1], np.zeros((300, 300, 3), np.uint8))
+    paths.append(str(tmp_path / 'missing.png'))
+
+    masks = {}
+
+    def on_result(result, frame, mask):
+        if frame is not None:
+            expected = cv2.inRange(cv2.cvtColor(frame, cv2.COLOR_BGR2HSV), np.array(DEFAULT_LOWER),
+                                   np.array(DEFAULT_UPPER))
+            masks[result['input']] = np.array_equal(mask, expected)
+
+    pipeline = ShmPipeline(readers=2, detect_workers=2, physics_workers=2, slots=3, max_side=600,
+                           hold_frames=True)
+    results = pipeline.run(paths, on_result=on_result)
+
+    assert [r['input'] for r in results] == paths
+    for path, result in zip(paths[:4], results):
+        expected = run_pipeline(image=cv2.imread(path))
+        assert result['error'] is None
+        assert np.array_equal(result['contour'], expected['contour'])
+        np.testing.assert_allclose(result['racing_line'], expected['racing_line'])
+        assert result['lap_time'] == expected['lap_time']
+        assert masks[path]
+    assert results[4]['error'] is None and results[4]['contour'] is None
+    assert results[5]['error'] is not None
+
+
+def test_results_do_not_depend_on_frame_order_and_dead_worker_raises(tmp_path):
+    paths = []
+    for i in range(4):
+        image = np.zeros((200, 300, 3), np.uint8)
+        cv2.ellipse(image, (150, 100), (110, 70 - 10 * i), 0, 0, 360, (0, 255, 255), 12)
+        paths.append(str(tmp_path / f"track{i}.png"))
+        cv2.imwrite(paths[-1], image)
+    image = np.zeros((300, 400, 3), np.uint8)
+    cv2.ellipse(image, (200, 150), (170, 110), 0, 0, 360, (0, 255, 255), 12)
+    paths.append(str(tmp_path / 'bigger.png'))
+    cv2.imwrite(paths[-1], image)
+
+    # Slots do tamanho do primeiro quadro: o maior, no fim ou no começo, dá o mesmo resultado
+    pipeline = ShmPipeline(readers=1, detect_workers=1, physics_workers=1)
+    forward = pipeline.run(paths)
+    backward = pipeline.run(paths[::-1])[::-1]
+    for path, a, b in zip(paths, forward, backward):
+        expected = run_pipeline(image=cv2.imread(path))
+        assert a['error'] is None and b['error'] is None
+        assert a['lap_time'] == b['lap_time'] == expected['lap_time']
+
+    # Um slot retido até a entrega: depois do primeiro resultado nada mais chega
+    def kill_workers(result, frame, mask):
+        for process in multiprocessing.active_children():
+            process.kill()
+
+    pipeline = ShmPipeline(readers=1, detect_workers=1, physics_workers=1, slots=1, hold_frames=True)
+    with pytest.raises(RuntimeError, match="Worker"):
+        pipeline.run(paths[:4], on_result=kill_workers)
@@ -0,0 +1,73 @@
+import numpy as np
+import pytest
+
+from src.telemetry import LapAnalyzer, analyze_log
+
+TRACK_LENGTH = 300.0
+SPEED = 10.0  # m/s constantes ao longo da linha
+
+
+def _line():
+    # Retângulo arredondado com a largada no meio de uma curva
+    t = np.linspace(0, 2 * np.pi, 200, endpoint=False) + np.pi / 4
+    c, s = np.cos(t), np.sin(t)
+    return np.column_stack((400 + 100 * np.sign(c) * np.sqrt(np.abs(c)),
+                            300 + 80 * np.sign(s) * np.sqrt(np.abs(s))))
+
+
+def _drive(line, start, distance, dt=0.01):
+    """Amostras (t, x, y) em metros percorrendo a própria linha a SPEED, a partir da estação start."""
+    points = line * (TRACK_LENGTH / np.hypot(*(np.roll(line, -1, axis=0) - line).T).sum())
+    closed = np.vstack((points, points[:1]))
+    station = np.concatenate(([0.0], np.cumsum(np.hypot(*np.diff(closed, axis=0).T))))
+    t = np.arange(0.0, distance / SPEED, dt)
+    s = (start + SPEED * t) % TRACK_LENGTH
+    return t, np.interp(s, station, closed[:, 0]), np.interp(s, station, closed[:, 1])
+
+
+def _check(report, analyzer, corners):
+    # Largada em 0.9 volta: a primeira passagem pela chegada abre a volta 1
+    assert [lap['lap'] for lap in report] == [1, 2, 3]
+    for lap in report:
+        assert lap['lap_time'] == pytest.approx(TRACK_LENGTH / SPEED, rel=1e-6)
+        assert lap['delta_time'] == pytest.approx(TRACK_LENGTH / SPEED - analyzer.ref_lap_time, rel=1e-6)
+        for corner, (entry, exit_) in zip(lap['corners'], corners):
+            arc = analyzer.ref_station[exit_] - analyzer.ref_station[entry]
+            ref = analyzer.ref_time[exit_] - analyzer.ref_time[entry]
+            if exit_ < entry:  # curva que atravessa a linha de chegada
+                arc += TRACK_LENGTH
+                ref += analyzer.ref_lap_time
+            assert corner['time'] == pytest.approx(arc / SPEED, rel=1e-6)
+            assert corner['delta_time'] == pytest.approx(arc / SPEED - ref, rel=1e-6)
+            assert corner['max_lateral'] < 1e-6
+
+
+def test_laps_and_corner_deltas_from_chunks():
+    line = _line()
+    corners = [(20, 60), (110, 140), (185, 15)]
+    params = {'track_length': TRACK_LENGTH, 'max_speed': 15.0}
+    analyzer = LapAnalyzer(line, params, corners=corners)
+    t, x, y = _drive(line, 0.9 * TRACK_LENGTH, 3.3 * TRACK_LENGTH)
+    for start in range(0, len(t), 977):
+        analyzer.feed(t[start:start + 977], x[start:start + 977], y[start:start + 977])
+    _check(analyzer.results(), analyzer, corners)
+
+
+def test_csv_log_matches_in_memory(tmp_path):
+    line = _line()
+    params = {'track_length': TRACK_LENGTH, 'max_speed': 15.0}
+    t, x, y = _drive(line, 0.9 * TRACK_LENGTH, 3.3 * TRACK_LENGTH)
+    path = tmp_path / 'log.csv'
+    np.savetxt(path, np.column_stack((x, t, y)), delimiter=',', header='x,t,y', comments='', fmt='%.9f')
+
+    analyzer = LapAnalyzer(line, params)
+    analyzer.feed(t, x, y)
+    expected = analyzer.results()
+    report = analyze_log(str(path), line, params, chunk_size=1000)
+
+    assert len(report) == len(expected) == 3
+    assert (analyzer.corners[:, 1] < analyzer.corners[:, 0]).any()
+    for lap, ref in zip(report, expected):
+        assert lap['lap_time'] == pytest.approx(ref['lap_time'], abs=1e-6)
+        for corner, ref_corner in zip(lap['corners'], ref['corners']):
+            assert corner['time'] == pytest.approx(ref_corner['time'], abs=1e-6)
@@ -0,0 +1,41 @@
+import numpy as np
+
+from src.track_data import Polyline, as_points
+
+
+def test_views_share_the_buffer():
+    line = Polyline.from_array(np.arange(12, dtype=np.float64).reshape(-1, 1, 2))
+    cv = line.as_cv()
+    assert cv.shape == (6, 1, 2)
+    assert np.shares_memory(cv, line.points) and np.shares_memory(line.x, line.points)
+
+    cv[2, 0] = (-1, -2)
+    assert tuple(line[2]) == (-1, -2) and line.y[2] == -2
+    assert np.shares_memory(as_points(line), line.points) and np.shares_memory(as_points(cv), cv)
+    # Lotes mantêm as dimensões de fora
+    assert as_points(np.zeros((3, 6, 1, 2))).shape == (3, 6, 2)
+
+
+def test_append_grows_capacity_and_keeps_points():
+    line = Polyline(capacity=2)
+    for i in range(40):
+        line.append((i, 2 * i))
+    assert len(line) == 40
+    assert np.array_equal(line.x, np.arange(40)) and np.array_equal(line.y, 2 * np.arange(40))
+
+    line.reserve(10)  # menor que o tamanho atual: não faz nada
+    assert len(line) == 40
+    line.reserve(100)
+    before = line.points
+    for i in range(60):
+        line.append((0, 0))
+    assert np.shares_memory(before, line.points)  # a reserva evitou realocação
+
+
+def test_segment_lengths_open_and_closed():
+    square = np.array([[0, 0], [3, 0], [3, 4], [0, 4]], np.float64)
+    closed = Polyline.from_array(square)
+    opened = Polyline.from_array(square, closed=False)
+    assert np.allclose(closed.segment_lengths(), [3, 4, 3, 4])
+    assert np.allclose(opened.segment_lengths(), [3, 4, 3])
+    assert closed.length() == 14.0 and opened.length() == 10.0
@@ -0,0 +1,35 @@
+import os
+
+import cv2
+import numpy as np
+
+from src.image_processor import detect_yellow_track
+from src.track_fingerprint import TrackLibrary, compute_fingerprint, fingerprint_distance
+
+SAMPLE_IMAGE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                            'input_images', 'tracado-jeep-sim.jpg')
+
+
+def test_known_track_is_registered_to_the_new_image(tmp_path):
+    folder = str(tmp_path / 'track_library')
+    library = TrackLibrary(folder)
+    assert not os.path.exists(folder)
+
+    image = cv2.imread(SAMPLE_IMAGE)
+    contour = detect_yellow_track(image)
+    racing_line = contour.astype(np.float64)
+    library.add('jeep', compute_fingerprint(image), contour, racing_line, 50.0, {}, image=image)
+
+    # Câmera deslocada 20 px para a direita e 7 px para cima
+    h, w = image.shape[:2]
+    shifted = cv2.warpAffine(image, np.float32([[1, 0, 20], [0, 1, -7]]), (w, h))
+    known = TrackLibrary(folder).match(compute_fingerprint(shifted), shifted)
+    assert known is not None
+    assert np.allclose(known['shift'], (20, -7), atol=1.5)
+    assert np.allclose(known['racing_line'], racing_line + known['shift'])
+    assert known['contour'].dtype == contour.dtype
+
+    # Meia resolução: a assinatura é quase a mesma, mas a geometria guardada não serve
+    half = cv2.resize(image, (w // 2, h // 2), interpolation=cv2.INTER_AREA)
+    assert fingerprint_distance(compute_fingerprint(half), library.entries[0]['fingerprint']) < 0.3
+    assert library.match(compute_fingerprint(half), half) is None
@@ -0,0 +1,71 @@
+import numpy as np
+
+from src.track_segments import TrackSegmentation, segment_track
+
+
+def _stadium(straight=60.0, radius=15.0, spacing=0.5, start=0.0):
+    """Duas retas e dois semicírculos em metros, percorridos a partir da estação start."""
+    turn = np.pi * radius
+    length = 2 * (straight + turn)
+    s = (np.arange(0.0, length, spacing) + start) % length
+    points = np.empty((len(s), 2))
+    for k in range(2):
+        offset = k * (straight + turn)
+        sign = 1 - 2 * k
+        on_straight = (s >= offset) & (s < offset + straight)
+        points[on_straight] = np.column_stack((sign * (s[on_straight] - offset - straight / 2),
+                                               np.full(on_straight.sum(), -sign * radius)))
+        on_turn = (s >= offset + straight) & (s < offset + straight + turn)
+        angle = (s[on_turn] - offset - straight) / radius - np.pi / 2
+        points[on_turn] = np.column_stack((sign * (straight / 2 + radius * np.cos(angle)),
+                                           sign * radius * np.sin(angle)))
+    return points, length
+
+
+def test_stadium_corners_wrap_the_finish_line():
+    straight, radius = 60.0, 15.0
+    turn = np.pi * radius
+    # Começa no meio da segunda curva: ela cruza a linha de chegada
+    points, length = _stadium(straight, radius, start=2 * straight + 1.5 * turn)
+    segments = segment_track(points)
+
+    assert len(segments) == 2
+    assert np.isclose(segments.length, length, rtol=1e-4)
+    assert np.allclose(segments.min_radius, radius, rtol=0.02)
+    assert np.all(segments.direction == segments.direction[0])
+    length = segments.length
+    corner_length = np.mod(segments.exit - segments.entry, length)
+    assert np.allclose(corner_length, turn, atol=6.0)
+
+    # A busca nos intervalos concorda com a definição de cada curva
+    s = np.linspace(0, 2 * length, 2001)
+    ids = segments.corner_at(s)
+    for k in range(len(segments)):
+        inside = np.mod(s - segments.entry[k], length) < corner_length[k]
+        assert np.array_equal(ids == k, inside)
+
+    restored = TrackSegmentation.from_arrays(segments.to_arrays())
+    assert np.array_equal(restored.corner_at(s), ids)
+    stations, positions = segments.braking_points(10.0)
+    assert np.allclose(np.mod(segments.entry - stations, length), 10.0)
+    assert positions.shape == (2, 2)
+
+
+def test_figure_eight_is_split_by_direction():
+    # Lemniscata de Gerono: as duas pontas viram em sentidos opostos
+    L = 30.0
+    t = np.linspace(0, 2 * np.pi, 600, endpoint=False)
+    points = np.column_stack((L * np.cos(t), L * np.sin(t) * np.cos(t)))
+    dx, dy, ddx, ddy = -L * np.sin(t), L * np.cos(2 * t), -L * np.cos(t), -2 * L * np.sin(2 * t)
+    radius = ((dx ** 2 + dy ** 2) ** 1.5 / np.abs(dx * ddy - dy * ddx)).min()
+
+    segments = segment_track(points)
+    assert len(segments) == 2
+    assert segments.direction[0] == -segments.direction[1]
+    assert np.allclose(segments.min_radius, radius, rtol=0.02)
+
+    # Sem limiar de saída a volta inteira é curva, dividida só pela troca de sentido
+    segments = segment_track(points, exit_curvature=0.0)
+    assert len(segments) == 2
+    assert np.allclose(segments.exit, np.roll(segments.entry, -1))
+    assert np.all(segments.corner_at(np.linspace(0, segments.length, 500)) >= 0)
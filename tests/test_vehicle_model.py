@@ -0,0 +1,77 @@
+import os
+
+import numpy as np
+import pytest
+
+from src import vehicle_model
+from src.vehicle_model import G, VehicleModel, vehicle_envelope
+
+
+def test_envelope_cache_hit_and_miss(tmp_path, monkeypatch):
+    monkeypatch.setattr(vehicle_model, '_ENVELOPES', {})
+    model = VehicleModel('rental')
+    envelope = model.envelope(cache_folder=tmp_path)
+    assert model.envelope(cache_folder=tmp_path) is envelope
+    assert os.listdir(tmp_path) == [f"rental_{model.key()[:16]}.npz"]
+
+    # Mesmos parâmetros em outro processo: lido do disco, sem recalcular
+    monkeypatch.setattr(vehicle_model, '_ENVELOPES', {})
+    monkeypatch.setattr(VehicleModel, 'build_envelope', lambda self: pytest.fail("recalculado"))
+    cached = VehicleModel('rental').envelope(cache_folder=tmp_path)
+    np.testing.assert_array_equal(cached.accel, envelope.accel)
+
+    # Outra massa muda o hash: novo arquivo
+    monkeypatch.undo()
+    monkeypatch.setattr(vehicle_model, '_ENVELOPES', {})
+    heavier = VehicleModel('rental', mass=200)
+    assert heavier.key() != model.key()
+    heavier.envelope(cache_folder=tmp_path)
+    assert len(os.listdir(tmp_path)) == 2
+
+
+def test_default_cache_folder_and_limits(tmp_path, monkeypatch):
+    monkeypatch.setattr(vehicle_model, '_ENVELOPES', {})
+    monkeypatch.setattr(vehicle_model, 'MAX_ENVELOPES', 2)
+    monkeypatch.setattr(vehicle_model, 'MAX_CACHE_FILES', 2)
+    monkeypatch.setenv('KART_VEHICLE_CACHE', str(tmp_path / 'cache'))
+    for mass in (150, 160, 170):
+        VehicleModel('rental', mass=mass).envelope()
+        os.utime(tmp_path / 'cache' / f"rental_{VehicleModel('rental', mass=mass).key()[:16]}.npz",
+                 (mass, mass))
+    assert len(vehicle_model._ENVELOPES) == 2
+    assert sorted(os.listdir(tmp_path / 'cache')) == sorted(
+        f"rental_{VehicleModel('rental', mass=mass).key()[:16]}.npz" for mass in (160, 170))
+
+
+def test_mass_lowers_acceleration():
+    light, heavy = VehicleModel('rental', mass=150), VehicleModel('rental', mass=200)
+    v = np.array([3.0, 6.0, 9.0])
+    a_light = light.build_envelope().acceleration(v, 0.0)
+    a_heavy = heavy.build_envelope().acceleration(v, 0.0)
+    assert np.all(a_heavy < a_light)
+    # Abaixo do limite de tração a força líquida do motor é a mesma: a = F / m
+    np.testing.assert_allclose((a_light + light.resistance(v) / 150) * 150,
+                               (a_heavy + heavy.resistance(v) / 200) * 200, rtol=1e-3)
+
+
+def test_corner_speed_without_aero_is_analytic():
+    envelope = VehicleModel('rental', drag_area=0.0).build_envelope()
+    curvature = np.array([0.05, 0.1, 0.2, 0.5])
+    expected = np.sqrt(1.3 * G / curvature)
+    assert expected.max() < envelope.top_speed
+    np.testing.assert_allclose(envelope.corner_speed(curvature), expected, rtol=5e-3)
+
+
+def test_friction_coeff_scales_class_grip():
+    params = {'kart_class': 'rental', 'friction_coeff': vehicle_model.REFERENCE_FRICTION}
+    nominal = VehicleModel.from_params(params)
+    assert nominal.key() == VehicleModel('rental').key()
+
+    grippy = VehicleModel.from_params(dict(params, friction_coeff=1.65))
+    assert grippy.params['grip'] == pytest.approx(1.1 * 1.3)
+    assert grippy.params['longitudinal_grip'] == pytest.approx(1.1 * 1.2)
+    assert np.all(vehicle_envelope(dict(params, friction_coeff=1.65)).lateral_max >
+                  vehicle_envelope(params).lateral_max)
+
+    # grip explícito não é escalado
+    assert VehicleModel.from_params(dict(params, friction_coeff=1.65, grip=1.4)).params['grip'] == 1.4